@@ -4,9 +4,21 @@ app.__init__
 Application factory
 """
 
+import logging
+import os
+import time
+
 from flask import Flask
+from flask import g
+from flask import request
 
 from app.controllers.routes import blueprint
+from app.utility import init_logger
+from app.utility import metrics
+from app.utility import profiling
+from app.utility import server_timing
+from app.utility.fanout import end_deadline
+from app.utility.fanout import start_deadline
 
 
 def init_app() -> Flask:
@@ -15,6 +27,37 @@ def init_app() -> Flask:
     """
     application = Flask(__name__)
     application.register_blueprint(blueprint)
+    server_timing.init_app(application)
+    metrics.init_app(application)
+    profiling.init_app(application)
+    init_logger("app")
+    # seconds a request has to complete, kept below the Lambda timeout, see app.utility.fanout
+    request_deadline = float(os.getenv("REQUEST_DEADLINE", "8"))
+
+    @application.before_request
+    def start_request():
+        g.request_start = time.perf_counter()
+        g.request_deadline = start_deadline(request_deadline)
+
+    @application.after_request
+    def log_phases(response):
+        if "phase_timings" in g:
+            elapsed = (time.perf_counter() - g.request_start) * 1000
+            logging.getLogger("app").info(
+                "%s %s %.1fms %s",
+                request.method,
+                request.path,
+                elapsed,
+                g.phase_timings,
+                extra=dict(method=request.method, path=request.path, ms=elapsed, phases=g.phase_timings.phases),
+            )
+        return response
+
+    @application.teardown_request
+    def end_request(error=None):
+        if "request_deadline" in g:
+            end_deadline(g.pop("request_deadline"))
+
     return application
 
 
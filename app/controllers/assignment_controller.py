@@ -1,52 +1,186 @@
-import datetime
 import json
+import math
 import time
 import uuid
 
-import requests
 from flask import abort
 from flask import render_template
 
 from app.models.jwt import LTIJwtPayload
+from app.models.outbox import OutboxRecord
+from app.models.outbox import outbox_storage
+from app.models.repository import lti_repository
 from app.models.state import LTIState
 from app.models.state import LTIStateStorage
-from app.models.tool_config import LTITool
-from app.models.tool_config import LTIToolStorage
+from app.utility.ags_client import AgsClient
+from app.utility.score_import import ScoreImporter
+from app.utility.score_import import import_format
+
+# the knowledge check's checkboxes, one point each
+ACKNOWLEDGEMENTS = ("ackOauth", "ackGradeReturn", "ackREST")
+INSTRUCTOR = "http://purl.imsglobal.org/vocab/lis/v2/membership#Instructor"
 
 
 def submit_assignment(request):
-    pass
+    state_id = request.form.get("state")
+    if not state_id:
+        abort(400, "InvalidParameterException - Missing state")
+    if request.cookies.get("state") != state_id:
+        abort(409, "InvalidStateException - state does not match the launch")
+
+    repository = lti_repository()
+    state = repository.state(state_id)
+    if not state.record.id_token:
+        abort(409, "InvalidStateException - Unknown or expired state")
+    jwt_request = LTIJwtPayload(state.record.id_token)
+    if not jwt_request.endpoint_lineitem:
+        abort(409, "InvalidParameterException - The launch has no line item to grade")
+
+    acknowledged = [name for name in ACKNOWLEDGEMENTS if request.form.get(name)]
+    score = AgsClient.score(
+        jwt_request.sub,
+        len(acknowledged),
+        len(ACKNOWLEDGEMENTS),
+        comment=f"Acknowledged {', '.join(acknowledged) or 'nothing'}",
+    )
+    # the score is published by the OutboxWorker, the submission form's id makes a double submit a no-op
+    now = time.time()
+    outbox_storage().append(
+        OutboxRecord(
+            id=request.form.get("submission") or uuid.uuid4().hex,
+            client_id=jwt_request.aud,
+            iss=jwt_request.iss,
+            lti_deployment_id=jwt_request.deployment_id,
+            lineitem_url=jwt_request.endpoint_lineitem,
+            score=json.dumps(score),
+            created_at_ms=int(now * 1000),
+            next_attempt_at=int(now),
+        )
+    )
+
+    return render_template(
+        "submission_success.html",
+        name=jwt_request.payload.get("name", "Anonymous"),
+        pretty_body=json.dumps(score, sort_keys=True, indent=2, separators=(",", ": ")),
+    )
+
+
+def import_scores(request):
+    """
+    Publish a gradebook file, CSV or JSONL with sub, score, comment and lineitem columns, to the line items of the
+    launch's course, only those under its endpoint_lineitems. The file is streamed, see ``ScoreImporter``.
+    """
+    state_id = request.form.get("state")
+    if not state_id:
+        abort(400, "InvalidParameterException - Missing state")
+    if request.cookies.get("state") != state_id:
+        abort(409, "InvalidStateException - state does not match the launch")
+    upload = request.files.get("scores")
+    if upload is None:
+        abort(400, "InvalidParameterException - Missing scores file")
+
+    repository = lti_repository()
+    state = repository.state(state_id)
+    if not state.record.id_token:
+        abort(409, "InvalidStateException - Unknown or expired state")
+    jwt_request = LTIJwtPayload(state.record.id_token)
+    if INSTRUCTOR not in jwt_request.payload.get("https://purl.imsglobal.org/spec/lti/claim/roles", []):
+        abort(403, "AccessDeniedException - Only instructors can import scores")
+
+    platform = repository.platform(jwt_request.aud, jwt_request.iss, jwt_request.deployment_id)
+    importer = ScoreImporter(
+        AgsClient(platform, repository.tool()),
+        lineitem_url=jwt_request.endpoint_lineitem or None,
+        lineitems_url=jwt_request.endpoint_lineitems or None,
+    )
+    report = importer.run(upload.stream, request.form.get("format") or import_format(upload.filename))
+    return report.json(), 200, {"Content-Type": "application/json; charset=utf-8"}
 
 
 def create_assignment(request):
-    pass
+    """
+    Answer a deep linking request with one content item per assignment of the form, the ``name`` and ``points``
+    fields repeated once per assignment, in one LtiDeepLinkingResponse signed once.
+    """
+    state_id = request.form.get("state")
+    if not state_id:
+        abort(400, "InvalidParameterException - Missing state")
+    if request.cookies.get("state") != state_id:
+        abort(409, "InvalidStateException - state does not match the launch")
+
+    state = lti_repository().state(state_id)
+    if not state.record.id_token:
+        abort(409, "InvalidStateException - Unknown or expired state")
+    jwt_request = LTIJwtPayload(state.record.id_token)
+    if jwt_request.message_type != "LtiDeepLinkingRequest":
+        abort(409, "InvalidParameterException - The launch is not a deep linking request")
+
+    names, points_list = request.form.getlist("name"), request.form.getlist("points")
+    if len(names) != len(points_list):
+        abort(400, "InvalidParameterException - Every assignment needs one name and one points field")
+    assignments = []
+    for name, points in zip(names, points_list):
+        if not name.strip() and not points.strip():
+            continue
+        try:
+            score_maximum = float(points)
+        except ValueError:
+            abort(400, f"InvalidParameterException - Invalid points {points!r} for {name!r}")
+        # nan, inf and 1e400 parse but are not valid JSON in the signed response
+        if not name.strip() or not math.isfinite(score_maximum) or score_maximum <= 0:
+            abort(400, "InvalidParameterException - Every assignment needs a name and positive points")
+        assignments.append((name.strip(), score_maximum))
+    if not assignments:
+        abort(400, "InvalidParameterException - Missing assignment")
+    settings = jwt_request.payload.get("https://purl.imsglobal.org/spec/lti-dl/claim/deep_linking_settings", {})
+    if len(assignments) > 1 and settings.get("accept_multiple") is False:
+        abort(400, "InvalidParameterException - The platform accepts a single content item")
+
+    claims = get_message_claims(jwt_request, get_assignments_content(assignments))
+    jwt = LTIJwtPayload().encode(claims, lti_repository().tool())
+    return render_template(
+        "confirm_assignment.html",
+        jwt=jwt,
+        return_url=jwt_request.deep_linking_settings_return_url,
+        pretty_body=json.dumps(claims, sort_keys=True, indent=2, separators=(",", ": ")),
+    )
+
 
 def get_assignment_content(name, points):
-    # Mock return value to simulate a assignment content item
-    # Ideally we'd create an assignment in our database and create a content item with that unique identifier
-    assignment_id = uuid.uuid4().hex
+    return get_assignments_content([(name, points)])
 
-    tool = LTITool(LTIToolStorage())
+
+def get_assignments_content(assignments) -> list:
+    """
+    :param assignments: (name, points) of each assignment
+    :return: an ltiResourceLink content item with its line item per assignment
+    """
+    # Mock content items to simulate assignments
+    # Ideally we'd create each assignment in our database and create a content item with that unique identifier
+    tool = lti_repository().tool()
     lti_launch_url = f"{tool.config.base_url()}/launch"
 
-    content_item = dict(
-        type="ltiResourceLink",
-        title=name,
-        text="Do this assignment",
-        url=lti_launch_url,
-        lineItem=dict(
-            scoreMaximum=points, label=name, resourceId=assignment_id, tag="originality"
-        ),
-        custom=dict(
-            assignment_id=assignment_id,
-            userNameLTI="$User.username",
-            userIdLTI="$User.id",
-            contextHistory="$Context.id.history",
-            resourceHistory="$ResourceLink.id.history",
-        ),
-    )
+    content_items = []
+    for name, points in assignments:
+        assignment_id = uuid.uuid4().hex
+        content_items.append(
+            dict(
+                type="ltiResourceLink",
+                title=name,
+                text="Do this assignment",
+                url=lti_launch_url,
+                lineItem=dict(scoreMaximum=points, label=name, resourceId=assignment_id, tag="originality"),
+                custom=dict(
+                    assignment_id=assignment_id,
+                    userNameLTI="$User.username",
+                    userIdLTI="$User.id",
+                    contextHistory="$Context.id.history",
+                    resourceHistory="$ResourceLink.id.history",
+                ),
+            )
+        )
 
-    return [content_item]
+    return content_items
 
 
 def get_message_claims(jwt_request: LTIJwtPayload, content_items) -> dict:
@@ -1,31 +1,76 @@
 import json
 import logging
+import uuid
 from urllib.parse import urlencode
 
-import requests
 from flask import abort
 from flask import redirect
 from flask import render_template
 
-from app.controllers import rest_auth_controller
 from app.models.jwt import LTIJwtPayload
-from app.models.platform_config import LTIPlatform
-from app.models.platform_config import LTIPlatformStorage
-from app.models.state import LTIState
-from app.models.state import LTIStateStorage
-from app.models.tool_config import LTITool
-from app.models.tool_config import LTIToolStorage
-from app.utility import init_logger
+from app.models.repository import lti_repository
+from app.utility.fanout import FanOut
+from app.utility.fanout import phase_timings
 from app.utility.learn_client import LearnClient
-from app.utility.token_client import GrantType
-from app.utility.token_client import TokenClient
 
 
 def launch(request):
-    pass
+    # https://www.imsglobal.org/spec/security/v1p0/#step-3-authentication-response
+    id_token = request.form.get("id_token")
+    state_id = request.form.get("state")
+    if not id_token or not state_id:
+        abort(400, "InvalidParameterException - Missing id_token or state")
+    if request.cookies.get("state") != state_id:
+        abort(409, "InvalidStateException - state does not match the login")
 
+    try:
+        jwt_request = LTIJwtPayload(id_token)
+    except Exception as e:
+        abort(400, f"InvalidParameterException - {e}")
 
-def render_ui(jwt_request: LTIJwtPayload, state, id_token):
+    timings = phase_timings()
+    with timings.phase("prefetch"):
+        repository = lti_repository().prefetch(
+            state_ids=[state_id],
+            platforms=[(jwt_request.aud, jwt_request.iss, jwt_request.deployment_id)],
+        )
+        platform = repository.platform(jwt_request.aud, jwt_request.iss, jwt_request.deployment_id)
+        state = repository.state(state_id)
+
+    def verify():
+        try:
+            jwt_request.verify(platform)
+        except Exception as e:
+            return e
+
+    # the platform's JWKS and the tool's configuration do not depend on each other
+    steps = FanOut().run(dict(verify=verify, tool=repository.tool), timings)
+    if steps["verify"] is not None:
+        abort(401, f"InvalidTokenException - {steps['verify']}")
+    # only a verified id_token is kept in the state, saved with its nonce used in a single write
+    state.record.id_token = id_token
+    with timings.phase("save_state"):
+        if not state.validate_and_save(jwt_request.nonce):
+            abort(409, "InvalidStateException - nonce has already been used")
+
+    tool = repository.tool()
+    if not tool.config.learn_app_key:
+        # No Learn REST application registered, skip the three-legged OAuth and render straight away
+        return render_ui(jwt_request, state_id, id_token)
+
+    # Three-legged OAuth with Learn, the platform redirects back to /authcode
+    params = dict(
+        redirect_uri=tool.config.auth_code_url(),
+        response_type="code",
+        client_id=tool.config.learn_app_key,
+        scope="read offline",
+        state=state_id,
+    )
+    learn_url = jwt_request.platform_url.rstrip("/")
+    return redirect(f"{learn_url}/learn/api/public/v1/oauth2/authorizationcode?{urlencode(params)}")
+
+
+def render_ui(jwt_request: LTIJwtPayload, state, id_token, learn_rest_token=None, course_info=None):
     pretty_body = json.dumps(jwt_request.payload, sort_keys=True, indent=2, separators=(",", ": "))
 
     # Get the user's name; they might not have a "full name"
@@ -36,11 +81,15 @@ def render_ui(jwt_request: LTIJwtPayload, state, id_token):
     else:
         name = "Anonymous"
 
-    tool = LTITool(LTIToolStorage())
+    tool = lti_repository().tool()
 
     course_date = ""
 
     if jwt_request.message_type == "LtiResourceLinkRequest":
+        if course_info is None:
+            with phase_timings().phase("course_info"):
+                course_info = LearnClient().get_course_info(jwt_request, state, learn_access_token=learn_rest_token)
+        course_date = course_info.get("modified", "")
         action_url = f"{tool.config.base_url()}/submit_assignment"
         return render_template(
             "knowledge_check.html",
@@ -49,6 +98,7 @@ def render_ui(jwt_request: LTIJwtPayload, state, id_token):
             id_token=id_token,
             state=state,
             action_url=action_url,
+            submission=uuid.uuid4().hex,
             course_name=jwt_request.context_title,
             course_modified=course_date,
         )
@@ -58,7 +108,7 @@ def render_ui(jwt_request: LTIJwtPayload, state, id_token):
             "create_assignment.html",
             name=name,
             pretty_body=pretty_body,
-            id_token=id_token,
+            state=state,
             action_url=action_url,
         )
     else:
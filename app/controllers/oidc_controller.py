@@ -1,14 +1,43 @@
 from urllib.parse import urlencode
-from urllib.parse import urljoin
 
 from flask import abort
 from flask import redirect
 
-from app.models.platform_config import LTIPlatform
-from app.models.platform_config import LTIPlatformStorage
+from app.models.repository import lti_repository
 from app.models.state import LTIState
 from app.models.state import LTIStateStorage
 
 
 def login(request):
-    pass
\ No newline at end of file
+    # https://www.imsglobal.org/spec/security/v1p0/#step-1-third-party-initiated-login
+    iss = request.values.get("iss")
+    login_hint = request.values.get("login_hint")
+    lti_message_hint = request.values.get("lti_message_hint")
+    client_id = request.values.get("client_id")
+    lti_deployment_id = request.values.get("lti_deployment_id")
+    target_link_uri = request.values.get("target_link_uri")
+
+    if not iss or not login_hint or not client_id or not target_link_uri:
+        abort(400, "InvalidParameterException - Missing iss, login_hint, client_id or target_link_uri")
+
+    platform = lti_repository().platform(client_id, iss, lti_deployment_id)
+    state = LTIState(LTIStateStorage()).save()
+
+    # https://www.imsglobal.org/spec/security/v1p0/#step-2-authentication-request
+    params = dict(
+        scope="openid",
+        response_type="id_token",
+        response_mode="form_post",
+        prompt="none",
+        client_id=client_id,
+        redirect_uri=target_link_uri,
+        login_hint=login_hint,
+        state=state.record.id,
+        nonce=state.record.nonce,
+    )
+    if lti_message_hint:
+        params["lti_message_hint"] = lti_message_hint
+
+    response = redirect(f"{platform.config.auth_login_url}?{urlencode(params)}")
+    response.set_cookie("state", state.record.id, secure=True, httponly=True, samesite="None")
+    return response
@@ -2,11 +2,44 @@ from flask import abort
 
 from app.controllers import launch_controller
 from app.models.jwt import LTIJwtPayload
-from app.models.state import LTIStateStorage, LTIState
-from app.models.tool_config import LTITool
-from app.models.tool_config import LTIToolStorage
+from app.models.repository import lti_repository
+from app.utility.fanout import FanOut
+from app.utility.fanout import phase_timings
+from app.utility.learn_client import LearnClient
 from app.utility.token_client import TokenClient
 
 
 def authcode(request):
-    pass
+    code = request.args.get("code")
+    state_id = request.args.get("state")
+    if not code or not state_id:
+        abort(400, "InvalidParameterException - Missing code or state")
+    if request.cookies.get("state") != state_id:
+        abort(409, "InvalidStateException - state does not match the login")
+
+    repository = lti_repository()
+    timings = phase_timings()
+    # the state and the tool's configuration are read from DynamoDB and SSM at the same time
+    steps = FanOut().run(dict(state=lambda: repository.state(state_id), tool=repository.tool), timings)
+    state, tool = steps["state"], steps["tool"]
+    if not state.record.id_token:
+        abort(409, "InvalidStateException - Unknown or expired state")
+
+    jwt_request = LTIJwtPayload(state.record.id_token)
+    with timings.phase("learn_token"):
+        learn_rest_token = TokenClient.get_learn_access_token(
+            jwt_request.platform_url.rstrip("/"), tool.config.auth_code_url(), code, tool=tool
+        )
+    state.record.set_platform_learn_rest_token(learn_rest_token)
+
+    # saving the encrypted token and reading the course only both need the token
+    steps = dict(save_state=state.save)
+    if jwt_request.message_type == "LtiResourceLinkRequest":
+        steps["course_info"] = lambda: LearnClient().get_course_info(
+            jwt_request, state_id, learn_access_token=learn_rest_token
+        )
+    course_info = FanOut().run(steps, timings).get("course_info")
+
+    return launch_controller.render_ui(
+        jwt_request, state_id, state.record.id_token, learn_rest_token=learn_rest_token, course_info=course_info
+    )
@@ -53,6 +53,11 @@ def submit_assignment():
     return assignment_controller.submit_assignment(request)
 
 
+@blueprint.route("/import_scores", methods=["POST"])
+def import_scores():
+    return assignment_controller.import_scores(request)
+
+
 @blueprint.route("/jwks.json")
 def jwks_json():
     return config_controller.jwks()
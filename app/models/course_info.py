@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+import botocore
+from cachetools import LRUCache
+from pydantic import BaseModel
+
+from app.utility import init_logger
+from app.utility.aws import Aws
+from app.utility.aws import Singleton
+from app.utility.codecs import RecordCodec
+
+
+class CourseInfoRecord(BaseModel):
+    PK: str = ""
+    body: str = "{}"
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    expires: int = 0
+    ttl: int = 0
+
+    def is_fresh(self) -> bool:
+        return self.expires > int(datetime.now().timestamp())
+
+    def info(self) -> dict:
+        return json.loads(self.body)
+
+
+course_info_record_codec = RecordCodec(CourseInfoRecord)
+
+
+class CourseInfoStorage:
+    def __init__(self):
+        self.TABLE_NAME = os.getenv("TABLE_NAME")
+        # seconds a course is served from the cache before it is revalidated with Learn
+        self.TTL = int(os.getenv("COURSE_INFO_TTL", "3600"))
+        # bytes of course JSON kept in memory per process, least recently used courses are evicted first
+        self.MAX_BYTES = int(os.getenv("COURSE_INFO_CACHE_BYTES", str(1024 * 1024)))
+        # "true" shares the cache between instances through COURSE# items of the LTI table
+        self.SHARED = os.getenv("COURSE_INFO_SHARED", "false").lower() == "true"
+        aws = Aws()
+        self.ddbclient = aws.dynamodb if self.SHARED else None
+
+    def __new__(cls):
+        if not hasattr(cls, "instance"):
+            cls.instance = super(CourseInfoStorage, cls).__new__(cls)
+        return cls.instance
+
+
+class CourseInfoCache(metaclass=Singleton):
+    """
+    Process wide cache of Learn course info keyed by (platform_url, course uuid).
+
+    Entries stay in memory after they go stale so that their ETag/Last-Modified can be used to revalidate them,
+    memory is capped at COURSE_INFO_CACHE_BYTES of course JSON. With COURSE_INFO_SHARED the entries are also
+    written to and read from the LTI table, expiring there through the table's ttl.
+    """
+
+    def __init__(self, storage: CourseInfoStorage):
+        init_logger("CourseInfoCache")
+        self._storage = storage
+        self._entries = LRUCache(maxsize=storage.MAX_BYTES, getsizeof=lambda record: len(record.body))
+        self._lock = threading.Lock()
+
+    def __log(self):
+        return logging.getLogger("CourseInfoCache")
+
+    @staticmethod
+    def key(platform_url: str, course_uuid: str) -> str:
+        return f"COURSE#{platform_url}#{course_uuid}"
+
+    def get(self, platform_url: str, course_uuid: str) -> Optional[CourseInfoRecord]:
+        """
+        :return: the cached record, fresh or stale, None when the course is not cached
+        """
+        pk = CourseInfoCache.key(platform_url, course_uuid)
+        with self._lock:
+            record = self._entries.get(pk)
+        if (record is None or not record.is_fresh()) and self._storage.SHARED:
+            shared = self.__load_shared(pk)
+            if shared is not None and (record is None or shared.expires > record.expires):
+                self.__put_local(shared)
+                record = shared
+        return record
+
+    def put(self, platform_url: str, course_uuid: str, body: str, etag: Optional[str], last_modified: Optional[str]):
+        return self.__store(CourseInfoCache.key(platform_url, course_uuid), body, etag, last_modified)
+
+    def refresh(self, record: CourseInfoRecord) -> CourseInfoRecord:
+        """
+        Start a new TTL for a record Learn answered 304 Not Modified for.
+        """
+        return self.__store(record.PK, record.body, record.etag, record.last_modified)
+
+    def __store(self, pk: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> CourseInfoRecord:
+        now = int(datetime.now().timestamp())
+        record = CourseInfoRecord(
+            PK=pk,
+            body=body,
+            etag=etag,
+            last_modified=last_modified,
+            expires=now + self._storage.TTL,
+            # kept in the table for one more TTL so that other instances can still revalidate it
+            ttl=now + 2 * self._storage.TTL,
+        )
+        self.__put_local(record)
+        if self._storage.SHARED:
+            self.__save_shared(record)
+        return record
+
+    def __put_local(self, record: CourseInfoRecord):
+        if len(record.body) > self._storage.MAX_BYTES:
+            return
+        with self._lock:
+            self._entries[record.PK] = record
+
+    def __load_shared(self, pk: str) -> Optional[CourseInfoRecord]:
+        try:
+            response = self._storage.ddbclient.get_item(TableName=self._storage.TABLE_NAME, Key={"PK": {"S": pk}})
+        except botocore.exceptions.ClientError as error:
+            self.__log().warning(f"Error retrieving course info {pk}. {error}")
+            return None
+        item = response.get("Item")
+        return course_info_record_codec.decode(item) if item is not None else None
+
+    def __save_shared(self, record: CourseInfoRecord):
+        try:
+            self._storage.ddbclient.put_item(
+                TableName=self._storage.TABLE_NAME, Item=course_info_record_codec.encode(record)
+            )
+        except botocore.exceptions.ClientError as error:
+            self.__log().warning(f"Error persisting course info {record.PK}. {error}")
@@ -6,16 +6,11 @@ import uuid
 from datetime import datetime
 
 import botocore
-from boto3.dynamodb.conditions import Attr
-from boto3.dynamodb.types import TypeDeserializer
-from boto3.dynamodb.types import TypeSerializer
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.serialization import load_der_public_key
-from jwcrypto.jwk import JWK
 from pydantic import BaseModel
 
 from app.utility import init_logger
 from app.utility.aws import Aws
+from app.utility.codecs import RecordCodec
 
 
 class JwkRecord(BaseModel):
@@ -24,11 +19,17 @@ class JwkRecord(BaseModel):
     kms_key_id: str
     public_key_pem: str
     ttl: int = 0
-    _jwks = JWK()
 
     def _to_jwk(self):
-        self._jwks.import_from_pem(data=base64.b64decode(self.public_key_pem), kid=self.kid)
-        return self._jwks
+        # jwcrypto is imported on first use to keep it out of the import time of routes that do not need it
+        from jwcrypto.jwk import JWK
+
+        jwk = JWK()
+        jwk.import_from_pem(data=base64.b64decode(self.public_key_pem), kid=self.kid)
+        return jwk
+
+
+jwk_record_codec = RecordCodec(JwkRecord)
 
 
 class JwkStorage:
@@ -36,7 +37,6 @@ class JwkStorage:
         self.TABLE_NAME = os.getenv("TABLE_NAME")
         self.TTL = os.getenv("JWK_TTL", "2592000")
         aws = Aws()
-        self.dynamodb = aws.dynamodb_resource
         self.ddbclient = aws.dynamodb
 
     def __new__(cls):
@@ -56,6 +56,9 @@ class Jwk:
 
     @staticmethod
     def new(jwk_storage: JwkStorage):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.serialization import load_der_public_key
+
         kid = str(uuid.uuid4())
         aws = Aws()
         kms_client = aws.kms
@@ -85,9 +88,7 @@ class Jwk:
                 Key={"PK": {"S": f"JWK#{kid}"}},
             )
             if "Item" in response:
-                deserializer = TypeDeserializer()
-                r = deserializer.deserialize({"M": response["Item"]})
-                self.record = JwkRecord(**r)
+                self.record = jwk_record_codec.decode(response["Item"])
 
             else:
                 self.__log().warning(f"No JWK record found for JWK#{id}.")
@@ -102,19 +103,19 @@ class Jwk:
     def all(jwk_storage: JwkStorage):
 
         try:
-            dynamodb = jwk_storage.dynamodb
-            table = dynamodb.Table(jwk_storage.TABLE_NAME)
-            response = table.scan(
-                FilterExpression=Attr("PK").begins_with("JWK#"),
+            response = jwk_storage.ddbclient.scan(
+                TableName=jwk_storage.TABLE_NAME,
+                FilterExpression="begins_with(PK, :prefix)",
+                ExpressionAttributeValues={":prefix": {"S": "JWK#"}},
                 ConsistentRead=True,
             )
             if "Items" in response and len(response["Items"]) > 0:
                 keys = []
                 now = int(datetime.now().timestamp()) + int(864000)
                 for item in response["Items"]:
-                    record = JwkRecord(**item)._to_jwk().export_public(as_dict=True)
-                    ttl = item["ttl"]
-                    record["ttl"] = int(ttl)
+                    jwk_record = jwk_record_codec.decode(item)
+                    record = jwk_record._to_jwk().export_public(as_dict=True)
+                    record["ttl"] = jwk_record.ttl
                     keys.append(record)
                 if len(keys) <= 1 and len([k for k in keys if now - k["ttl"] < 864000]) > 0:
                     Jwk.new(jwk_storage).save()
@@ -139,9 +140,8 @@ class Jwk:
         )  # this will auto expire the state in DDB
 
         try:
-            serializer = TypeSerializer()
-            item = serializer.serialize(self.record.dict())["M"]
-            self.__log().debug(f"Saving: {item}")
+            item = jwk_record_codec.encode(self.record)
+            self.__log().debug("Saving: %s", item)
             self._storage.ddbclient.put_item(TableName=self._storage.TABLE_NAME, Item=item)
         except botocore.exceptions.ClientError as error:
             msg = f"Error persisting JWK for {self.record.PK}. {error}"
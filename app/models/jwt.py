@@ -4,15 +4,13 @@ import logging
 import os
 from typing import Optional
 
-import jwt
-from jwt import PyJWKClient
-from jwt import algorithms
 from pydantic import BaseModel
 
 from app.models.platform_config import LTIPlatform
 from app.models.tool_config import LTITool
 from app.utility import init_logger
 from app.utility.aws import Aws
+from app.utility.shared_cache import SharedCache
 
 
 class LTIJwtPayload(BaseModel):
@@ -21,6 +19,7 @@ class LTIJwtPayload(BaseModel):
     payload: Optional[dict] = None
     aud: Optional[str] = None
     context_id: Optional[str] = None
+    context_memberships_url: Optional[str] = None
     context_title: Optional[str] = None
     deep_linking_settings_data: Optional[str] = None
     deep_linking_settings_return_url: Optional[str] = None
@@ -39,15 +38,16 @@ class LTIJwtPayload(BaseModel):
 
     def __init__(self, token: Optional[str] = None, **kwargs):
         super().__init__(**kwargs)
+        # PyJWT is imported on first use to keep it out of the import time of routes that do not need it
+        import jwt
+
         init_logger("LTIJwtPayload")
-        self.__log().debug(
-            f"Default algorithms {algorithms.get_default_algorithms().keys()}"
-        )
         self.ttl = 300  # expire token after 5 minutes
 
         # If token provided through constructor, parse without verification and hydrate class properties
         if token is not None:
-            self.__log().debug(f"token: {token}")
+            # the token itself is redacted when the record is written, see app.utility.structured_logging
+            self.__log().debug("token: %s", token)
             if len(token.split(".")) != 3:
                 raise Exception("InvalidParameterException")
 
@@ -119,6 +119,16 @@ class LTIJwtPayload(BaseModel):
                 in payload["https://purl.imsglobal.org/spec/lti-ags/claim/endpoint"]
                 else ""
             )
+            # https://www.imsglobal.org/spec/lti-nrps/v2p0
+            self.context_memberships_url = (
+                payload["https://purl.imsglobal.org/spec/lti-nrps/claim/namesroleservice"][
+                    "context_memberships_url"
+                ]
+                if "https://purl.imsglobal.org/spec/lti-nrps/claim/namesroleservice" in payload
+                and "context_memberships_url"
+                in payload["https://purl.imsglobal.org/spec/lti-nrps/claim/namesroleservice"]
+                else ""
+            )
             self.iss = payload["iss"]
             self.message_type = (
                 payload["https://purl.imsglobal.org/spec/lti/claim/message_type"]
@@ -231,9 +241,9 @@ class LTIJwtPayload(BaseModel):
         # 2 The Issuer Identifier for the Platform MUST exactly match the value of the iss (Issuer) Claim (therefore the Tool MUST previously have been made aware of this identifier);
         # 3 The Tool MUST validate that the aud (audience) Claim contains its client_id value registered as an audience with the Issuer identified by the iss (Issuer) Claim. The aud (audience) Claim MAY contain an array with more than one element. The Tool MUST reject the ID Token if it does not list the client_id as a valid audience, or if it contains additional audiences not trusted by the Tool. The request message will be rejected with a HTTP code of 401;
         # load the jwks and find the signing key via the key_set_url stored in Config (do not trust the token provided)
+        import jwt
 
-        jwks_client = PyJWKClient(platform.config.key_set_url)
-        signing_key = jwks_client.get_signing_key_from_jwt(self.token)
+        signing_key = self.__signing_key(platform.config.key_set_url)
 
         # decode (verify) the token, will throw and Exception on validation error
         valid = jwt.decode(
@@ -257,5 +267,35 @@ class LTIJwtPayload(BaseModel):
 
         return self
 
+    def __signing_key(self, key_set_url: str):
+        """
+        The platform key the token is signed with, from the platform JWKS kept in the SharedCache of the host for
+        PLATFORM_JWKS_TTL seconds. A kid that is not in the kept JWKS reads it again, the platform may have rotated
+        its keys.
+
+        :return: the PyJWK of the token's kid
+        """
+        from jwt import PyJWKClient
+        from jwt.exceptions import PyJWKClientError
+
+        client = PyJWKClient(key_set_url)
+        cache = SharedCache()
+        cache_key = f"JWKS#{key_set_url}"
+        ttl = int(os.getenv("PLATFORM_JWKS_TTL", "300"))
+        signing_key = self.__find_key(cache.get_or_load(cache_key, ttl, client.fetch_data))
+        if signing_key is None and cache.enabled:
+            jwks = client.fetch_data()
+            cache.set(cache_key, jwks, ttl)
+            signing_key = self.__find_key(jwks)
+        if signing_key is None:
+            raise PyJWKClientError(f'Unable to find a signing key that matches: "{self.header.get("kid")}"')
+        return signing_key
+
+    def __find_key(self, jwks: dict):
+        from jwt import PyJWKSet
+
+        signing_keys = [k for k in PyJWKSet.from_dict(jwks).keys if k.public_key_use in ("sig", None) and k.key_id]
+        return next((k for k in signing_keys if k.key_id == self.header.get("kid")), None)
+
     def __log(self):
         return logging.getLogger("LTIJwtPayload")
@@ -0,0 +1,82 @@
+import logging
+import os
+from typing import Optional
+
+import botocore
+from pydantic import BaseModel
+
+from app.utility import init_logger
+from app.utility.aws import Aws
+from app.utility.codecs import RecordCodec
+
+
+class MembershipSyncRecord(BaseModel):
+    PK: str = ""
+    iss: str = ""
+    context_id: str = ""
+    # the role the sync was filtered on, its differences URL only lists the changes of that role
+    role: Optional[str] = None
+    differences_url: Optional[str] = None
+    synced_at: int = 0
+
+
+membership_sync_codec = RecordCodec(MembershipSyncRecord)
+
+
+class MembershipSyncStorage:
+    def __init__(self):
+        self.TABLE_NAME = os.getenv("TABLE_NAME")
+        aws = Aws()
+        self.ddbclient = aws.dynamodb
+
+    def __new__(cls):
+        if not hasattr(cls, "instance"):
+            cls.instance = super(MembershipSyncStorage, cls).__new__(cls)
+        return cls.instance
+
+
+class MembershipSync:
+    """
+    Last Names and Role Provisioning Services sync of a context, holding the ``rel="differences"`` URL the platform
+    returned so that the next sync only reads the membership changes.
+    """
+
+    def __init__(self, storage: MembershipSyncStorage):
+        init_logger("MembershipSync")
+        self._storage: MembershipSyncStorage = storage
+        self.record = MembershipSyncRecord()
+
+    def __log(self):
+        return logging.getLogger("MembershipSync")
+
+    @staticmethod
+    def key(iss: str, context_id: str, role: Optional[str] = None) -> str:
+        return f"NRPS#{iss}#{context_id}" if role is None else f"NRPS#{iss}#{context_id}#{role}"
+
+    def load(self, iss: str, context_id: str, role: Optional[str] = None):
+        pk = MembershipSync.key(iss, context_id, role)
+        try:
+            response = self._storage.ddbclient.get_item(TableName=self._storage.TABLE_NAME, Key={"PK": {"S": pk}})
+        except botocore.exceptions.ClientError as error:
+            msg = f"Error retrieving membership sync for {pk}. {error}"
+            self.__log().error(msg)
+            raise Exception(msg)
+
+        item = response.get("Item")
+        if item is not None:
+            self.record = membership_sync_codec.decode(item)
+        else:
+            self.record = MembershipSyncRecord(PK=pk, iss=iss, context_id=context_id, role=role)
+        return self
+
+    def save(self):
+        self.record.PK = MembershipSync.key(self.record.iss, self.record.context_id, self.record.role)
+        try:
+            self._storage.ddbclient.put_item(
+                TableName=self._storage.TABLE_NAME, Item=membership_sync_codec.encode(self.record)
+            )
+        except botocore.exceptions.ClientError as error:
+            msg = f"Error persisting membership sync for {self.record.PK}. {error}"
+            self.__log().error(msg)
+            raise Exception(msg)
+        return self
@@ -0,0 +1,290 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List
+from typing import Optional
+
+import botocore
+from pydantic import BaseModel
+
+from app.utility import init_logger
+from app.utility.aws import Aws
+from app.utility.codecs import RecordCodec
+from app.utility.private_files import open_private
+
+PENDING = "pending"
+FAILED = "failed"
+# sparse global secondary index of the LTI table: only pending OUTBOX# items have its partition key, sorted by the
+# time their next attempt is due
+DUE_INDEX = "outbox-due"
+DUE_ATTRIBUTE = "outbox_due"
+DUE_PARTITION = "OUTBOX"
+
+
+class OutboxRecord(BaseModel):
+    PK: str = ""
+    # idempotency key, appending the same id twice keeps the first record
+    id: str
+    client_id: str
+    iss: str
+    lti_deployment_id: str
+    lineitem_url: str
+    # the AGS score as JSON, it carries its own timestamp so publishing it again is harmless
+    score: str
+    status: str = PENDING
+    attempts: int = 0
+    created_at_ms: int = 0
+    next_attempt_at: int = 0
+    claimed_until: int = 0
+    error: Optional[str] = None
+    ttl: int = 0
+
+
+outbox_record_codec = RecordCodec(OutboxRecord)
+
+
+class OutboxStorage:
+    """
+    Outbox kept as OUTBOX# items of the LTI table. The pending ones are found through the DUE_INDEX.
+    """
+
+    def __init__(self):
+        self.TABLE_NAME = os.getenv("TABLE_NAME")
+        # seconds failed records are kept for inspection
+        self.TTL = os.getenv("OUTBOX_TTL", str(7 * 24 * 3600))
+        aws = Aws()
+        self.ddbclient = aws.dynamodb
+
+    def __new__(cls):
+        if not hasattr(cls, "instance"):
+            cls.instance = super(OutboxStorage, cls).__new__(cls)
+        return cls.instance
+
+    def __log(self):
+        return logging.getLogger("OutboxStorage")
+
+    @staticmethod
+    def key(id: str) -> str:
+        return f"OUTBOX#{id}"
+
+    @staticmethod
+    def item(record: OutboxRecord) -> dict:
+        """
+        :return: the item of a record, in the DUE_INDEX while it is pending
+        """
+        item = outbox_record_codec.encode(record)
+        if record.status == PENDING:
+            item[DUE_ATTRIBUTE] = {"S": DUE_PARTITION}
+        return item
+
+    def append(self, record: OutboxRecord) -> bool:
+        record.PK = OutboxStorage.key(record.id)
+        record.ttl = int(time.time()) + int(self.TTL)
+        try:
+            self.ddbclient.put_item(
+                TableName=self.TABLE_NAME,
+                Item=OutboxStorage.item(record),
+                ConditionExpression="attribute_not_exists(PK)",
+            )
+            return True
+        except self.ddbclient.exceptions.ConditionalCheckFailedException:
+            self.__log().info(f"{record.PK} is already in the outbox")
+            return False
+
+    def claim(self, record: OutboxRecord, lease: int) -> bool:
+        """
+        Take a record for ``lease`` seconds so that no other worker publishes it at the same time.
+        """
+        now = int(time.time())
+        try:
+            self.ddbclient.update_item(
+                TableName=self.TABLE_NAME,
+                Key={"PK": {"S": OutboxStorage.key(record.id)}},
+                UpdateExpression="SET claimed_until = :lease",
+                ConditionExpression="attribute_exists(PK) AND #status = :pending AND claimed_until < :now",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={
+                    ":lease": {"N": str(now + lease)},
+                    ":pending": {"S": PENDING},
+                    ":now": {"N": str(now)},
+                },
+            )
+            record.claimed_until = now + lease
+            return True
+        except self.ddbclient.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def claim_due(self, limit: int, lease: int) -> List[OutboxRecord]:
+        """
+        Claim up to ``limit`` pending records that are due, the longest due first. The DUE_INDEX holds the pending
+        records only, so the records that were published or failed are not read.
+        """
+        now = int(time.time())
+        claimed = []
+        paginator = self.ddbclient.get_paginator("query")
+        for page in paginator.paginate(
+            TableName=self.TABLE_NAME,
+            IndexName=DUE_INDEX,
+            KeyConditionExpression=f"{DUE_ATTRIBUTE} = :due AND next_attempt_at <= :now",
+            FilterExpression="claimed_until < :now",
+            ExpressionAttributeValues={
+                ":due": {"S": DUE_PARTITION},
+                ":now": {"N": str(now)},
+            },
+        ):
+            for item in page.get("Items", []):
+                record = outbox_record_codec.decode(item)
+                if self.claim(record, lease):
+                    claimed.append(record)
+                if len(claimed) >= limit:
+                    return claimed
+        return claimed
+
+    def delete(self, record: OutboxRecord):
+        self.ddbclient.delete_item(TableName=self.TABLE_NAME, Key={"PK": {"S": OutboxStorage.key(record.id)}})
+
+    def update(self, record: OutboxRecord):
+        """
+        Save the status, attempts and error of a record and release its claim.
+        """
+        record.PK = OutboxStorage.key(record.id)
+        record.claimed_until = 0
+        try:
+            self.ddbclient.put_item(TableName=self.TABLE_NAME, Item=OutboxStorage.item(record))
+        except botocore.exceptions.ClientError as error:
+            msg = f"Error persisting {record.PK}. {error}"
+            self.__log().error(msg)
+            raise Exception(msg)
+
+
+class SqliteOutboxStorage:
+    """
+    Outbox kept in a SQLite file, a stand-in for the LTI table shared by the gunicorn workers of one host.
+
+    The records are posted with the tool's token, so the file must be a regular file of the user running the
+    process with mode 0600, see ``open_private``. The pending records are found through an index on their status
+    and due time, like the DUE_INDEX of the table. Failed records are kept for OUTBOX_TTL seconds, as the TTL of
+    the table does, and deleted by a claim at most every PRUNE_INTERVAL seconds.
+    """
+
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path: Optional[str] = None):
+        init_logger("SqliteOutboxStorage")
+        self.path = path if path is not None else os.getenv("OUTBOX_SQLITE_PATH")
+        if not self.path:
+            raise Exception("InvalidParameterException - OUTBOX_SQLITE_PATH is not set")
+        # seconds failed records are kept for inspection
+        self.TTL = int(os.getenv("OUTBOX_TTL", str(7 * 24 * 3600)))
+        os.close(open_private(self.path))
+        self._local = threading.local()
+        self._pruned_at = 0.0
+        connection = self.__connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS outbox (id TEXT PRIMARY KEY, status TEXT, next_attempt_at INTEGER, "
+            "claimed_until INTEGER, record TEXT, ttl INTEGER NOT NULL DEFAULT 0)"
+        )
+        if "ttl" not in [column[1] for column in connection.execute("PRAGMA table_info(outbox)")]:
+            # a file of a version without retention, its failed records are kept from now on
+            connection.execute("ALTER TABLE outbox ADD COLUMN ttl INTEGER NOT NULL DEFAULT 0")
+            connection.execute("UPDATE outbox SET ttl = ?", (int(time.time()) + self.TTL,))
+        connection.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+
+    def __log(self):
+        return logging.getLogger("SqliteOutboxStorage")
+
+    def __connection(self) -> sqlite3.Connection:
+        # one connection per thread, sqlite3 connections are not shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def append(self, record: OutboxRecord) -> bool:
+        record.ttl = int(time.time()) + self.TTL
+        cursor = self.__connection().execute(
+            "INSERT OR IGNORE INTO outbox (id, status, next_attempt_at, claimed_until, record, ttl) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (record.id, record.status, record.next_attempt_at, record.claimed_until, record.json(), record.ttl),
+        )
+        if cursor.rowcount == 0:
+            self.__log().info(f"{record.id} is already in the outbox")
+        return cursor.rowcount == 1
+
+    def claim(self, record: OutboxRecord, lease: int) -> bool:
+        now = int(time.time())
+        cursor = self.__connection().execute(
+            "UPDATE outbox SET claimed_until = ? WHERE id = ? AND status = ? AND claimed_until < ?",
+            (now + lease, record.id, PENDING, now),
+        )
+        if cursor.rowcount == 1:
+            record.claimed_until = now + lease
+        return cursor.rowcount == 1
+
+    def claim_due(self, limit: int, lease: int) -> List[OutboxRecord]:
+        now = int(time.time())
+        connection = self.__connection()
+        if time.monotonic() - self._pruned_at >= self.PRUNE_INTERVAL:
+            self._pruned_at = time.monotonic()
+            self.prune(now)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT record FROM outbox WHERE status = ? AND next_attempt_at <= ? AND claimed_until < ? "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (PENDING, now, now, limit),
+            ).fetchall()
+            records = [OutboxRecord.parse_raw(row[0]) for row in rows]
+            connection.executemany(
+                "UPDATE outbox SET claimed_until = ? WHERE id = ?", [(now + lease, r.id) for r in records]
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        for record in records:
+            record.claimed_until = now + lease
+        return records
+
+    def prune(self, now: int) -> int:
+        """
+        :return: the count of failed records deleted, those kept for OUTBOX_TTL seconds already
+        """
+        cursor = self.__connection().execute(
+            "DELETE FROM outbox WHERE status = ? AND ttl <= ?",
+            (FAILED, now),
+        )
+        if cursor.rowcount:
+            self.__log().info(f"Deleted {cursor.rowcount} failed records of the outbox")
+        return cursor.rowcount
+
+    def delete(self, record: OutboxRecord):
+        self.__connection().execute("DELETE FROM outbox WHERE id = ?", (record.id,))
+
+    def update(self, record: OutboxRecord):
+        record.claimed_until = 0
+        self.__connection().execute(
+            "UPDATE outbox SET status = ?, next_attempt_at = ?, claimed_until = 0, record = ? WHERE id = ?",
+            (record.status, record.next_attempt_at, record.json(), record.id),
+        )
+
+
+_sqlite_storages = {}
+_sqlite_lock = threading.Lock()
+
+
+def outbox_storage():
+    """
+    The outbox of this process: OUTBOX_BACKEND "dynamodb" (the default) or "sqlite".
+    """
+    if os.getenv("OUTBOX_BACKEND", "dynamodb") == "sqlite":
+        path = os.getenv("OUTBOX_SQLITE_PATH")
+        with _sqlite_lock:
+            if path not in _sqlite_storages:
+                _sqlite_storages[path] = SqliteOutboxStorage(path)
+            return _sqlite_storages[path]
+    return OutboxStorage()
@@ -1,15 +1,19 @@
 import json
 import logging
 import os
+import threading
+import time
+from typing import Callable
 from typing import Optional
 
 import botocore
-from boto3.dynamodb.types import TypeDeserializer
-from boto3.dynamodb.types import TypeSerializer
 from pydantic import BaseModel
 
 from app.utility import init_logger
 from app.utility.aws import Aws
+from app.utility.aws import Singleton
+from app.utility.codecs import RecordCodec
+from app.utility.shared_cache import SharedCache
 
 
 class LTIPlatformConfig(BaseModel):
@@ -24,9 +28,19 @@ class LTIPlatformConfig(BaseModel):
     learn_application_secret: Optional[str] = None
 
 
+platform_config_codec = RecordCodec(LTIPlatformConfig)
+
+# attributes of the CONFIG# items left out of the SharedCache, a file on the host's disk, each process keeps its own
+SECRET_ATTRIBUTES = ("learn_application_secret",)
+# attribute of a shared CONFIG# item listing the SECRET_ATTRIBUTES left out of it
+SECRETS_MARKER = "shared_without"
+
+
 class LTIPlatformStorage:
     def __init__(self):
         self.TABLE_NAME = os.getenv("TABLE_NAME")
+        # seconds the CONFIG# items are kept in the SharedCache of the host
+        self.CACHE_TTL = int(os.getenv("PLATFORM_CACHE_TTL", "300"))
         aws = Aws()
         self.ddbclient = aws.dynamodb
 
@@ -36,6 +50,32 @@ class LTIPlatformStorage:
         return cls.instance
 
 
+class PlatformSecrets(metaclass=Singleton):
+    """
+    The SECRET_ATTRIBUTES of the CONFIG# items read by the process, kept for PLATFORM_CACHE_TTL seconds.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def set(self, pk: str, attributes: dict, ttl: int):
+        with self._lock:
+            self._entries[pk] = (attributes, time.monotonic() + ttl)
+
+    def get(self, pk: str, ttl: int, load: Callable[[], dict]) -> dict:
+        """
+        :param load: reads the secret attributes of the item when the process does not have them
+        """
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+        attributes = load()
+        self.set(pk, attributes, ttl)
+        return attributes
+
+
 class LTIPlatform:
     def __init__(
         self,
@@ -57,17 +97,75 @@ class LTIPlatform:
     def __log(self):
         return logging.getLogger("LTIPlatform")
 
+    @staticmethod
+    def key(client_id: str, iss: str, lti_deployment_id: Optional[str]) -> str:
+        return f"CONFIG#{client_id}#{iss}#{lti_deployment_id}"
+
     def load(self, client_id: str, iss: str, lti_deployment_id: Optional[str]):
-        response = self._storage.ddbclient.get_item(
-            TableName=self._storage.TABLE_NAME,
-            Key={"PK": {"S": f"CONFIG#{client_id}#{iss}#{lti_deployment_id}"}},
+        pk = LTIPlatform.key(client_id, iss, lti_deployment_id)
+        loaded = []
+
+        def load_shared() -> Optional[dict]:
+            loaded.append(LTIPlatform.get_item(self._storage, pk))
+            return LTIPlatform.shared_item(pk, loaded[0])
+
+        item = SharedCache().get_or_load(pk, self._storage.CACHE_TTL, load_shared)
+        return self.load_item(pk, loaded[0] if loaded else LTIPlatform.unshared_item(pk, item))
+
+    @staticmethod
+    def get_item(storage: LTIPlatformStorage, pk: str) -> Optional[dict]:
+        response = storage.ddbclient.get_item(
+            TableName=storage.TABLE_NAME,
+            Key={"PK": {"S": pk}},
         )
-        if "Item" in response is not None:
-            deserializer = TypeDeserializer()
-            record = deserializer.deserialize({"M": response["Item"]})
-            self.config = LTIPlatformConfig(**record)
+        return response.get("Item")
+
+    @staticmethod
+    def shared_item(pk: str, item: Optional[dict]) -> Optional[dict]:
+        """
+        :param item: a CONFIG# item read from DynamoDB, its secret attributes are kept by the process
+        :return: the item to put in the SharedCache, without the SECRET_ATTRIBUTES
+        """
+        if item is None:
+            return None
+        secrets = {name: item[name] for name in SECRET_ATTRIBUTES if name in item and "NULL" not in item[name]}
+        if not secrets:
+            return item
+        PlatformSecrets().set(pk, secrets, LTIPlatformStorage().CACHE_TTL)
+        shared = {name: value for name, value in item.items() if name not in secrets}
+        shared[SECRETS_MARKER] = {"SS": sorted(secrets)}
+        return shared
+
+    @staticmethod
+    def unshared_item(pk: str, shared: Optional[dict]) -> Optional[dict]:
+        """
+        :param shared: a CONFIG# item read from the SharedCache
+        :return: the item with the secret attributes of the process, read from DynamoDB if it has none
+        """
+        if shared is None or SECRETS_MARKER not in shared:
+            return shared
+        storage = LTIPlatformStorage()
+
+        def load() -> dict:
+            item = LTIPlatform.get_item(storage, pk) or {}
+            return {name: item[name] for name in shared[SECRETS_MARKER]["SS"] if name in item}
+
+        item = {name: value for name, value in shared.items() if name != SECRETS_MARKER}
+        item.update(PlatformSecrets().get(pk, storage.CACHE_TTL, load))
+        return item
+
+    def load_item(self, pk: str, item: Optional[dict]):
+        """
+        Hydrate from an item that has already been read, e.g. by a batch_get_item.
+
+        :param pk: the platform config partition key
+        :param item: DynamoDB item in attribute-value format, None when no item was found
+        :return: self
+        """
+        if item is not None:
+            self.config = platform_config_codec.decode(item)
         else:
-            msg = f"No PlatformConfig record found for CONFIG#{client_id}#{iss}#{lti_deployment_id}."
+            msg = f"No PlatformConfig record found for {pk}."
             self.__log().warning(msg)
             raise Exception(msg)
         return self
@@ -83,11 +181,11 @@ class LTIPlatform:
         ):
             raise Exception("InvalidParameterException")
 
-        self.config.PK = f"CONFIG#{self.config.client_id}#{self.config.iss}#{self.config.lti_deployment_id}"
+        self.config.PK = LTIPlatform.key(self.config.client_id, self.config.iss, self.config.lti_deployment_id)
         try:
-            serializer = TypeSerializer()
-            item = serializer.serialize(self.config.dict())["M"]
+            item = platform_config_codec.encode(self.config)
             self._storage.ddbclient.put_item(TableName=self._storage.TABLE_NAME, Item=item)
+            SharedCache().delete(self.config.PK)
         except botocore.exceptions.ClientError as error:
             msg = f"Error persisting PlatformConfig for {self.config.PK}. {json.dumps(error)}"
             self.__log().error(msg)
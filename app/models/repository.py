@@ -0,0 +1,119 @@
+import logging
+import time
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+
+import botocore
+from flask import g
+
+from app.models.platform_config import LTIPlatform
+from app.models.platform_config import LTIPlatformStorage
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from app.models.tool_config import LTITool
+from app.models.tool_config import LTIToolStorage
+from app.utility import init_logger
+from app.utility.shared_cache import SharedCache
+
+
+class LTIRepository:
+    """
+    Request-scoped unit of work over the LTI table.
+
+    Keys that are known up front (the state id from the form or cookie, the platform from the id_token) are
+    fetched together with a single batch_get_item by ``prefetch``, the platforms found in the SharedCache of the host
+    are not. The ``LTIState``, ``LTIPlatform`` and ``LTITool`` objects handed out are memoized for the rest of the
+    request, so every controller involved in a request works on the same instances.
+    """
+
+    MAX_BATCH_ATTEMPTS = 5
+
+    def __init__(self):
+        init_logger("LTIRepository")
+        self._items = {}
+        self._states = {}
+        self._platforms = {}
+        self._tool: Optional[LTITool] = None
+
+    def __log(self):
+        return logging.getLogger("LTIRepository")
+
+    def prefetch(self, state_ids: Iterable[str] = (), platforms: Iterable[Tuple[str, str, Optional[str]]] = ()):
+        """
+        Read every given key that has not been read yet in one batch_get_item.
+
+        :param state_ids: ids of STATE# items
+        :param platforms: (client_id, iss, lti_deployment_id) of CONFIG# items
+        :return: self
+        """
+        platform_keys = [LTIPlatform.key(*p) for p in platforms]
+        cache = SharedCache()
+        for key in platform_keys:
+            if key not in self._items:
+                item = cache.get(key)
+                if item is not None:
+                    self._items[key] = LTIPlatform.unshared_item(key, item)
+        keys = [LTIState.key(id) for id in state_ids if id] + platform_keys
+        keys = [k for k in dict.fromkeys(keys) if k not in self._items]
+        if not keys:
+            return self
+
+        storage = LTIStateStorage()
+        request = {storage.TABLE_NAME: {"Keys": [{"PK": {"S": k}} for k in keys]}}
+        for key in keys:
+            self._items[key] = None
+        try:
+            for attempt in range(LTIRepository.MAX_BATCH_ATTEMPTS):
+                response = storage.ddbclient.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(storage.TABLE_NAME, []):
+                    self._items[item["PK"]["S"]] = item
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+                time.sleep(0.05 * 2**attempt)
+        except botocore.exceptions.ClientError as error:
+            msg = f"Error retrieving {keys}. {error}"
+            self.__log().error(msg)
+            raise Exception(msg)
+
+        # Anything still unprocessed is read individually on first use
+        for key in (request or {}).get(storage.TABLE_NAME, {}).get("Keys", []):
+            del self._items[key["PK"]["S"]]
+        ttl = LTIPlatformStorage().CACHE_TTL
+        for key in platform_keys:
+            if key in keys and self._items.get(key) is not None:
+                cache.set(key, LTIPlatform.shared_item(key, self._items[key]), ttl)
+        return self
+
+    def state(self, id: str) -> LTIState:
+        if id not in self._states:
+            key = LTIState.key(id)
+            if key in self._items:
+                self._states[id] = LTIState(LTIStateStorage()).load_item(id, self._items[key])
+            else:
+                self._states[id] = LTIState(LTIStateStorage()).load(id)
+        return self._states[id]
+
+    def platform(self, client_id: str, iss: str, lti_deployment_id: Optional[str]) -> LTIPlatform:
+        key = LTIPlatform.key(client_id, iss, lti_deployment_id)
+        if key not in self._platforms:
+            if key in self._items:
+                self._platforms[key] = LTIPlatform(LTIPlatformStorage()).load_item(key, self._items[key])
+            else:
+                self._platforms[key] = LTIPlatform(LTIPlatformStorage()).load(client_id, iss, lti_deployment_id)
+        return self._platforms[key]
+
+    def tool(self) -> LTITool:
+        if self._tool is None:
+            self._tool = LTITool(LTIToolStorage())
+        return self._tool
+
+
+def lti_repository() -> LTIRepository:
+    """
+    :return: the repository of the current request, created on first use
+    """
+    if "lti_repository" not in g:
+        g.lti_repository = LTIRepository()
+    return g.lti_repository
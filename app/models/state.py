@@ -1,24 +1,25 @@
-import json
 import logging
 import os
+import time
 import uuid
 from datetime import datetime
 from typing import Optional
 
-import boto3
 import botocore
-from boto3.dynamodb.types import TypeDeserializer
-from boto3.dynamodb.types import TypeSerializer
 from pydantic import BaseModel
+from pydantic import Field
 
 from app.utility import init_logger
+from app.utility.aws import Aws
+from app.utility.codecs import CompactStateCodec
+from app.utility.codecs import RecordCodec
 from app.utility.cryptography_client import CryptographyClient
 
 
 class LTIStateRecord(BaseModel):
     PK: str = ""
-    id: str = str(uuid.uuid4())
-    nonce: str = str(uuid.uuid4())
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    nonce: str = Field(default_factory=lambda: str(uuid.uuid4()))
     nonce_count: int = 0
     ttl: int = 0
     data: Optional[dict] = None
@@ -55,17 +56,28 @@ class LTIStateRecord(BaseModel):
             raise e
 
 
+state_record_codec = RecordCodec(LTIStateRecord)
+
+
 class LTIStateStorage:
     def __init__(self):
         self.TABLE_NAME = os.getenv("TABLE_NAME")
         self.TTL = os.getenv("STATE_TTL", "7200")
-        self.ddbclient = boto3.client("dynamodb")
+        # "map" stores every field as a DynamoDB attribute, "compact" packs non-key fields into one binary attribute
+        self.ENCODING = os.getenv("STATE_ENCODING", "map")
+        aws = Aws()
+        self.ddbclient = aws.dynamodb
 
     def __new__(cls):
         if not hasattr(cls, "instance"):
             cls.instance = super(LTIStateStorage, cls).__new__(cls)
         return cls.instance
 
+    @staticmethod
+    def is_expired(item: dict) -> bool:
+        # DynamoDB deletes expired items up to 48 hours after their ttl, so the ttl is enforced here as well
+        return "ttl" in item and 0 < int(item["ttl"]["N"]) <= int(datetime.now().timestamp())
+
 
 class LTIState:
     def __init__(self, lti_storage: LTIStateStorage):
@@ -78,63 +90,176 @@ class LTIState:
             self.__log().error(f"id={self.record.id},nonce={nonce}")
             raise Exception("InvalidParameterException")
 
-        if self.record.nonce != nonce and self.record.nonce_count != 0:
+        if self.record.nonce != nonce or self.record.nonce_count != 0:
             self.__log().warning("Invalid state")
             return False
         else:
             try:
                 self._storage.ddbclient.update_item(
                     TableName=self._storage.TABLE_NAME,
-                    Key={"PK": {"S": f"STATE#{self.record.id}"}},
+                    Key={"PK": {"S": LTIState.key(self.record.id)}},
                     UpdateExpression="ADD nonce_count :inc",
-                    ConditionExpression="nonce = :nonce AND nonce_count = :nonce_count",
+                    ConditionExpression="nonce = :nonce AND nonce_count = :nonce_count AND #ttl > :now",
+                    ExpressionAttributeNames={"#ttl": "ttl"},
                     ExpressionAttributeValues={
                         ":inc": {"N": "1"},
-                        ":nonce": {"S": self.record.nonce},
+                        ":nonce": {"S": nonce},
                         ":nonce_count": {"N": "0"},
+                        ":now": {"N": str(int(datetime.now().timestamp()))},
                     },
                 )
+                self.record.nonce_count += 1
                 return True
             except botocore.exceptions.ClientError as error:
-                msg = f"Error persisting State record for STATE#{self.record.id}. {json.dumps(error)}"
+                if error.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                    self.__log().warning(f"Invalid state, STATE#{self.record.id} already validated or expired")
+                    return False
+                msg = f"Error persisting State record for STATE#{self.record.id}. {error}"
                 self.__log().error(msg)
                 raise Exception(msg)
 
     def __log(self):
         return logging.getLogger("LTIPlatform")
 
+    @staticmethod
+    def key(id: str) -> str:
+        return f"STATE#{id}"
+
     def load(self, id: str):
         try:
             response = self._storage.ddbclient.get_item(
                 TableName=self._storage.TABLE_NAME,
-                Key={"PK": {"S": f"STATE#{id}"}},
+                Key={"PK": {"S": LTIState.key(id)}},
             )
-            if "Item" in response:
-                deserializer = TypeDeserializer()
-                r = deserializer.deserialize({"M": response["Item"]})
-                self.record = LTIStateRecord(**r)
+            return self.load_item(id, response.get("Item"))
+        except botocore.exceptions.ClientError as error:
+            msg = f"Error retrieving State for STATE#{self.id()}. {error}"
+            self.__log().error(msg)
+            raise Exception(msg)
+
+    def load_item(self, id: str, item: Optional[dict]):
+        """
+        Hydrate from an item that has already been read, e.g. by a batch_get_item.
+
+        :param id: the state id
+        :param item: DynamoDB item in attribute-value format, None when no item was found
+        :return: self
+        """
+        if item is not None and LTIStateStorage.is_expired(item):
+            self.__log().warning(f"State record STATE#{id} has expired.")
 
+        elif item is not None:
+            if CompactStateCodec.is_compact(item):
+                self.record = LTIStateRecord(**CompactStateCodec.decode(item))
             else:
-                self.__log().warning(f"No State record found for STATE#{id}.")
+                self.record = state_record_codec.decode(item)
 
-            return self
+        else:
+            self.__log().warning(f"No State record found for STATE#{id}.")
+
+        return self
+
+    def save(self):
+        try:
+            self._storage.ddbclient.put_item(TableName=self._storage.TABLE_NAME, Item=self.__item())
         except botocore.exceptions.ClientError as error:
-            msg = f"Error retrieving State for STATE#{self.id()}. {json.dumps(error)}"
+            msg = f"Error persisting State for {self.record.PK}. {error}"
             self.__log().error(msg)
             raise Exception(msg)
+        return self
 
-    def save(self):
-        self.record.PK = f"STATE#{self.record.id}"
+    def validate_and_save(self, nonce: str) -> bool:
+        """
+        ``validate`` and ``save`` in one conditional put: the record is saved with its nonce used only if the stored
+        nonce is ``nonce``, has not been used and the state has not expired.
+
+        :return: whether the nonce was valid, nothing is saved when it was not
+        """
+        if self.record.id is None or nonce is None:
+            self.__log().error(f"id={self.record.id},nonce={nonce}")
+            raise Exception("InvalidParameterException")
+
+        if self.record.nonce != nonce or self.record.nonce_count != 0:
+            self.__log().warning("Invalid state")
+            return False
+
+        self.record.nonce_count = 1
+        try:
+            self._storage.ddbclient.put_item(
+                TableName=self._storage.TABLE_NAME,
+                Item=self.__item(),
+                ConditionExpression="nonce = :nonce AND nonce_count = :nonce_count AND #ttl > :now",
+                ExpressionAttributeNames={"#ttl": "ttl"},
+                ExpressionAttributeValues={
+                    ":nonce": {"S": nonce},
+                    ":nonce_count": {"N": "0"},
+                    ":now": {"N": str(int(datetime.now().timestamp()))},
+                },
+            )
+            return True
+        except botocore.exceptions.ClientError as error:
+            self.record.nonce_count = 0
+            if error.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                self.__log().warning(f"Nonce of {self.record.PK} already used or expired")
+                return False
+            msg = f"Error persisting State for {self.record.PK}. {error}"
+            self.__log().error(msg)
+            raise Exception(msg)
+
+    def __item(self) -> dict:
+        self.record.PK = LTIState.key(self.record.id)
         self.record.ttl = int(datetime.now().timestamp()) + int(
             self._storage.TTL
         )  # this will auto expire the state in DDB
+        if self._storage.ENCODING == "compact":
+            return CompactStateCodec.encode(self.record.dict())
+        return state_record_codec.encode(self.record)
 
+    @staticmethod
+    def delete_expired(lti_storage: LTIStateStorage, batch_size: int = 25, max_attempts: int = 5) -> int:
+        """
+        Bulk delete STATE# items whose ttl has passed but that DynamoDB has not removed yet.
+
+        :param lti_storage: the state storage
+        :param batch_size: keys per batch_write_item request, DynamoDB accepts at most 25
+        :param max_attempts: attempts per batch while DynamoDB returns UnprocessedItems
+        :return: number of deleted items
+        """
+        deleted = 0
+        scan_kwargs = dict(
+            TableName=lti_storage.TABLE_NAME,
+            ProjectionExpression="PK",
+            FilterExpression="begins_with(PK, :prefix) AND #ttl <= :now",
+            ExpressionAttributeNames={"#ttl": "ttl"},
+            ExpressionAttributeValues={
+                ":prefix": {"S": "STATE#"},
+                ":now": {"N": str(int(datetime.now().timestamp()))},
+            },
+        )
         try:
-            serializer = TypeSerializer()
-            item = serializer.serialize(self.record.dict())["M"]
-            self._storage.ddbclient.put_item(TableName=self._storage.TABLE_NAME, Item=item)
+            while True:
+                response = lti_storage.ddbclient.scan(**scan_kwargs)
+                keys = [{"PK": item["PK"]} for item in response.get("Items", [])]
+                for i in range(0, len(keys), batch_size):
+                    requests = [{"DeleteRequest": {"Key": key}} for key in keys[i : i + batch_size]]
+                    deleted += LTIState.__batch_delete(lti_storage, requests, max_attempts)
+                if "LastEvaluatedKey" not in response:
+                    break
+                scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
         except botocore.exceptions.ClientError as error:
-            msg = f"Error persisting State for {self.record.PK}. {json.dumps(error)}"
-            self.__log().error(msg)
+            msg = f"Error deleting expired State records. {error}"
+            logging.error(msg)
             raise Exception(msg)
-        return self
+        return deleted
+
+    @staticmethod
+    def __batch_delete(lti_storage: LTIStateStorage, requests: list, max_attempts: int) -> int:
+        total = len(requests)
+        for attempt in range(max_attempts):
+            response = lti_storage.ddbclient.batch_write_item(RequestItems={lti_storage.TABLE_NAME: requests})
+            requests = response.get("UnprocessedItems", {}).get(lti_storage.TABLE_NAME, [])
+            if not requests:
+                return total
+            time.sleep(0.05 * 2**attempt)
+        logging.warning(f"{len(requests)} expired State records left unprocessed")
+        return total - len(requests)
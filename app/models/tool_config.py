@@ -1,6 +1,10 @@
 import logging
 import os
+import threading
+import time
+from typing import Callable
 from typing import Optional
+from typing import Tuple
 
 import botocore
 from pydantic import BaseModel
@@ -9,6 +13,9 @@ from app.models.jwks import Jwk
 from app.models.jwks import JwkStorage
 from app.utility import init_logger
 from app.utility.aws import Aws
+from app.utility.aws import Singleton
+from app.utility.metrics import Metrics
+from app.utility.shared_cache import SharedCache
 
 class LTIToolConfig(BaseModel):
     url: str
@@ -34,20 +41,78 @@ class LTIToolStorage:
             cls.instance = super(LTIToolStorage, cls).__new__(cls)
         return cls.instance
 
+
+class ToolConfigCache(metaclass=Singleton):
+    """
+    The tool's configuration from SSM and its JWKS, shared by every LTITool of the process for TOOL_CONFIG_TTL
+    seconds, 0 reads them for every LTITool. The process loads them from the SharedCache of the host, kept there for
+    as long, so a key added by another process is published after at most twice that long. The SharedCache is a file
+    on the host's disk, the Learn application secret is left out of it: a process that did not read the
+    configuration itself reads the secret.
+    """
+
+    SHARED_KEY = "TOOL"
+
+    def __init__(self):
+        self.ttl = int(os.getenv("TOOL_CONFIG_TTL", "300"))
+        self._entry: Optional[Tuple[LTIToolConfig, dict, float]] = None
+        self._lock = threading.Lock()
+
+    def get(
+        self, load: Callable[[], Tuple[LTIToolConfig, dict]], load_secret: Callable[[], Optional[str]]
+    ) -> Tuple[LTIToolConfig, dict]:
+        """
+        :param load: reads the configuration and the JWKS
+        :param load_secret: reads the Learn application secret
+        :return: the cached configuration and JWKS, or new ones. They are loaded once however many threads need them
+            at the same time.
+        """
+        with self._lock:
+            hit = self._entry is not None and self._entry[2] > time.monotonic()
+            Metrics().cache("ToolConfig", hit=hit)
+            if not hit:
+                loaded = []
+
+                def load_shared() -> dict:
+                    loaded.append(load())
+                    return self.__dump(*loaded[0])
+
+                shared = SharedCache().get_or_load(ToolConfigCache.SHARED_KEY, self.ttl, load_shared)
+                if loaded:
+                    config = loaded[0][0]
+                else:
+                    config = LTIToolConfig(**shared["config"])
+                    config.learn_app_secret = load_secret() if config.learn_app_key else None
+                self._entry = (config, shared["jwks"], time.monotonic() + self.ttl)
+            return self._entry[0], self._entry[1]
+
+    @staticmethod
+    def __dump(config: LTIToolConfig, jwks: dict) -> dict:
+        return dict(config=config.dict(exclude={"learn_app_secret"}), jwks=jwks)
+
+    def invalidate(self):
+        self._entry = None
+        SharedCache().delete(ToolConfigCache.SHARED_KEY)
+
+
 class LTITool:
     def __init__(self, lti_storage: LTIToolStorage):
         init_logger("LTITool")
         self._storage: LTIToolStorage = lti_storage
-        self.config = LTIToolConfig(
+        self.config, self.jwks = ToolConfigCache().get(self.__load, self.__get_learn_app_secret)
+
+    def __load(self) -> Tuple[LTIToolConfig, dict]:
+        config = LTIToolConfig(
             url=self.__get_url(),
             learn_app_key=self.__get_learn_app_key(),
             learn_app_secret=self.__get_learn_app_secret(),
         )
-        self.jwks = Jwk.all(JwkStorage())
+        return config, Jwk.all(JwkStorage())
 
     def set_learn_app_key_and_secret(self, key: str, secret: str):
         self.__set_learn_app_key(key)
         self.__set_learn_app_secret(secret)
+        ToolConfigCache().invalidate()
         return LTITool(lti_storage=self._storage)
 
     def tool_kids(self):
@@ -1,11 +1,34 @@
 import logging
 import os
+import threading
+
+log_level = None
+_configured = set()
+# the handlers of the root logger given the structured_logging filters
+_handlers = []
+_lock = threading.Lock()
 
 
 def init_logger(logger_name):
+    """
+    Set the level of a logger to LOG_LEVEL, DEBUG when it is not a level name. LOG_LEVEL is read by the first call,
+    later calls for the same logger return at once. Every call configures the handlers added to the root logger
+    since the previous one, e.g. by the Lambda runtime or gunicorn, see ``structured_logging.configure``.
+    """
     global log_level
-    log_level = str(os.environ.get("LOG_LEVEL")).upper()
-    if log_level not in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
-        log_level = "DEBUG"
-    logging.getLogger(logger_name).setLevel(log_level)
-    logging.getLogger().setLevel("INFO")
+    root = logging.getLogger()
+    if logger_name in _configured and root.handlers == _handlers:
+        return
+    with _lock:
+        first = log_level is None
+        if first:
+            level = str(os.environ.get("LOG_LEVEL")).upper()
+            log_level = level if level in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] else "DEBUG"
+            root.setLevel("INFO")
+        if first or root.handlers != _handlers:
+            from app.utility import structured_logging
+
+            structured_logging.configure(root)
+            _handlers[:] = root.handlers
+        logging.getLogger(logger_name).setLevel(log_level)
+        _configured.add(logger_name)
@@ -0,0 +1,399 @@
+import contextvars
+import datetime
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+from cachetools import LRUCache
+from cachetools import TTLCache
+from pydantic import BaseModel
+
+from app.models.platform_config import LTIPlatform
+from app.models.tool_config import LTITool
+from app.utility import init_logger
+from app.utility.aws import Singleton
+from app.utility.fanout import remaining
+from app.utility.http_client import HttpClient
+from app.utility.metrics import Metrics
+from app.utility.token_client import GrantType
+from app.utility.token_client import TokenClient
+
+SCORE = "application/vnd.ims.lis.v1.score+json"
+LINEITEM = "application/vnd.ims.lis.v2.lineitem+json"
+LINEITEM_CONTAINER = "application/vnd.ims.lis.v2.lineitemcontainer+json"
+
+
+class ScorePublishReport(BaseModel):
+    published: int = 0
+    # userId, status and error of the failed scores, the first ``max_failures`` of them
+    failed: List[dict] = []
+    failures: int = 0
+    # scores still being posted when the deadline passed, they may have been published or not
+    in_flight: int = 0
+    # scores published per line item
+    line_items: Dict[str, int] = {}
+    seconds: float = 0
+
+
+class LineItemIndex:
+    """
+    The line items of one context, indexed by resourceId and tag.
+    """
+
+    def __init__(self, line_items: Iterable[dict] = ()):
+        self.line_items = []
+        self.by_resource_id = {}
+        self.by_tag = {}
+        for line_item in line_items:
+            self.add(line_item)
+
+    def add(self, line_item: dict):
+        self.line_items.append(line_item)
+        if line_item.get("resourceId"):
+            self.by_resource_id.setdefault(line_item["resourceId"], []).append(line_item)
+        if line_item.get("tag"):
+            self.by_tag.setdefault(line_item["tag"], []).append(line_item)
+
+    def find(self, resource_id: Optional[str] = None, tag: Optional[str] = None) -> List[dict]:
+        if resource_id is not None:
+            found = self.by_resource_id.get(resource_id, [])
+            return [line_item for line_item in found if tag is None or line_item.get("tag") == tag]
+        if tag is not None:
+            return list(self.by_tag.get(tag, []))
+        return list(self.line_items)
+
+
+# platform hosts whose AGS_HOST_CONCURRENCY slots are kept, a host evicted while in use gets new ones
+HOST_SLOTS = 1000
+# locks the listings of the contexts are spread over, by lineitems URL
+LINE_ITEM_LOCK_STRIPES = 64
+
+
+class LineItemCache(metaclass=Singleton):
+    """
+    Process wide cache of the line items of a context, keyed by its lineitems URL, for LINE_ITEM_CACHE_TTL seconds.
+    At most LINE_ITEM_CACHE_CONTEXTS contexts are kept. A context is listed once however many threads need it at the
+    same time: the listings hold the one of LINE_ITEM_LOCK_STRIPES locks the hash of the URL designates, so that the
+    locks are not kept per context after the context is evicted.
+    """
+
+    def __init__(self):
+        self.ttl = int(os.getenv("LINE_ITEM_CACHE_TTL", "300"))
+        self._contexts = TTLCache(maxsize=int(os.getenv("LINE_ITEM_CACHE_CONTEXTS", "1000")), ttl=self.ttl)
+        self._locks = [threading.Lock() for _ in range(LINE_ITEM_LOCK_STRIPES)]
+        self._lock = threading.Lock()
+
+    def get(self, lineitems_url: str, load: Callable[[], Iterable[dict]]) -> LineItemIndex:
+        """
+        :param lineitems_url: the lineitems endpoint of the context
+        :param load: lists every line item of the context
+        :return: the cached index of the context's line items, or a new one
+        """
+        with self._lock:
+            index = self._contexts.get(lineitems_url)
+            if index is not None:
+                Metrics().cache("LineItems", hit=True)
+                return index
+        with self._locks[hash(lineitems_url) % len(self._locks)]:
+            with self._lock:
+                index = self._contexts.get(lineitems_url)
+            Metrics().cache("LineItems", hit=index is not None)
+            if index is None:
+                index = LineItemIndex(load())
+                with self._lock:
+                    self._contexts[lineitems_url] = index
+        return index
+
+    def add(self, lineitems_url: str, line_item: dict):
+        """
+        Add a line item created by the tool to its context, if the context is cached.
+        """
+        with self._lock:
+            index = self._contexts.get(lineitems_url)
+            if index is not None:
+                index.add(line_item)
+
+    def invalidate(self, lineitems_url: str):
+        with self._lock:
+            self._contexts.pop(lineitems_url, None)
+
+
+class AgsClient:
+    """
+    Assignment and Grade Services client.
+    https://www.imsglobal.org/spec/lti-ags/v2p0
+
+    Scores are posted with the platform's client credentials token, cached by TokenClient, from a pool of
+    AGS_MAX_WORKERS threads with at most AGS_HOST_CONCURRENCY requests in flight per platform host. 429 and 5xx
+    responses are retried by HttpClient, honouring Retry-After.
+
+    The calls of the pool run in a copy of the caller's context, as the steps of FanOut do: they see the same Flask
+    request and deadline, and are not waited for past it, see ``app.utility.fanout``.
+    """
+
+    # shared by every client of the process, the limit is per platform host not per client, the hosts used last
+    _host_slots = LRUCache(maxsize=HOST_SLOTS)
+    _host_slots_lock = threading.Lock()
+
+    def __init__(
+        self,
+        platform: LTIPlatform,
+        tool: LTITool,
+        max_workers: Optional[int] = None,
+        host_concurrency: Optional[int] = None,
+    ):
+        init_logger("AgsClient")
+        self.platform = platform
+        self.tool = tool
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv("AGS_MAX_WORKERS", "16"))
+        self.host_concurrency = (
+            host_concurrency if host_concurrency is not None else int(os.getenv("AGS_HOST_CONCURRENCY", "8"))
+        )
+
+    def __log(self):
+        return logging.getLogger("AgsClient")
+
+    @staticmethod
+    def score(
+        user_id: str,
+        score_given: float,
+        score_maximum: float,
+        comment: Optional[str] = None,
+        activity_progress: str = "Completed",
+        grading_progress: str = "FullyGraded",
+    ) -> dict:
+        score = dict(
+            userId=user_id,
+            scoreGiven=score_given,
+            scoreMaximum=score_maximum,
+            activityProgress=activity_progress,
+            gradingProgress=grading_progress,
+            timestamp=datetime.datetime.now(tz=datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        )
+        if comment is not None:
+            score["comment"] = comment
+        return score
+
+    @staticmethod
+    def scores_url(lineitem_url: str) -> str:
+        parts = urlsplit(lineitem_url)
+        return urlunsplit(parts._replace(path=parts.path.rstrip("/") + "/scores"))
+
+    def publish_score(self, lineitem_url: str, score: dict):
+        """
+        :param lineitem_url: the line item, e.g. the endpoint_lineitem of the launch
+        :param score: the score, see ``AgsClient.score``
+        :return: the platform's response
+        """
+        url = AgsClient.scores_url(lineitem_url)
+        with self.__host_slot(url):
+            response = self.__post(url, score)
+            if response.status_code == 401:
+                TokenClient.invalidate_bearer_token(self.platform)
+                response = self.__post(url, score)
+        if not response.ok:
+            self.__log().error(f"Error publishing score to {url}. {response.status_code}: {response.text}")
+        return response
+
+    def line_item(self, lineitem_url: str) -> dict:
+        """
+        :param lineitem_url: the line item, e.g. the endpoint_lineitem of the launch
+        :return: the line item, with its scoreMaximum, label, resourceId and tag
+        """
+        response = self.__send("GET", lineitem_url, headers={"Accept": LINEITEM})
+        if not response.ok:
+            msg = f"Error retrieving line item {lineitem_url}. {response.status_code}: {response.text}"
+            self.__log().error(msg)
+            raise Exception(msg)
+        return response.json()
+
+    def list_line_items(self, lineitems_url: str) -> Iterator[dict]:
+        """
+        :param lineitems_url: the endpoint_lineitems of the launch
+        :return: generator of the context's line items, following the ``rel="next"`` links, LINE_ITEM_PAGE_SIZE per
+            page
+        """
+        parts = urlsplit(lineitems_url)
+        query = "&".join(filter(None, [parts.query, f"limit={os.getenv('LINE_ITEM_PAGE_SIZE', '100')}"]))
+        url = urlunsplit(parts._replace(query=query))
+        while url is not None:
+            response = self.__send("GET", url, headers={"Accept": LINEITEM_CONTAINER})
+            if response.status_code != 200:
+                msg = f"Error retrieving line items from {url}. {response.status_code}: {response.text}"
+                self.__log().error(msg)
+                raise Exception(msg)
+            url = response.links["next"]["url"] if "next" in response.links else None
+            yield from response.json()
+
+    def line_items(
+        self, lineitems_url: str, resource_id: Optional[str] = None, tag: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Line items of a context by resourceId and/or tag, from LineItemCache. The context is listed once and then
+        served from the cache for LINE_ITEM_CACHE_TTL seconds.
+
+        :param lineitems_url: the endpoint_lineitems of the launch
+        :param resource_id: only the line items with this resourceId
+        :param tag: only the line items with this tag
+        """
+        index = LineItemCache().get(lineitems_url, lambda: list(self.list_line_items(lineitems_url)))
+        return index.find(resource_id, tag)
+
+    def create_line_item(self, lineitems_url: str, line_item: dict) -> dict:
+        """
+        :param lineitems_url: the endpoint_lineitems of the launch
+        :param line_item: the line item, with at least its label and scoreMaximum
+        :return: the line item created by the platform, with its id
+        """
+        response = self.__send("POST", lineitems_url, json=line_item, headers={"Content-Type": LINEITEM})
+        if response.status_code not in (200, 201):
+            msg = f"Error creating line item {line_item.get('label')}. {response.status_code}: {response.text}"
+            self.__log().error(msg)
+            raise Exception(msg)
+        created = response.json()
+        LineItemCache().add(lineitems_url, created)
+        return created
+
+    def create_line_items(self, lineitems_url: str, line_items: List[dict]) -> List[dict]:
+        """
+        Create many line items concurrently, e.g. for the content items of one deep linking response.
+
+        :return: the created line items, in the order of ``line_items``
+        :raise Exception: when any of them could not be created, once all of them were tried
+        """
+        # request the token once up front rather than from every worker
+        self.__headers()
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(line_items), 1)))
+        try:
+            futures = [self.__submit(executor, self.create_line_item, lineitems_url, item) for item in line_items]
+            _, pending = AgsClient.__wait(futures)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if pending:
+            msg = f"Deadline exceeded creating {len(pending)} of {len(line_items)} line items"
+            self.__log().error(msg)
+            raise TimeoutError(msg)
+        errors = [str(future.exception()) for future in futures if future.exception() is not None]
+        if errors:
+            raise Exception(f"{len(errors)} of {len(line_items)} line items were not created. {errors[0]}")
+        return [future.result() for future in futures]
+
+    def publish_scores(self, lineitem_url: str, scores: Iterable[dict]) -> ScorePublishReport:
+        """
+        Publish many scores to one line item concurrently, see ``AgsClient.publish``.
+        """
+        return self.publish((lineitem_url, score) for score in scores)
+
+    def publish(self, items: Iterable[Tuple[str, dict]], max_failures: Optional[int] = None) -> ScorePublishReport:
+        """
+        Publish (line item URL, score) pairs concurrently. ``items`` is consumed as the pool frees up, at most twice
+        the number of workers are queued at any time. Once the deadline of the request has passed, the scores that
+        were not being posted yet are not posted and are reported as failed. Those being posted are counted as
+        ``in_flight``: their thread is not stopped, the platform may still accept them.
+
+        :param max_failures: failed scores to list in the report, all of them by default, the rest are only counted
+        :return: the count of scores published, per line item, and the userId, status and error of those that failed
+        """
+        report = ScorePublishReport()
+        start = time.perf_counter()
+        # request the token once up front rather than from every worker
+        self.__headers()
+
+        def fail(score: dict, status: Optional[int], error: str):
+            report.failures += 1
+            if max_failures is None or len(report.failed) < max_failures:
+                report.failed.append(dict(userId=score.get("userId"), status=status, error=error))
+
+        def collect(future, item):
+            lineitem_url, score = item
+            if not future.done():
+                if future.cancel():
+                    fail(score, None, "Deadline exceeded")
+                else:
+                    report.in_flight += 1
+                return
+            try:
+                response = future.result()
+                if response.ok:
+                    report.published += 1
+                    report.line_items[lineitem_url] = report.line_items.get(lineitem_url, 0) + 1
+                    return
+                fail(score, response.status_code, response.text)
+            except Exception as e:
+                fail(score, None, str(e))
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            pending = {}
+            for item in items:
+                left = remaining()
+                if left is not None and left <= 0:
+                    fail(item[1], None, "Deadline exceeded")
+                    continue
+                pending[self.__submit(executor, self.publish_score, *item)] = item
+                if len(pending) >= 2 * self.max_workers:
+                    done, _ = AgsClient.__wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future, pending.pop(future))
+            AgsClient.__wait(pending)
+            for future in list(pending):
+                collect(future, pending.pop(future))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        report.seconds = time.perf_counter() - start
+        return report
+
+    @staticmethod
+    def __submit(executor: ThreadPoolExecutor, call: Callable, *args):
+        # in a copy of the caller's context, a Context cannot be entered by two threads at once
+        return executor.submit(contextvars.copy_context().run, call, *args)
+
+    @staticmethod
+    def __wait(futures, return_when: str = ALL_COMPLETED):
+        """
+        :return: the done and pending futures, once they are done or the deadline of the request has passed
+        """
+        left = remaining()
+        return wait(futures, timeout=None if left is None else max(left, 0), return_when=return_when)
+
+    def __post(self, url: str, score: dict):
+        # a score carries its timestamp, posting it again is idempotent so 429/5xx responses are retried
+        return HttpClient().post(url, json=score, headers={**self.__headers(), "Content-Type": SCORE}, retry=True)
+
+    def __send(self, method: str, url: str, headers: dict, **kwargs):
+        with self.__host_slot(url):
+            response = HttpClient().request(method, url, headers={**self.__headers(), **headers}, **kwargs)
+            if response.status_code == 401:
+                TokenClient.invalidate_bearer_token(self.platform)
+                response = HttpClient().request(method, url, headers={**self.__headers(), **headers}, **kwargs)
+        return response
+
+    def __headers(self) -> dict:
+        access_token = TokenClient.request_bearer_token(
+            platform=self.platform, grantType=GrantType.CLIENT_CREDENTIALS, tool=self.tool
+        )
+        return {"Authorization": f"Bearer {access_token}"}
+
+    def __host_slot(self, url: str) -> threading.BoundedSemaphore:
+        # a client with another host_concurrency has slots of its own
+        key = (urlsplit(url).netloc, self.host_concurrency)
+        with AgsClient._host_slots_lock:
+            slots = AgsClient._host_slots.get(key)
+            if slots is None:
+                slots = AgsClient._host_slots[key] = threading.BoundedSemaphore(self.host_concurrency)
+            return slots
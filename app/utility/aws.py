@@ -1,4 +1,5 @@
-import boto3
+import os
+import threading
 
 
 class Singleton(type):
@@ -10,11 +11,93 @@ class Singleton(type):
         return cls._instances[cls]
 
 
+def client_config():
+    """
+    Shared botocore configuration for every AWS client of the process.
+
+    AWS_MAX_POOL_CONNECTIONS should match the number of requests served at the same time, gunicorn sets it from its
+    ``threads`` or, with gevent workers, ``worker_connections`` setting, up to 50. The timeouts are kept well below the
+    Lambda and gunicorn request timeouts.
+    """
+    # botocore and boto3 are imported on first use, they dominate the import time of the app
+    from botocore.config import Config
+
+    options = dict(
+        max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "10")),
+        connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT", "1")),
+        read_timeout=float(os.getenv("AWS_READ_TIMEOUT", "3")),
+        retries={"mode": "adaptive", "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", "3"))},
+    )
+    # tcp_keepalive is only known to botocore 1.27.84 and later
+    if "tcp_keepalive" in Config.OPTION_DEFAULTS:
+        options["tcp_keepalive"] = True
+    return Config(**options)
+
+
 class Aws(metaclass=Singleton):
+    """
+    Process wide AWS clients, each created on first use with ``client_config()``.
+
+    Clients passed as keyword arguments (ssm, dynamodb, dynamodb_resource, kms) are used as they are.
+    """
+
     def __init__(self, **kwargs):
-        self.ssm = kwargs["ssm"] if "ssm" in kwargs else boto3.client("ssm")
-        self.dynamodb = kwargs["dynamodb"] if "dynamodb" in kwargs else boto3.client("dynamodb")
-        self.dynamodb_resource = (
-            kwargs["dynamodb_resource"] if "dynamodb_resource" in kwargs else boto3.resource("dynamodb")
-        )
-        self.kms = kwargs["kms"] if "kms" in kwargs else boto3.client("kms")
+        names = ("ssm", "dynamodb", "dynamodb_resource", "kms")
+        self._clients = {name: kwargs[name] for name in names if name in kwargs}
+        self._lock = threading.Lock()
+        self._session = None
+        self._config = None
+
+    @property
+    def config(self):
+        if self._config is None:
+            self._config = client_config()
+        return self._config
+
+    @property
+    def ssm(self):
+        return self.__get("ssm")
+
+    @property
+    def dynamodb(self):
+        return self.__get("dynamodb")
+
+    @property
+    def dynamodb_resource(self):
+        return self.__get("dynamodb_resource")
+
+    @property
+    def kms(self):
+        return self.__get("kms")
+
+    def reset_clients(self):
+        """
+        Drop the clients, e.g. in a process forked from the one that created them: the connection pools of a client
+        must not be shared between processes. The session and the service models it has loaded are kept.
+        """
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def __get(self, name: str):
+        client = self._clients.get(name)
+        if client is None:
+            # boto3 sessions are not thread safe, clients are created one at a time from a private session
+            with self._lock:
+                if name not in self._clients:
+                    self._clients[name] = self.__create(name)
+                client = self._clients[name]
+        return client
+
+    def __create(self, name: str):
+        import boto3
+
+        if self._session is None:
+            from app.utility import metrics
+            from app.utility import server_timing
+
+            self._session = boto3.session.Session()
+            server_timing.instrument_boto_session(self._session)
+            metrics.instrument_boto_session(self._session)
+        if name == "dynamodb_resource":
+            return self._session.resource("dynamodb", config=self.config)
+        return self._session.client(name, config=self.config)
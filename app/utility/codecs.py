@@ -0,0 +1,155 @@
+import json
+import zlib
+
+
+class CompactStateCodec:
+    """
+    Stores a state record as a handful of top-level attributes plus a single zlib compressed binary attribute.
+
+    ``PK`` is the partition key, ``nonce``/``nonce_count`` are referenced by the conditional update in
+    ``LTIState.validate`` and ``ttl`` is the table's time to live attribute, so those stay top-level. Everything
+    else (the platform ``id_token``, the KMS ciphertexts and ``data``) is packed into ``BLOB_ATTRIBUTE``.
+    """
+
+    KEY_ATTRIBUTES = ("PK", "nonce", "nonce_count", "ttl")
+    BLOB_ATTRIBUTE = "blob"
+    COMPRESSION_LEVEL = 6
+
+    @staticmethod
+    def encode(record: dict) -> dict:
+        """
+        :param record: plain dict of the record, as returned by ``LTIStateRecord.dict()``
+        :return: DynamoDB item in attribute-value format
+        """
+        packed = {k: v for k, v in record.items() if k not in CompactStateCodec.KEY_ATTRIBUTES}
+        blob = zlib.compress(
+            json.dumps(packed, separators=(",", ":")).encode("utf-8"),
+            CompactStateCodec.COMPRESSION_LEVEL,
+        )
+        return {
+            "PK": {"S": record["PK"]},
+            "nonce": {"S": record["nonce"]},
+            "nonce_count": {"N": str(int(record["nonce_count"]))},
+            "ttl": {"N": str(int(record["ttl"]))},
+            CompactStateCodec.BLOB_ATTRIBUTE: {"B": blob},
+        }
+
+    @staticmethod
+    def decode(item: dict) -> dict:
+        """
+        :param item: DynamoDB item in attribute-value format, as returned by ``get_item``
+        :return: plain dict suitable for ``LTIStateRecord(**record)``
+        """
+        blob = item[CompactStateCodec.BLOB_ATTRIBUTE]["B"]
+        record = json.loads(zlib.decompress(bytes(blob)).decode("utf-8"))
+        record["PK"] = item["PK"]["S"]
+        record["nonce"] = item["nonce"]["S"]
+        record["nonce_count"] = int(item["nonce_count"]["N"])
+        record["ttl"] = int(item["ttl"]["N"])
+        return record
+
+    @staticmethod
+    def is_compact(item: dict) -> bool:
+        return CompactStateCodec.BLOB_ATTRIBUTE in item
+
+
+class RecordCodec:
+    """
+    Maps a pydantic record to a DynamoDB item and back without going through TypeSerializer/TypeDeserializer,
+    ``.dict()`` and ``Decimal``.
+
+    One converter per field is picked up front from the model's field list, so encoding and decoding a record is a
+    loop over precompiled (name, converter) pairs. Only the contents of ``dict`` fields are converted value by value.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._encoders = []
+        self._decoders = []
+        for name, field in model.__fields__.items():
+            encoder, decoder = RecordCodec.__converters(field.type_)
+            self._encoders.append((name, encoder))
+            self._decoders.append((name, decoder))
+
+    def encode(self, record) -> dict:
+        """
+        :param record: an instance of the codec's model
+        :return: DynamoDB item in attribute-value format
+        """
+        item = {}
+        for name, encoder in self._encoders:
+            value = getattr(record, name)
+            item[name] = _NULL if value is None else encoder(value)
+        return item
+
+    def decode(self, item: dict):
+        """
+        :param item: DynamoDB item in attribute-value format
+        :return: an instance of the codec's model; values are trusted and not validated again
+        """
+        values = {}
+        for name, decoder in self._decoders:
+            if name in item:
+                value = item[name]
+                values[name] = None if "NULL" in value else decoder(value)
+        return self.model.construct(**values)
+
+    @staticmethod
+    def __converters(type_):
+        if type_ is str:
+            return (lambda v: {"S": v}), (lambda a: a["S"])
+        if type_ is bool:
+            return (lambda v: {"BOOL": v}), (lambda a: a["BOOL"])
+        if type_ is int:
+            return (lambda v: {"N": str(v)}), (lambda a: int(a["N"]))
+        if type_ is dict:
+            return (lambda v: {"M": _encode_map(v)}), (lambda a: _decode_map(a["M"]))
+        return _encode_value, _decode_value
+
+
+_NULL = {"NULL": True}
+
+
+def _encode_map(value: dict) -> dict:
+    return {k: _encode_value(v) for k, v in value.items()}
+
+
+def _decode_map(value: dict) -> dict:
+    return {k: _decode_value(v) for k, v in value.items()}
+
+
+def _encode_value(value) -> dict:
+    if value is None:
+        return _NULL
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float)):
+        return {"N": str(value)}
+    if isinstance(value, dict):
+        return {"M": _encode_map(value)}
+    if isinstance(value, (list, tuple)):
+        return {"L": [_encode_value(v) for v in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": bytes(value)}
+    raise TypeError(f"Unsupported type {type(value)} for DynamoDB attribute")
+
+
+def _decode_value(value: dict):
+    (type_, v) = next(iter(value.items()))
+    if type_ == "S":
+        return v
+    if type_ == "N":
+        return float(v) if "." in v or "e" in v.lower() else int(v)
+    if type_ == "M":
+        return _decode_map(v)
+    if type_ == "L":
+        return [_decode_value(a) for a in v]
+    if type_ == "BOOL":
+        return v
+    if type_ == "NULL":
+        return None
+    if type_ == "B":
+        return bytes(v)
+    raise TypeError(f"Unsupported DynamoDB attribute type {type_}")
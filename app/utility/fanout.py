@@ -0,0 +1,153 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+
+from flask import g
+from flask import has_app_context
+
+from app.utility import init_logger
+from app.utility.aws import Singleton
+
+# monotonic time by which the current request has to be answered, see ``deadline``
+_deadline: contextvars.ContextVar = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Give the code run in this block, and the steps it fans out, ``seconds`` to complete. A deadline nested in
+    another keeps the earliest of the two.
+    """
+    current = _deadline.get()
+    new = time.monotonic() + seconds
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def start_deadline(seconds: float) -> contextvars.Token:
+    """
+    Start the deadline of a request, for hooks that cannot wrap the request in ``deadline``.
+
+    :return: the token to pass to ``end_deadline`` once the request is done
+    """
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def end_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    :return: seconds left before the current deadline, None without a deadline
+    """
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+class PhaseTimings:
+    """
+    Wall time per phase of a request, in milliseconds. A phase timed more than once adds up.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, ms: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0) + ms
+
+    def __str__(self):
+        return " ".join(f"{name}={ms:.1f}ms" for name, ms in self.phases.items())
+
+
+def phase_timings() -> PhaseTimings:
+    """
+    :return: the timings of the current request, created on first use, or throwaway timings outside of a request
+    """
+    if not has_app_context():
+        return PhaseTimings()
+    if "phase_timings" not in g:
+        g.phase_timings = PhaseTimings()
+    return g.phase_timings
+
+
+class FanOut(metaclass=Singleton):
+    """
+    Process wide pool of FANOUT_MAX_WORKERS threads running the independent steps of a request concurrently, so
+    that the request takes as long as its slowest step rather than the sum of them. FANOUT_MAX_WORKERS=0 runs the
+    steps one after another in the calling thread.
+
+    Every step runs in a copy of the caller's context: it sees the same Flask request, ``g`` and deadline. Steps
+    must not fan out themselves, a step waiting on the pool it runs in can starve it.
+    """
+
+    def __init__(self):
+        init_logger("FanOut")
+        self.max_workers = int(os.getenv("FANOUT_MAX_WORKERS", "8"))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def __log(self):
+        return logging.getLogger("FanOut")
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fanout")
+        return self._executor
+
+    def run(self, steps: Dict[str, Callable[[], Any]], timings: Optional[PhaseTimings] = None) -> Dict[str, Any]:
+        """
+        Run ``steps`` concurrently and wait for all of them, at most until the current deadline.
+
+        :param steps: the steps by name
+        :param timings: where the wall time of each step is recorded under its name, the request's by default
+        :return: the result of each step by name
+        :raise Exception: the exception of the first step, in the order of ``steps``, that failed, or TimeoutError
+            when the deadline passed first
+        """
+        timings = timings if timings is not None else phase_timings()
+
+        def timed(name: str, step: Callable[[], Any]):
+            with timings.phase(name):
+                return step()
+
+        if self.max_workers <= 0 or len(steps) <= 1:
+            return {name: timed(name, step) for name, step in steps.items()}
+
+        futures = {
+            name: self.executor.submit(contextvars.copy_context().run, timed, name, step)
+            for name, step in steps.items()
+        }
+        left = remaining()
+        _, pending = wait(futures.values(), timeout=None if left is None else max(left, 0))
+        if pending:
+            late = [name for name, future in futures.items() if future in pending]
+            msg = f"Deadline exceeded waiting for {', '.join(late)}"
+            self.__log().error(msg)
+            raise TimeoutError(msg)
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,155 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+from app.utility import init_logger
+from app.utility.aws import Singleton
+from app.utility.fanout import remaining
+from app.utility.server_timing import timed
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def http_config() -> dict:
+    """
+    Shared settings of the HTTP client used for the platform and Learn calls.
+
+    HTTP_POOL_MAXSIZE should match the number of threads serving requests, like AWS_MAX_POOL_CONNECTIONS, the
+    timeouts are kept well below the Lambda and gunicorn request timeouts.
+    """
+    return dict(
+        pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+        pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", os.getenv("AWS_MAX_POOL_CONNECTIONS", "10"))),
+        connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "2")),
+        read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "5")),
+        max_retries=int(os.getenv("HTTP_MAX_RETRIES", "2")),
+        backoff=float(os.getenv("HTTP_BACKOFF", "0.1")),
+        backoff_max=float(os.getenv("HTTP_BACKOFF_MAX", "2")),
+    )
+
+
+class HttpClient(metaclass=Singleton):
+    """
+    Process wide ``requests`` session with a keep-alive connection pool per host and default timeouts.
+
+    Idempotent requests (GET, HEAD, OPTIONS, PUT, DELETE) are retried up to HTTP_MAX_RETRIES times on connection
+    errors, timeouts and 429/502/503/504 responses, waiting an exponential backoff with full jitter or the
+    Retry-After of the response. Other methods are sent once unless the caller passes ``retry=True``.
+
+    Within a request deadline, see ``app.utility.fanout.deadline``, the timeouts are cut to the time left and no retry
+    is made that would end after it.
+    """
+
+    def __init__(self, session=None):
+        init_logger("HttpClient")
+        self.config = http_config()
+        self._session = session
+        self._lock = threading.Lock()
+
+    def __log(self):
+        return logging.getLogger("HttpClient")
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self.__create_session()
+        return self._session
+
+    def __create_session(self):
+        # requests is imported on first use to keep it out of the import time of routes that do not need it
+        import http.cookiejar
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        # the session is shared by every user of the process, never send one user's cookies on behalf of another
+        session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(
+            pool_connections=self.config["pool_connections"],
+            pool_maxsize=self.config["pool_maxsize"],
+            max_retries=0,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def request(self, method: str, url: str, retry: Optional[bool] = None, **kwargs):
+        """
+        Send a request through the pooled session.
+
+        :param method: HTTP method
+        :param url: URL of the request
+        :param retry: retry on failure, by default only idempotent methods are retried
+        :param kwargs: passed to ``requests.Session.request``, ``timeout`` defaults to (connect, read) timeouts
+        :return: the last response, retries that run out return the last 429/5xx response as it is
+        """
+        import requests
+
+        kwargs.setdefault("timeout", (self.config["connect_timeout"], self.config["read_timeout"]))
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        attempts = 1 + self.config["max_retries"] if retry else 1
+
+        timeout = kwargs["timeout"]
+        for attempt in range(attempts):
+            left = remaining()
+            if left is not None:
+                if left <= 0:
+                    raise requests.Timeout(f"{method} {url} not sent, the request deadline has passed")
+                kwargs["timeout"] = HttpClient.__cut(timeout, left)
+            last_attempt = attempt + 1 >= attempts
+            try:
+                with timed("http"):
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = self.backoff(attempt)
+                if last_attempt or not self.__in_time(delay):
+                    raise
+                self.__log().warning(f"{method} {url} failed: {e}, retrying")
+                time.sleep(delay)
+                continue
+
+            if last_attempt or response.status_code not in RETRY_STATUSES:
+                return response
+            delay = self.backoff(attempt, response.headers.get("Retry-After"))
+            if not self.__in_time(delay):
+                return response
+            self.__log().warning(f"{method} {url} returned {response.status_code}, retrying")
+            time.sleep(delay)
+            response.close()
+
+    @staticmethod
+    def __cut(timeout, left: float):
+        if timeout is None:
+            return left
+        return tuple(min(t, left) for t in timeout) if isinstance(timeout, tuple) else min(timeout, left)
+
+    @staticmethod
+    def __in_time(delay: float) -> bool:
+        left = remaining()
+        return left is None or delay < left
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Seconds to wait before retry ``attempt + 1``: the Retry-After seconds of the response when given, otherwise
+        a random delay up to ``backoff * 2 ** attempt``, both capped at HTTP_BACKOFF_MAX.
+        """
+        if retry_after is not None and retry_after.strip().isdigit():
+            return min(float(retry_after), self.config["backoff_max"])
+        return random.uniform(0, min(self.config["backoff"] * 2**attempt, self.config["backoff_max"]))
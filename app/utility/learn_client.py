@@ -5,15 +5,18 @@ import secrets
 from calendar import timegm
 from enum import Enum
 from enum import auto
+from typing import Optional
 
-import requests
-
+from app.models.course_info import CourseInfoCache
+from app.models.course_info import CourseInfoStorage
 from app.models.jwt import LTIJwtPayload
 from app.models.platform_config import LTIPlatform
-from app.models.state import LTIStateStorage, LTIState
+from app.models.repository import lti_repository
 from app.models.tool_config import LTITool
 from app.models.tool_config import LTIToolStorage
 from app.utility import init_logger
+from app.utility.http_client import HttpClient
+from app.utility.metrics import Metrics
 
 
 class LearnClient:
@@ -23,19 +26,64 @@ class LearnClient:
     def __log(self):
         return logging.getLogger("LearnClient")
 
-    def get_course_info(self, jwt_request: LTIJwtPayload, request_cookie_state):
-        state: LTIState = LTIState(LTIStateStorage()).load(request_cookie_state)
-        learn_access_token = state.record.get_platform_learn_rest_token()
+    def get_course_info(
+        self, jwt_request: LTIJwtPayload, request_cookie_state, learn_access_token: Optional[str] = None
+    ):
+        """
+        Course info from the Learn public API, served from the CourseInfoCache while it is fresh.
+
+        A stale entry is revalidated with its ETag/Last-Modified and kept when Learn answers 304 or fails. The
+        state, and the KMS decryption of its Learn REST token, are only needed when Learn has to be called.
+
+        :param jwt_request: the launch, its platform_url and context_id identify the course
+        :param request_cookie_state: id of the state holding the Learn REST token
+        :param learn_access_token: the Learn REST token in clear when the caller already has it
+        :return: the course info, {} when it is not available
+        """
+        # for its exceptions, imported by HttpClient on first use anyway
+        import requests
+
         learn_url = jwt_request.platform_url.rstrip("/")
         course_uuid = jwt_request.context_id
+        cache = CourseInfoCache(CourseInfoStorage())
+        cached = cache.get(learn_url, course_uuid)
+        fresh = cached is not None and cached.is_fresh()
+        Metrics().cache("CourseInfo", hit=fresh)
+        if fresh:
+            return cached.info()
+        stale = cached.info() if cached is not None else {}
+
+        if learn_access_token is None:
+            state = lti_repository().state(request_cookie_state)
+            if not state.record.learn_rest_token:
+                return stale
+            learn_access_token = state.record.get_platform_learn_rest_token()
+
         headers = {"Authorization": f"Bearer {learn_access_token}"}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
         course_info_url = f"{learn_url}/learn/api/public/v2/courses/uuid:{course_uuid}"
-        response = requests.get(course_info_url, headers=headers)
+        try:
+            response = HttpClient().get(course_info_url, headers=headers)
+        except requests.RequestException as e:
+            self.__log().error(f"Error getting course info via Learn public API: {e}")
+            return stale
 
-        if response.status_code == 200:
-            return response.json()
+        if response.status_code == 304 and cached is not None:
+            return cache.refresh(cached).info()
+        elif response.status_code == 200:
+            record = cache.put(
+                learn_url,
+                course_uuid,
+                response.text,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+            return record.info()
         else:
             self.__log().error(
                 f"Error getting course info via Learn public API, status: {response.status_code}"
             )
-            return {}
+            return stale
@@ -0,0 +1,237 @@
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import TextIO
+from typing import Tuple
+
+from flask import Flask
+from flask import g
+from flask import request
+
+from app.utility import init_logger
+from app.utility.aws import Singleton
+
+# values of one metric in one EMF document, the CloudWatch limit
+MAX_VALUES = 100
+
+
+def enabled() -> bool:
+    return os.getenv("METRICS", "false").lower() == "true"
+
+
+def bucket(ms: float) -> float:
+    """
+    Latency rounded to two significant digits, so that a histogram holds a few dozen distinct values at most while
+    its percentiles stay within 5%.
+    """
+    return float(f"{ms:.2g}")
+
+
+class Metrics(metaclass=Singleton):
+    """
+    In-process aggregation of the metrics of the tool, written to stdout as CloudWatch Embedded Metric Format (EMF)
+    documents by ``flush``. CloudWatch Logs extracts the metrics from the log stream, nothing is sent over the
+    network.
+
+    - ``Latency`` of every request, by ``Route``, as a histogram of millisecond values
+    - ``AwsCalls`` by ``AwsService`` and by ``AwsService`` and ``Operation``, e.g. the KMS ``Sign`` operations
+    - ``CacheHits`` and ``CacheMisses`` by ``Cache``
+
+    Nothing is recorded unless METRICS is "true". Lambda functions flush once per invocation, see ``flush_after``,
+    gunicorn workers every METRICS_INTERVAL seconds, see ``start``.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        """
+        :param stream: where the documents are written, stdout by default
+        """
+        init_logger("Metrics")
+        self.enabled = enabled()
+        self.namespace = os.getenv("METRICS_NAMESPACE", "LtiTool")
+        self.stream = stream
+        self._latencies: Dict[str, Dict[float, int]] = {}
+        self._aws_calls: Dict[Tuple[str, str], int] = {}
+        self._caches: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def __log(self):
+        return logging.getLogger("Metrics")
+
+    def latency(self, route: str, ms: float):
+        if not self.enabled:
+            return
+        value = bucket(ms)
+        with self._lock:
+            histogram = self._latencies.setdefault(route, {})
+            histogram[value] = histogram.get(value, 0) + 1
+
+    def aws_call(self, service: str, operation: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._aws_calls[(service, operation)] = self._aws_calls.get((service, operation), 0) + 1
+
+    def cache(self, name: str, hit: bool):
+        if not self.enabled:
+            return
+        with self._lock:
+            counts = self._caches.setdefault(name, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def documents(self) -> List[dict]:
+        """
+        Take the metrics recorded since the last call as EMF documents.
+        """
+        with self._lock:
+            latencies, self._latencies = self._latencies, {}
+            aws_calls, self._aws_calls = self._aws_calls, {}
+            caches, self._caches = self._caches, {}
+
+        timestamp = int(time.time() * 1000)
+        documents = []
+        for route, histogram in latencies.items():
+            values = [value for value, count in sorted(histogram.items()) for _ in range(count)]
+            for start in range(0, len(values), MAX_VALUES):
+                documents.append(
+                    self.__document(
+                        timestamp,
+                        [["Route"]],
+                        {"Latency": "Milliseconds"},
+                        Route=route,
+                        Latency=values[start : start + MAX_VALUES],
+                    )
+                )
+        for (service, operation), count in aws_calls.items():
+            documents.append(
+                self.__document(
+                    timestamp,
+                    [["AwsService"], ["AwsService", "Operation"]],
+                    {"AwsCalls": "Count"},
+                    AwsService=service,
+                    Operation=operation,
+                    AwsCalls=count,
+                )
+            )
+        for name, (hits, misses) in caches.items():
+            documents.append(
+                self.__document(
+                    timestamp,
+                    [["Cache"]],
+                    {"CacheHits": "Count", "CacheMisses": "Count"},
+                    Cache=name,
+                    CacheHits=hits,
+                    CacheMisses=misses,
+                )
+            )
+        return documents
+
+    def flush(self):
+        """
+        Write the metrics recorded since the last flush, one EMF document per line.
+        """
+        if not self.enabled:
+            return
+        documents = self.documents()
+        if not documents:
+            return
+        stream = self.stream if self.stream is not None else sys.stdout
+        try:
+            stream.write("".join(json.dumps(document, separators=(",", ":")) + "\n" for document in documents))
+            stream.flush()
+        except Exception as e:
+            self.__log().error(f"Error writing metrics: {e}")
+
+    def start(self, interval: float) -> Optional[threading.Thread]:
+        """
+        Flush every ``interval`` seconds from a daemon thread, e.g. in a gunicorn worker.
+        """
+        if not self.enabled:
+            return None
+
+        def run():
+            while not self._stop.wait(interval):
+                self.flush()
+
+        thread = threading.Thread(target=run, name="metrics", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """
+        Stop the flushing thread and flush what is left.
+        """
+        self._stop.set()
+        self.flush()
+
+    def __document(self, timestamp: int, dimensions: List[List[str]], metrics: Dict[str, str], **values) -> dict:
+        return dict(
+            _aws=dict(
+                Timestamp=timestamp,
+                CloudWatchMetrics=[
+                    dict(
+                        Namespace=self.namespace,
+                        Dimensions=dimensions,
+                        Metrics=[dict(Name=name, Unit=unit) for name, unit in metrics.items()],
+                    )
+                ],
+            ),
+            **values,
+        )
+
+
+def flush_after(handler: Callable) -> Callable:
+    """
+    Flush the metrics once the Lambda handler returns or fails.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            Metrics().flush()
+
+    return wrapper
+
+
+def instrument_boto_session(session):
+    """
+    Count every API call of the clients created from a boto3 session from then on, retries excluded. Nothing is
+    registered unless METRICS is "true".
+    """
+    if not enabled():
+        return
+
+    def after_call(model, **kwargs):
+        Metrics().aws_call(model.service_model.service_name, model.name)
+
+    session.events.register("after-call", after_call)
+    session.events.register("after-call-error", after_call)
+
+
+def init_app(application: Flask):
+    """
+    Record the latency of every request by route when METRICS is "true". Nothing is registered otherwise.
+    """
+    if not enabled():
+        return
+
+    @application.before_request
+    def start_request():
+        g.metrics_start = time.perf_counter()
+
+    @application.after_request
+    def record_latency(response):
+        if "metrics_start" in g:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            Metrics().latency(f"{request.method} {route}", (time.perf_counter() - g.metrics_start) * 1000)
+        return response
@@ -0,0 +1,116 @@
+import logging
+import os
+import time
+from typing import Iterator
+from typing import Optional
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+from app.models.jwt import LTIJwtPayload
+from app.models.membership_sync import MembershipSync
+from app.models.membership_sync import MembershipSyncStorage
+from app.models.platform_config import LTIPlatform
+from app.models.tool_config import LTITool
+from app.utility import init_logger
+from app.utility.http_client import HttpClient
+from app.utility.token_client import GrantType
+from app.utility.token_client import TokenClient
+
+MEMBERSHIP_CONTAINER = "application/vnd.ims.lti-nrps.v2.membershipcontainer+json"
+
+
+class NrpsClient:
+    """
+    Names and Role Provisioning Services client.
+    https://www.imsglobal.org/spec/lti-nrps/v2p0
+
+    Members are yielded one page at a time, following the ``rel="next"`` links, so only one page of a roster is
+    held in memory however large the course is.
+    """
+
+    def __init__(self, platform: LTIPlatform, tool: LTITool, page_size: Optional[int] = None):
+        init_logger("NrpsClient")
+        self.platform = platform
+        self.tool = tool
+        self.page_size = page_size if page_size is not None else int(os.getenv("NRPS_PAGE_SIZE", "1000"))
+        # the last rel="differences" link returned by the platform
+        self.differences_url: Optional[str] = None
+        self._access_token: Optional[str] = None
+
+    def __log(self):
+        return logging.getLogger("NrpsClient")
+
+    def members(self, context_memberships_url: str, role: Optional[str] = None) -> Iterator[dict]:
+        """
+        :param context_memberships_url: the context_memberships_url of the launch, or a differences URL
+        :param role: only return the members with this role
+        :return: generator of the members of every page
+        """
+        params = {"limit": str(self.page_size)}
+        if role is not None:
+            params["role"] = role
+        url = self.__with_params(context_memberships_url, params)
+
+        while url is not None:
+            response = self.__get(url)
+            links = response.links
+            if "differences" in links:
+                self.differences_url = links["differences"]["url"]
+            url = links["next"]["url"] if "next" in links else None
+
+            members = response.json().get("members", [])
+            # drop the raw page before handing out its members
+            del response
+            yield from members
+
+    def sync(self, jwt_request: LTIJwtPayload, role: Optional[str] = None) -> Iterator[dict]:
+        """
+        Yield the roster of the launch's context, or only the changes since the last completed sync when the
+        platform gave a differences URL. The differences URL is stored once every page has been read, per role: the
+        differences of a sync filtered on a role only list the changes of that role.
+
+        :param jwt_request: the launch, its context_memberships_url, iss and context_id identify the roster
+        :param role: only return the members with this role
+        :return: generator of the members, with their ``status`` when reading differences
+        """
+        sync = MembershipSync(MembershipSyncStorage()).load(jwt_request.iss, jwt_request.context_id, role)
+        url = sync.record.differences_url or jwt_request.context_memberships_url
+        if not url:
+            raise Exception(f"No Names and Role Provisioning Services endpoint for context {jwt_request.context_id}")
+
+        self.differences_url = None
+        yield from self.members(url, role)
+
+        sync.record.differences_url = self.differences_url
+        sync.record.synced_at = int(time.time())
+        sync.save()
+
+    def __get(self, url: str):
+        response = HttpClient().get(url, headers=self.__headers())
+        if response.status_code == 401:
+            # the access token expired while reading a long roster
+            TokenClient.invalidate_bearer_token(self.platform)
+            self._access_token = None
+            response = HttpClient().get(url, headers=self.__headers())
+        if response.status_code != 200:
+            msg = f"Error retrieving memberships from {url}. {response.status_code}: {response.text}"
+            self.__log().error(msg)
+            raise Exception(msg)
+        return response
+
+    def __headers(self) -> dict:
+        if self._access_token is None:
+            self._access_token = TokenClient.request_bearer_token(
+                platform=self.platform, grantType=GrantType.CLIENT_CREDENTIALS, tool=self.tool
+            )
+        return {"Authorization": f"Bearer {self._access_token}", "Accept": MEMBERSHIP_CONTAINER}
+
+    @staticmethod
+    def __with_params(url: str, params: dict) -> str:
+        # the platform's own parameters, e.g. of a differences URL, take precedence
+        parts = urlsplit(url)
+        query = dict(params)
+        query.update(parse_qsl(parts.query))
+        return urlunsplit(parts._replace(query=urlencode(query)))
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.models.outbox import FAILED
+from app.models.outbox import OutboxRecord
+from app.models.outbox import outbox_storage
+from app.models.platform_config import LTIPlatform
+from app.models.platform_config import LTIPlatformStorage
+from app.models.tool_config import LTITool
+from app.models.tool_config import LTIToolStorage
+from app.utility import init_logger
+from app.utility.ags_client import AgsClient
+
+# responses worth another attempt later, any other 4xx will not get better
+RETRYABLE_STATUSES = frozenset({401, 408, 409, 429})
+
+
+class OutboxDrainReport(BaseModel):
+    published: int = 0
+    retried: int = 0
+    failed: int = 0
+    seconds: float = 0
+    # seconds from the submission to its publication
+    lag: List[float] = []
+
+    def throughput(self) -> float:
+        return self.published / self.seconds if self.seconds else 0
+
+    def lag_percentile(self, percentile: int) -> float:
+        if not self.lag:
+            return 0
+        if len(self.lag) == 1:
+            return self.lag[0]
+        return statistics.quantiles(self.lag, n=100, method="inclusive")[percentile - 1]
+
+
+class OutboxWorker:
+    """
+    Publishes the scores of the outbox to the platforms.
+
+    Records are claimed for OUTBOX_LEASE seconds, published concurrently through AgsClient and deleted once the
+    platform accepted them. Failures are retried OUTBOX_MAX_ATTEMPTS times with an exponential backoff with
+    jitter, records the platform refuses for good are kept with status "failed".
+    """
+
+    def __init__(self, storage=None):
+        init_logger("OutboxWorker")
+        self.storage = storage if storage is not None else outbox_storage()
+        self.batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+        self.lease = int(os.getenv("OUTBOX_LEASE", "60"))
+        self.max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+        self.backoff = int(os.getenv("OUTBOX_BACKOFF", "5"))
+        self._stop = threading.Event()
+
+    def __log(self):
+        return logging.getLogger("OutboxWorker")
+
+    def drain(self) -> OutboxDrainReport:
+        """
+        Publish every record that is due, one batch of OUTBOX_BATCH_SIZE at a time.
+        """
+        report = OutboxDrainReport()
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            records = self.storage.claim_due(self.batch_size, self.lease)
+            if not records:
+                break
+            self.__publish(records, report)
+        report.seconds = time.perf_counter() - start
+        self.__report(report)
+        return report
+
+    def process(self, records: List[OutboxRecord]) -> OutboxDrainReport:
+        """
+        Publish records handed over by the platform, e.g. from a DynamoDB stream, once they are claimed.
+        """
+        report = OutboxDrainReport()
+        start = time.perf_counter()
+        claimed = [record for record in records if self.storage.claim(record, self.lease)]
+        self.__publish(claimed, report)
+        report.seconds = time.perf_counter() - start
+        self.__report(report)
+        return report
+
+    def start(self, interval: float) -> threading.Thread:
+        """
+        Drain the outbox every ``interval`` seconds from a daemon thread, e.g. in a gunicorn worker.
+        """
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.drain()
+                except Exception as e:
+                    self.__log().error(f"Error draining the outbox: {e}")
+
+        thread = threading.Thread(target=run, name="outbox-worker", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def __publish(self, records: List[OutboxRecord], report: OutboxDrainReport):
+        groups = {}
+        for record in records:
+            groups.setdefault((record.client_id, record.iss, record.lti_deployment_id), []).append(record)
+
+        tool = LTITool(LTIToolStorage())
+        for platform_key, group in groups.items():
+            try:
+                platform = LTIPlatform(LTIPlatformStorage()).load(*platform_key)
+            except Exception as e:
+                for record in group:
+                    self.__retry_later(record, str(e), report)
+                continue
+            client = AgsClient(platform, tool)
+            with ThreadPoolExecutor(max_workers=client.max_workers) as executor:
+                outcomes = executor.map(lambda record: self.__publish_one(client, record), group)
+                for record, (response, error) in zip(group, outcomes):
+                    self.__settle(record, response, error, report)
+
+    @staticmethod
+    def __publish_one(client: AgsClient, record: OutboxRecord) -> tuple:
+        try:
+            return client.publish_score(record.lineitem_url, json.loads(record.score)), None
+        except Exception as e:
+            return None, str(e)
+
+    def __settle(self, record: OutboxRecord, response, error: Optional[str], report: OutboxDrainReport):
+        if response is not None and response.ok:
+            self.storage.delete(record)
+            report.published += 1
+            report.lag.append(time.time() - record.created_at_ms / 1000)
+        elif response is not None and response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES:
+            record.status = FAILED
+            record.error = f"{response.status_code}: {response.text}"
+            self.storage.update(record)
+            report.failed += 1
+            self.__log().error(f"Score {record.id} was refused, {record.error}")
+        else:
+            self.__retry_later(record, error or f"{response.status_code}: {response.text}", report)
+
+    def __retry_later(self, record: OutboxRecord, error: str, report: OutboxDrainReport):
+        record.attempts += 1
+        record.error = error
+        if record.attempts >= self.max_attempts:
+            record.status = FAILED
+            report.failed += 1
+            self.__log().error(f"Score {record.id} failed {record.attempts} times, {error}")
+        else:
+            delay = min(self.backoff * 2 ** (record.attempts - 1), 900)
+            record.next_attempt_at = int(time.time() + random.uniform(delay / 2, delay))
+            report.retried += 1
+        self.storage.update(record)
+
+    def __report(self, report: OutboxDrainReport):
+        if report.published or report.retried or report.failed:
+            self.__log().info(
+                f"Outbox drained: published={report.published} retried={report.retried} failed={report.failed} "
+                f"seconds={report.seconds:.3f} throughput={report.throughput():.1f}/s "
+                f"lag_p50={report.lag_percentile(50):.3f}s lag_max={max(report.lag, default=0):.3f}s"
+            )
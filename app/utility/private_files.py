@@ -0,0 +1,34 @@
+"""
+Files the processes of a host share, e.g. the SharedCache and the SQLite outbox, that no other user may have created
+or replaced: their content is trusted, JWKS or scores posted with the tool's token.
+"""
+import os
+import stat
+
+MODE = 0o600
+
+
+def open_private(path: str) -> int:
+    """
+    Open a file of the current user, creating it with mode 0600. A symlink is not followed.
+
+    :return: the file descriptor, opened for reading and writing
+    :raise Exception: when the file is not a regular file owned by the current user with mode 0600
+    """
+    flags = os.O_RDWR | os.O_NOFOLLOW | os.O_CLOEXEC
+    try:
+        fd = os.open(path, flags | os.O_CREAT | os.O_EXCL, MODE)
+        # not narrowed by the umask
+        os.fchmod(fd, MODE)
+        return fd
+    except FileExistsError:
+        pass
+    try:
+        fd = os.open(path, flags)
+    except OSError as error:
+        raise Exception(f"Refusing {path}, it cannot be opened without following a symlink. {error}")
+    status = os.fstat(fd)
+    if not stat.S_ISREG(status.st_mode) or status.st_uid != os.geteuid() or stat.S_IMODE(status.st_mode) != MODE:
+        os.close(fd)
+        raise Exception(f"Refusing {path}, it is not a regular file of user {os.geteuid()} with mode 0600")
+    return fd
@@ -0,0 +1,287 @@
+"""
+Opt-in profiling of live requests, see ``init_app``.
+
+A request is profiled when it is sampled (PROFILE_SAMPLE_RATE) or carries a valid ``X-Profile`` header, signed with
+PROFILE_SECRET, e.g. from ``python -m app.utility.profiling [seconds]``. Its thread is profiled with ``cProfile``
+(PROFILE_MODE "cprofile") or a statistical sampler ("sample"), and its allocations are traced with ``tracemalloc``.
+The reports are written to PROFILE_DIR and kept in memory for ``/debug/profiles``.
+"""
+import cProfile
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from collections import deque
+from typing import Callable
+from typing import Optional
+
+from flask import Flask
+
+from app.utility import init_logger
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+ENDPOINT = "/debug/profiles"
+
+
+def enabled() -> bool:
+    return os.getenv("PROFILING", "false").lower() == "true"
+
+
+def sign(secret: str, expires: int) -> str:
+    """
+    :return: an ``X-Profile`` header value valid until ``expires``, in seconds since the epoch
+    """
+    signature = hmac.new(secret.encode("utf-8"), str(expires).encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify(secret: Optional[str], value: Optional[str]) -> bool:
+    """
+    :return: whether ``value`` was signed with ``secret`` and has not expired, False without a secret
+    """
+    if not secret or not value:
+        return False
+    expires, _, _ = value.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sign(secret, int(expires)), value)
+
+
+class Sampler:
+    """
+    Statistical profiler: the stack of one thread, taken every ``interval`` seconds from a daemon thread. The
+    profiled thread is not slowed down, except by the sampling thread holding the GIL while it reads the stack.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.__run, name="profile-sampler", daemon=True)
+
+    # named like the methods of cProfile.Profile
+    def enable(self):
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_filename}:{frame.f_code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def report(self, limit: int) -> str:
+        """
+        :return: the most frequent stacks in the collapsed format of flame graph tools, "outer;...;inner count"
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common(limit))
+
+
+class Profile:
+    """
+    The reports of one profiled request, by name: "pstats" or "samples", and "allocations".
+    """
+
+    def __init__(self, method: str, path: str, mode: str):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.mode = mode
+        self.ms = 0.0
+        self.reports = {}
+        self.stats: Optional[pstats.Stats] = None
+
+    def summary(self) -> dict:
+        return dict(id=self.id, method=self.method, path=self.path, mode=self.mode, ms=round(self.ms, 1))
+
+    def text(self) -> str:
+        sections = [json.dumps(self.summary())]
+        sections += [f"== {name}\n{report}" for name, report in self.reports.items()]
+        return "\n\n".join(sections) + "\n"
+
+
+class RequestProfiler:
+    """
+    Decides which requests are profiled, profiles them and keeps their reports. One request is profiled at a time
+    per process, a request selected while another one is being profiled is served without.
+    """
+
+    def __init__(self):
+        init_logger("RequestProfiler")
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.secret = os.getenv("PROFILE_SECRET")
+        self.mode = os.getenv("PROFILE_MODE", "cprofile")
+        self.interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+        self.directory = os.getenv("PROFILE_DIR")
+        self.top = int(os.getenv("PROFILE_TOP", "40"))
+        self.profiles = deque(maxlen=int(os.getenv("PROFILE_KEEP", "20")))
+        self._busy = threading.Lock()
+
+    def __log(self):
+        return logging.getLogger("RequestProfiler")
+
+    def selected(self, environ: dict) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        return "HTTP_X_PROFILE" in environ and self.authorized(environ)
+
+    def authorized(self, environ: dict) -> bool:
+        """
+        :return: whether the request has an ``X-Profile`` header signed with PROFILE_SECRET that has not expired
+        """
+        return verify(self.secret, environ.get("HTTP_X_PROFILE"))
+
+    def profile(self, method: str, path: str, call: Callable):
+        """
+        :return: the result of ``call()`` and its Profile, None when another request is being profiled
+        """
+        if not self._busy.acquire(blocking=False):
+            return call(), None
+        try:
+            return self.__profile(Profile(method, path, self.mode), call)
+        finally:
+            self._busy.release()
+
+    def __profile(self, profile: Profile, call: Callable):
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        if profile.mode == "sample":
+            profiler = Sampler(threading.get_ident(), self.interval)
+        else:
+            profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            result = call()
+        finally:
+            profiler.disable()
+            profile.ms = (time.perf_counter() - start) * 1000
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if not tracing:
+                tracemalloc.stop()
+            self.__report(profile, profiler, snapshot, peak)
+        return result, profile
+
+    def __report(self, profile: Profile, profiler, snapshot: tracemalloc.Snapshot, peak: int):
+        if isinstance(profiler, Sampler):
+            profile.reports["samples"] = profiler.report(self.top)
+        else:
+            stream = io.StringIO()
+            profile.stats = pstats.Stats(profiler, stream=stream)
+            profile.stats.sort_stats("cumulative").print_stats(self.top)
+            profile.reports["pstats"] = stream.getvalue()
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        lines = [f"peak {peak / 1024:.1f} KiB, still allocated at the end of the request:"]
+        lines += [str(statistic) for statistic in snapshot.statistics("lineno")[: self.top]]
+        profile.reports["allocations"] = "\n".join(lines)
+        self.profiles.append(profile)
+        if self.directory:
+            self.__write(profile)
+        self.__log().info(
+            "Profiled %s %s %.1fms as %s", profile.method, profile.path, profile.ms, profile.id, extra=profile.summary()
+        )
+
+    def __write(self, profile: Profile):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, profile.id)
+            if profile.stats is not None:
+                profile.stats.dump_stats(f"{path}.pstats")
+            with open(f"{path}.txt", "w") as report:
+                report.write(profile.text())
+        except OSError as e:
+            self.__log().error(f"Error writing profile {profile.id} to {self.directory}. {e}")
+
+    def find(self, id: str) -> Optional[Profile]:
+        return next((profile for profile in self.profiles if profile.id == id), None)
+
+
+class ProfilingMiddleware:
+    """
+    WSGI middleware profiling the requests selected by the RequestProfiler, the id of their profile is returned in
+    ``X-Profile-Id``. With a valid ``X-Profile`` header, ``/debug/profiles`` lists the kept profiles and
+    ``/debug/profiles/<id>`` returns one as text.
+    """
+
+    def __init__(self, wsgi_app: Callable, profiler: RequestProfiler):
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+
+    def __call__(self, environ: dict, start_response: Callable):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith(ENDPOINT) and self.profiler.authorized(environ):
+            return self.__endpoint(path, start_response)
+        if not self.profiler.selected(environ):
+            return self.wsgi_app(environ, start_response)
+
+        profiled = {}
+
+        def start_profiled_response(status, headers, exc_info=None):
+            profiled["start"] = (status, headers, exc_info)
+            return lambda data: profiled.setdefault("written", []).append(data)
+
+        # the application's body is read within the profile, then the response is started with the profile id
+        def call():
+            body = self.wsgi_app(environ, start_profiled_response)
+            try:
+                return b"".join(body)
+            finally:
+                getattr(body, "close", lambda: None)()
+
+        body, profile = self.profiler.profile(environ.get("REQUEST_METHOD", ""), path, call)
+        status, headers, exc_info = profiled["start"]
+        if profile is not None:
+            headers = list(headers) + [(PROFILE_ID_HEADER, profile.id)]
+        start_response(status, headers, exc_info)
+        return [b"".join(profiled.get("written", [])) + body]
+
+    def __endpoint(self, path: str, start_response: Callable):
+        id = path[len(ENDPOINT) :].strip("/")
+        if not id:
+            body = json.dumps([profile.summary() for profile in self.profiler.profiles]).encode("utf-8")
+            start_response("200 OK", [("Content-Type", "application/json"), ("Content-Length", str(len(body)))])
+            return [body]
+        profile = self.profiler.find(id)
+        if profile is None:
+            start_response("404 NOT FOUND", [("Content-Length", "0")])
+            return [b""]
+        body = profile.text().encode("utf-8")
+        start_response("200 OK", [("Content-Type", "text/plain; charset=utf-8"), ("Content-Length", str(len(body)))])
+        return [body]
+
+
+def init_app(application: Flask):
+    """
+    Wrap the application in the ProfilingMiddleware when PROFILING is "true". Nothing is wrapped otherwise, a request
+    pays nothing for it.
+    """
+    if not enabled():
+        return
+    application.wsgi_app = ProfilingMiddleware(application.wsgi_app, RequestProfiler())
+
+
+if __name__ == "__main__":
+    # an X-Profile header value, valid for the given seconds
+    print(sign(os.environ["PROFILE_SECRET"], int(time.time()) + int(sys.argv[1] if len(sys.argv) > 1 else 300)))
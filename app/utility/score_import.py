@@ -0,0 +1,239 @@
+import csv
+import io
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+from typing import BinaryIO
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import TextIO
+from typing import Tuple
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+
+from app.utility import init_logger
+from app.utility.ags_client import AgsClient
+
+CSV = "csv"
+JSONL = "jsonl"
+
+
+class ScoreImportReport(BaseModel):
+    rows: int = 0
+    published: int = 0
+    # rows that failed validation, never sent to the platform
+    rejected: int = 0
+    # rows the platform did not accept
+    failed: int = 0
+    # rows being sent when the deadline of the request passed, the platform may have accepted them or not
+    in_flight: int = 0
+    # line, userId and error of the first SCORE_IMPORT_MAX_ERRORS rejected or failed rows
+    errors: List[dict] = []
+    # scores published per line item
+    line_items: Dict[str, int] = {}
+    seconds: float = 0
+
+
+def import_format(filename: Optional[str]) -> str:
+    """
+    :return: "jsonl" for .jsonl and .ndjson files, "csv" otherwise
+    """
+    return JSONL if filename and filename.lower().endswith((".jsonl", ".ndjson")) else CSV
+
+
+def read_rows(stream: BinaryIO, format: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Read an import file one row at a time.
+
+    CSV files have a header row, JSONL files one object per line. Both have the columns ``sub`` (the LTI user id),
+    ``score``, optionally ``comment`` and ``lineitem``, the URL of another line item of the launch's context.
+
+    :param stream: the file, opened in binary mode
+    :param format: "csv" or "jsonl"
+    :return: the line number and the row, blank lines are skipped
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if format == CSV:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = dict(error=f"Invalid JSON: {e}")
+        yield line_number, row if isinstance(row, dict) else dict(error="Not a JSON object")
+
+
+class ScoreImporter:
+    """
+    Streams a gradebook file to Assignment and Grade Services.
+
+    The rows are read one at a time and spooled to a temporary file per line item, so memory does not grow with the
+    size of the file. The rows of each line item are then validated against its scoreMaximum, read from the platform
+    once unless it is given, and published through ``AgsClient.publish``, whose pool pulls the next row only when a
+    score is done. Line items are published one after another.
+
+    The ``lineitem`` of a row must be the launch's line item or a URL of the same origin under the launch's lineitems
+    endpoint: the platform's token is sent to no other URL. At most SCORE_IMPORT_MAX_LINE_ITEMS line items are
+    imported from one file.
+    """
+
+    def __init__(
+        self,
+        client: AgsClient,
+        lineitem_url: Optional[str] = None,
+        lineitems_url: Optional[str] = None,
+        score_maximums: Optional[Dict[str, float]] = None,
+        max_errors: Optional[int] = None,
+        max_line_items: Optional[int] = None,
+    ):
+        """
+        :param client: the AgsClient of the platform
+        :param lineitem_url: line item of the rows without a ``lineitem`` column, the endpoint_lineitem
+        :param lineitems_url: the endpoint_lineitems, the line items under it may be given by the ``lineitem`` column
+        :param score_maximums: scoreMaximum per line item URL, those not given are read from the platform
+        :param max_errors: errors to list in the report, SCORE_IMPORT_MAX_ERRORS by default
+        :param max_line_items: line items of one file, SCORE_IMPORT_MAX_LINE_ITEMS by default
+        """
+        init_logger("ScoreImporter")
+        self.client = client
+        self.lineitem_url = lineitem_url
+        self.lineitems_url = lineitems_url
+        self.score_maximums = dict(score_maximums or {})
+        self.max_errors = max_errors if max_errors is not None else int(os.getenv("SCORE_IMPORT_MAX_ERRORS", "100"))
+        self.max_line_items = (
+            max_line_items if max_line_items is not None else int(os.getenv("SCORE_IMPORT_MAX_LINE_ITEMS", "50"))
+        )
+
+    def __log(self):
+        return logging.getLogger("ScoreImporter")
+
+    def run(self, stream: BinaryIO, format: str) -> ScoreImportReport:
+        """
+        :param stream: the file, opened in binary mode
+        :param format: "csv" or "jsonl", see ``import_format``
+        """
+        report = ScoreImportReport()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            groups: Dict[str, TextIO] = {}
+            for line_number, row in read_rows(stream, format):
+                report.rows += 1
+                try:
+                    lineitem_url, sub, score, comment = self.parse(row)
+                    if lineitem_url not in groups:
+                        if len(groups) >= self.max_line_items:
+                            raise ValueError(f"More than {self.max_line_items} line items")
+                        groups[lineitem_url] = stack.enter_context(tempfile.TemporaryFile("w+", encoding="utf-8"))
+                    groups[lineitem_url].write(json.dumps([line_number, sub, score, comment]) + "\n")
+                except ValueError as e:
+                    self.__reject(report, line_number, row.get("sub"), e)
+            for lineitem_url, group in groups.items():
+                group.seek(0)
+                self.__publish(report, lineitem_url, group)
+        report.seconds = time.perf_counter() - start
+        self.__log().info(
+            f"Imported {report.rows} rows: published={report.published} rejected={report.rejected} "
+            f"failed={report.failed} in_flight={report.in_flight} line_items={len(report.line_items)} "
+            f"seconds={report.seconds:.3f}"
+        )
+        return report
+
+    def __publish(self, report: ScoreImportReport, lineitem_url: str, group: TextIO):
+        def scores():
+            for line in group:
+                line_number, sub, score, comment = json.loads(line)
+                try:
+                    yield lineitem_url, self.validate(lineitem_url, sub, score, comment)
+                except ValueError as e:
+                    self.__reject(report, line_number, sub, e)
+
+        published = self.client.publish(scores(), max_failures=self.max_errors)
+        report.published += published.published
+        report.failed += published.failures
+        report.in_flight += published.in_flight
+        report.line_items.update(published.line_items)
+        for failure in published.failed:
+            self.__error(report, failure)
+
+    def parse(self, row: dict) -> Tuple[str, str, float, Optional[str]]:
+        """
+        :return: the line item URL, sub, score and comment of a row
+        :raise ValueError: when the row has no user, its line item is missing or not one of the launch's context, or
+            its score is not a positive number
+        """
+        if "error" in row:
+            raise ValueError(row["error"])
+        sub = str(row.get("sub") or "").strip()
+        if not sub:
+            raise ValueError("Missing sub")
+        lineitem_url = str(row.get("lineitem") or "").strip() or self.lineitem_url
+        if not lineitem_url:
+            raise ValueError("Missing lineitem")
+        if not self.allowed(lineitem_url):
+            raise ValueError(f"{lineitem_url} is not a line item of the launch's context")
+        try:
+            score = float(row.get("score"))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid score {row.get('score')!r}")
+        if not math.isfinite(score) or score < 0:
+            raise ValueError(f"Score {score} is not a positive number")
+        return lineitem_url, sub, score, row.get("comment") or None
+
+    def allowed(self, lineitem_url: str) -> bool:
+        """
+        :return: whether the URL is the launch's line item, or of the same origin and under its lineitems endpoint
+        """
+        if lineitem_url == self.lineitem_url:
+            return True
+        if not self.lineitems_url:
+            return False
+        url, container = urlsplit(lineitem_url), urlsplit(self.lineitems_url)
+        prefix = container.path.rstrip("/") + "/"
+        segments = url.path[len(prefix) :].split("/")
+        return (
+            (url.scheme, url.netloc) == (container.scheme, container.netloc)
+            and url.path.startswith(prefix)
+            and all(segment not in ("", ".", "..") for segment in segments)
+        )
+
+    def validate(self, lineitem_url: str, sub: str, score: float, comment: Optional[str]) -> dict:
+        """
+        :return: the AGS score of a row
+        :raise ValueError: when the score is over the scoreMaximum of the line item, or the line item is unknown
+        """
+        score_maximum = self.score_maximum(lineitem_url)
+        if score > score_maximum:
+            raise ValueError(f"Score {score} is not between 0 and the scoreMaximum {score_maximum}")
+        return AgsClient.score(sub, score, score_maximum, comment=comment)
+
+    def score_maximum(self, lineitem_url: str) -> float:
+        if lineitem_url not in self.score_maximums:
+            try:
+                self.score_maximums[lineitem_url] = float(self.client.line_item(lineitem_url)["scoreMaximum"])
+            except Exception as e:
+                self.__log().error(f"No scoreMaximum for {lineitem_url}. {e}")
+                # remembered so that the rest of the line item's rows are rejected without asking again
+                self.score_maximums[lineitem_url] = None
+        if self.score_maximums[lineitem_url] is None:
+            raise ValueError(f"Unknown line item {lineitem_url}")
+        return self.score_maximums[lineitem_url]
+
+    def __reject(self, report: ScoreImportReport, line_number: int, sub: Optional[str], error: ValueError):
+        report.rejected += 1
+        self.__error(report, dict(line=line_number, userId=sub, error=str(error)))
+
+    def __error(self, report: ScoreImportReport, error: dict):
+        if len(report.errors) < self.max_errors:
+            report.errors.append(error)
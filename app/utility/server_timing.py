@@ -0,0 +1,126 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from typing import Optional
+
+from flask import Flask
+from flask import g
+from flask import request
+
+from app.utility import init_logger
+
+# the DependencyTimings of the current request, None when SERVER_TIMING is off or outside of a request
+_timings: contextvars.ContextVar = contextvars.ContextVar("dependency_timings", default=None)
+
+
+def enabled() -> bool:
+    return os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+
+class DependencyTimings:
+    """
+    Count and wall time, in milliseconds, of the calls a request made to each dependency: "dynamodb", "kms", "ssm"
+    and "http".
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ms: float):
+        with self._lock:
+            count, total = self.calls.get(name, (0, 0))
+            self.calls[name] = [count + 1, total + ms]
+
+    def header(self, phases: Optional[Dict[str, float]] = None, total_ms: Optional[float] = None) -> str:
+        """
+        :return: the Server-Timing header value: the dependencies with their call count, then the request phases
+            and the total time of the request
+        """
+        metrics = [f'{name};dur={ms:.1f};desc="{count} calls"' for name, (count, ms) in self.calls.items()]
+        metrics += [f"{name};dur={ms:.1f}" for name, ms in (phases or {}).items()]
+        if total_ms is not None:
+            metrics.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(metrics)
+
+    def __str__(self):
+        return " ".join(f"{name}={count}/{ms:.1f}ms" for name, (count, ms) in self.calls.items())
+
+
+def record(name: str, ms: float):
+    timings = _timings.get()
+    if timings is not None:
+        timings.record(name, ms)
+
+
+@contextmanager
+def timed(name: str):
+    """
+    Time the block as one call to the dependency ``name`` of the current request, if it is timed.
+    """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.record(name, (time.perf_counter() - start) * 1000)
+
+
+def instrument_boto_session(session):
+    """
+    Time every API call of the clients created from a boto3 session from then on, retries included, by service.
+    Nothing is registered when SERVER_TIMING is off.
+    """
+    if not enabled():
+        return
+
+    def before_call(model, context, **kwargs):
+        context["server_timing_start"] = time.perf_counter()
+
+    def after_call(model, context, **kwargs):
+        start = context.pop("server_timing_start", None)
+        if start is not None:
+            record(model.service_model.service_name, (time.perf_counter() - start) * 1000)
+
+    session.events.register("before-call", before_call)
+    session.events.register("after-call", after_call)
+    session.events.register("after-call-error", after_call)
+
+
+def init_app(application: Flask):
+    """
+    Add a Server-Timing header to every response and log the same at DEBUG when SERVER_TIMING is "true". Nothing is
+    registered otherwise.
+    """
+    if not enabled():
+        return
+    init_logger("ServerTiming")
+
+    @application.before_request
+    def start_timing():
+        g.server_timing_start = time.perf_counter()
+        g.server_timing = DependencyTimings()
+        g.server_timing_token = _timings.set(g.server_timing)
+
+    @application.after_request
+    def add_header(response):
+        if "server_timing" in g:
+            total_ms = (time.perf_counter() - g.server_timing_start) * 1000
+            phases = g.phase_timings.phases if "phase_timings" in g else None
+            response.headers["Server-Timing"] = g.server_timing.header(phases, total_ms)
+            logging.getLogger("ServerTiming").debug(
+                "%s %s %s %.1fms %s", request.method, request.path, response.status_code, total_ms, g.server_timing
+            )
+        return response
+
+    @application.teardown_request
+    def end_timing(error=None):
+        if "server_timing_token" in g:
+            _timings.reset(g.pop("server_timing_token"))
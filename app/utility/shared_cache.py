@@ -0,0 +1,232 @@
+"""
+Cache shared by the processes of a host, e.g. the workers of a gunicorn deployment, see ``SharedCache``.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import Tuple
+
+from app.utility import init_logger
+from app.utility.aws import Singleton
+from app.utility.metrics import Metrics
+from app.utility.private_files import open_private
+
+MAGIC = b"LTISHC01"
+# magic, slots, slot size, padded to HEADER_SIZE
+HEADER = struct.Struct("<8sII")
+HEADER_SIZE = 64
+# version (odd while the slot is being written), expiry in seconds since the epoch, key and value lengths
+SLOT = struct.Struct("<QdHI")
+VERSION = struct.Struct("<Q")
+# slots a key may be stored in, from the one its hash designates
+PROBES = 8
+# reads of a slot that keeps changing before it is taken for a miss
+READ_ATTEMPTS = 100
+# seconds between two attempts to take a lock held by another process
+LOCK_POLL_INTERVAL = 0.002
+
+
+class SharedCache(metaclass=Singleton):
+    """
+    JSON values by key, each kept for its own TTL in the memory-mapped file SHARED_CACHE_PATH and shared by every
+    process that maps it. Without SHARED_CACHE_PATH the cache is disabled: nothing is kept and every lookup loads.
+    The file must be a regular file of the user running the process with mode 0600, see ``open_private``, or the
+    cache is disabled too.
+
+    The file holds SHARED_CACHE_SLOTS slots of SHARED_CACHE_SLOT_SIZE bytes, every process sharing it must use the
+    same values, a file of another layout is reset. A key is kept in the first of PROBES slots from the one its hash
+    designates that holds it or is free, or else in the one that expires first. A value that does not fit in a slot
+    is not kept.
+
+    Every slot has a version, odd while it is written: a reader takes no lock, it reads the slot again when the
+    version changed under it. Writers hold a lock on the first byte of the file, and ``get_or_load`` a lock on the
+    first byte of the key's slot while it loads, so a value missing from the cache is loaded by one process of the
+    host at a time. The locks are ``fcntl`` locks, held by the process, each is paired with a ``threading.Lock`` for
+    the threads of the process. A lock held by another process is waited for with ``time.sleep``, not by blocking in
+    ``fcntl``, so that under gevent the other greenlets of the worker keep running.
+    """
+
+    def __init__(self):
+        init_logger("SharedCache")
+        self.path = os.getenv("SHARED_CACHE_PATH") or None
+        self.enabled = self.path is not None
+        self.slots = int(os.getenv("SHARED_CACHE_SLOTS", "256"))
+        self.slot_size = int(os.getenv("SHARED_CACHE_SLOT_SIZE", "16384"))
+        self._map: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        self._write_lock = threading.Lock()
+        self._load_locks = [threading.Lock() for _ in range(self.slots)] if self.enabled else []
+        if self.enabled:
+            try:
+                self._fd = open_private(self.path)
+            except Exception as error:
+                # another user's file could hold keys of their own, the cache is not used rather than trusted
+                self.__log().error(f"Shared cache disabled. {error}")
+                self.enabled = False
+                self._load_locks = []
+            else:
+                self.__open()
+
+    def __log(self):
+        return logging.getLogger("SharedCache")
+
+    def __open(self):
+        size = HEADER_SIZE + self.slots * self.slot_size
+        with self.__locked(self._write_lock, 0):
+            header = os.pread(self._fd, HEADER.size, 0)
+            layout = (MAGIC, self.slots, self.slot_size)
+            if len(header) < HEADER.size or HEADER.unpack(header) != layout or os.fstat(self._fd).st_size != size:
+                self.__log().info(f"Initializing {self.path}, {self.slots} slots of {self.slot_size} bytes")
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, HEADER.pack(*layout), 0)
+        self._map = mmap.mmap(self._fd, size)
+
+    @contextmanager
+    def __locked(self, lock: threading.Lock, offset: int):
+        with lock:
+            while True:
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+                    break
+                except (BlockingIOError, PermissionError):
+                    time.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+
+    def __home(self, key: bytes) -> int:
+        # not hash(), which differs from one process to the next
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") % self.slots
+
+    def __offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * self.slot_size
+
+    def __read(self, slot: int) -> Optional[Tuple[bytes, float, bytes]]:
+        """
+        :return: the key, expiry and value of a slot, None when it is free or being written for too long
+        """
+        offset = self.__offset(slot)
+        for _ in range(READ_ATTEMPTS):
+            version, expires, key_length, value_length = SLOT.unpack_from(self._map, offset)
+            if version == 0:
+                return None
+            if version % 2 or key_length + value_length > self.slot_size - SLOT.size:
+                time.sleep(0)
+                continue
+            start = offset + SLOT.size
+            key = self._map[start : start + key_length]
+            value = self._map[start + key_length : start + key_length + value_length]
+            if VERSION.unpack_from(self._map, offset)[0] == version:
+                return key, expires, value
+        return None
+
+    def __write(self, slot: int, key: bytes, expires: float, value: bytes):
+        offset = self.__offset(slot)
+        version = VERSION.unpack_from(self._map, offset)[0]
+        VERSION.pack_into(self._map, offset, version + 1)
+        SLOT.pack_into(self._map, offset, version + 1, expires, len(key), len(value))
+        start = offset + SLOT.size
+        self._map[start : start + len(key) + len(value)] = key + value
+        VERSION.pack_into(self._map, offset, version + 2)
+
+    def __find(self, key: bytes) -> Tuple[Optional[int], Optional[Tuple[bytes, float, bytes]]]:
+        """
+        :return: the slot holding the key and its content, (None, None) when no slot does
+        """
+        home = self.__home(key)
+        for probe in range(PROBES):
+            slot = (home + probe) % self.slots
+            content = self.__read(slot)
+            if content is None:
+                return None, None
+            if content[0] == key:
+                return slot, content
+        return None, None
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        :return: the value of the key, None when it is missing, has expired or the cache is disabled
+        """
+        if not self.enabled:
+            return None
+        _, content = self.__find(key.encode("utf-8"))
+        if content is None or content[1] <= time.time():
+            return None
+        try:
+            return json.loads(content[2])
+        except ValueError:
+            return None
+
+    def set(self, key: str, value: Any, ttl: float) -> bool:
+        """
+        :param ttl: seconds the value is kept, nothing is kept for 0
+        :return: whether the value is kept, not when the cache is disabled or the value does not fit in a slot
+        """
+        if not self.enabled or ttl <= 0 or value is None:
+            return False
+        encoded_key = key.encode("utf-8")
+        encoded = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        if SLOT.size + len(encoded_key) + len(encoded) > self.slot_size:
+            self.__log().warning(f"{key} is {len(encoded)} bytes, over the slot size {self.slot_size}, not shared")
+            return False
+        with self.__locked(self._write_lock, 0):
+            self.__write(self.__slot_for(encoded_key), encoded_key, time.time() + ttl, encoded)
+        return True
+
+    def __slot_for(self, key: bytes) -> int:
+        """
+        :return: the slot holding the key, else the first free one, else the one that expires first
+        """
+        home = self.__home(key)
+        candidates = []
+        for probe in range(PROBES):
+            slot = (home + probe) % self.slots
+            content = self.__read(slot)
+            if content is None or content[0] == key:
+                return slot
+            candidates.append((content[1], slot))
+        return min(candidates)[1]
+
+    def delete(self, key: str):
+        """
+        Expire the key, its slot keeps the key so that the keys stored after it are still found.
+        """
+        if not self.enabled:
+            return
+        encoded_key = key.encode("utf-8")
+        with self.__locked(self._write_lock, 0):
+            slot, _ = self.__find(encoded_key)
+            if slot is not None:
+                self.__write(slot, encoded_key, 0.0, b"")
+
+    def get_or_load(self, key: str, ttl: float, load: Callable[[], Any]) -> Any:
+        """
+        :param load: returns the value when it is missing, a None is returned but not kept
+        :return: the value of the key, loaded by one process and thread of the host at a time when it is missing
+        """
+        if not self.enabled:
+            return load()
+        value = self.get(key)
+        Metrics().cache("Shared", hit=value is not None)
+        if value is not None:
+            return value
+        home = self.__home(key.encode("utf-8"))
+        with self.__locked(self._load_locks[home], self.__offset(home)):
+            # loaded by another process or thread while this one waited
+            value = self.get(key)
+            if value is None:
+                value = load()
+                self.set(key, value, ttl)
+        return value
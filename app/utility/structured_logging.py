@@ -0,0 +1,134 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from datetime import datetime
+from datetime import timezone
+
+# the attributes of every LogRecord, anything else was passed with ``extra``
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# names of the ``extra`` fields and of the form, query and JSON fields whose value is never logged
+SECRET_NAMES = (
+    "id_token",
+    "access_token",
+    "refresh_token",
+    "learn_rest_token",
+    "client_secret",
+    "one_time_session_token",
+    "token",
+    "password",
+    "secret",
+)
+_jwt = re.compile(r"eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*")
+_bearer = re.compile(r"(Bearer\s+)[A-Za-z0-9._~+/=-]+")
+_named = re.compile(r"""((?:"|'|\b)(?:%s)(?:"|')?\s*[:=]\s*["']?)[^"'\s,&}]+""" % "|".join(SECRET_NAMES))
+
+REDACTED = "[REDACTED]"
+
+
+def redact(text: str) -> str:
+    """
+    :return: ``text`` with JWTs, bearer tokens and the values of SECRET_NAMES fields replaced by [REDACTED]
+    """
+    text = _jwt.sub(REDACTED, text)
+    text = _bearer.sub(rf"\g<1>{REDACTED}", text)
+    return _named.sub(rf"\g<1>{REDACTED}", text)
+
+
+def extra_fields(record: logging.LogRecord) -> dict:
+    return {
+        name: REDACTED if name in SECRET_NAMES else value
+        for name, value in vars(record).items()
+        if name not in RECORD_ATTRIBUTES and name != "sample_rate" and not name.startswith("_")
+    }
+
+
+class RedactFilter(logging.Filter):
+    """
+    Format the message of a record that is going to be written and redact it, see ``redact``. Records below the
+    level of their logger never get here, their message is never formatted.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact(record.getMessage())
+        record.args = None
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """
+    Keep a fraction of the records of each message: ``extra={"sample_rate": rate}`` of the call, or
+    LOG_DEBUG_SAMPLE_RATE for DEBUG records. A message is the line of code that logs it, not its text, which is
+    often an f-string: the records of one high-volume debug event are sampled together and there is one count per
+    logging call of the code. The first record of a message is always kept, then one in every 1 / rate.
+    """
+
+    def __init__(self, debug_rate: float = 1.0):
+        super().__init__()
+        self.debug_rate = debug_rate
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # decided once for every handler the record goes through that shares this filter
+        sampled = getattr(record, "_sampled", None)
+        if sampled is None or sampled[0] is not self:
+            sampled = record._sampled = (self, self.__sample(record))
+        return sampled[1]
+
+    def __sample(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", self.debug_rate if record.levelno <= logging.DEBUG else 1.0)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+        return math.ceil(count * rate) > math.ceil((count - 1) * rate)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: timestamp, level, logger, the redacted message, the ``extra`` fields of the call
+    and the exception, if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        document = dict(
+            timestamp=datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            level=record.levelname,
+            logger=record.name,
+            message=redact(record.getMessage()),
+        )
+        # set by the Lambda runtime
+        if hasattr(record, "aws_request_id"):
+            document["aws_request_id"] = record.aws_request_id
+        document.update(extra_fields(record))
+        if record.exc_info:
+            document["exception"] = redact(self.formatException(record.exc_info))
+        return json.dumps(document, default=str, separators=(",", ":"))
+
+
+def configure(root: logging.Logger):
+    """
+    Add the sampling and redaction filters to the handlers of the root logger that do not have them yet and, with
+    LOG_FORMAT "json", the JSON formatter. A stderr handler is added when there is none and LOG_FORMAT is "json".
+    The handlers share one SampleFilter, so that a record is sampled once.
+    """
+    json_format = os.getenv("LOG_FORMAT", "text").lower() == "json"
+    if json_format and not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    samples = [f for handler in root.handlers for f in handler.filters if isinstance(f, SampleFilter)]
+    sample = samples[0] if samples else SampleFilter(float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1")))
+    for handler in root.handlers:
+        if sample in handler.filters:
+            continue
+        handler.addFilter(sample)
+        handler.addFilter(RedactFilter())
+        if json_format:
+            handler.setFormatter(JsonFormatter())
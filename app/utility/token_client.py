@@ -1,18 +1,25 @@
 import datetime
 import json
 import logging
+import os
 import secrets
+import threading
+import time
 from calendar import timegm
 from enum import Enum
 from enum import auto
-
-import requests
+from typing import Callable
+from typing import Optional
+from typing import Tuple
 
 from app.models.jwt import LTIJwtPayload
 from app.models.platform_config import LTIPlatform
 from app.models.tool_config import LTITool
 from app.models.tool_config import LTIToolStorage
 from app.utility import init_logger
+from app.utility.aws import Singleton
+from app.utility.http_client import HttpClient
+from app.utility.metrics import Metrics
 
 lti_scopes = (
     "https://purl.imsglobal.org/spec/lti-nrps/scope/contextmembership.readonly "
@@ -28,6 +35,48 @@ class GrantType(Enum):
     AUTH_CODE = auto()
 
 
+# locks the token requests of the process are spread over, by key
+TOKEN_LOCK_STRIPES = 64
+
+
+class BearerTokenCache(metaclass=Singleton):
+    """
+    Client credentials access tokens of the process, reused until BEARER_TOKEN_EXPIRY_MARGIN seconds before they
+    expire. A token is requested once however many threads need it at the same time: the requests hold the one of
+    TOKEN_LOCK_STRIPES locks the hash of their key designates, so that there is no lock per key to keep.
+    """
+
+    def __init__(self):
+        self.expiry_margin = int(os.getenv("BEARER_TOKEN_EXPIRY_MARGIN", "60"))
+        self._tokens = {}
+        self._locks = [threading.Lock() for _ in range(TOKEN_LOCK_STRIPES)]
+
+    def get(self, key: tuple, request: Callable[[], Tuple[str, int]]) -> str:
+        """
+        :param key: what the token is for, e.g. (token endpoint, client_id, scopes)
+        :param request: requests a new token, returns the access token and its expires_in seconds
+        :return: the cached access token, or a new one
+        """
+        token = self.__valid(key)
+        if token is not None:
+            Metrics().cache("BearerToken", hit=True)
+            return token
+        with self._locks[hash(key) % len(self._locks)]:
+            token = self.__valid(key)
+            Metrics().cache("BearerToken", hit=token is not None)
+            if token is None:
+                token, expires_in = request()
+                self._tokens[key] = (token, time.monotonic() + expires_in - self.expiry_margin)
+        return token
+
+    def invalidate(self, key: tuple):
+        self._tokens.pop(key, None)
+
+    def __valid(self, key: tuple) -> Optional[str]:
+        token, expires_at = self._tokens.get(key, (None, 0))
+        return token if expires_at > time.monotonic() else None
+
+
 class TokenClient:
     def __init__(self, **kwargs):
         init_logger("TokenClient")
@@ -35,24 +84,38 @@ class TokenClient:
     @staticmethod
     def request_bearer_token(platform: LTIPlatform, grantType: GrantType, tool: LTITool) -> str:
 
-        logging.debug(f"GrantType: {grantType}")
+        logging.getLogger("TokenClient").debug("GrantType: %s", grantType)
         access_token: str
 
         if grantType == GrantType.CLIENT_CREDENTIALS:
-            access_token = TokenClient.__request_bearer_client_credential(platform=platform, tool=tool)
+            access_token = BearerTokenCache().get(
+                TokenClient.bearer_token_key(platform),
+                lambda: TokenClient.__request_bearer_client_credential(platform=platform, tool=tool),
+            )
         elif grantType == GrantType.AUTH_CODE:
             access_token = TokenClient.__request_bearer_auth_code(platform=platform)
 
         return access_token
 
     @staticmethod
-    def get_learn_access_token(learn_url, redirect_url, auth_code):
+    def bearer_token_key(platform: LTIPlatform) -> tuple:
+        return platform.config.auth_token_url, platform.config.client_id, lti_scopes
+
+    @staticmethod
+    def invalidate_bearer_token(platform: LTIPlatform):
+        """
+        Drop the cached client credentials token of the platform, e.g. after it was refused with a 401.
+        """
+        BearerTokenCache().invalidate(TokenClient.bearer_token_key(platform))
+
+    @staticmethod
+    def get_learn_access_token(learn_url, redirect_url, auth_code, tool: Optional[LTITool] = None):
         oauth_url = learn_url + "/learn/api/public/v1/oauth2/token?code=" + auth_code + "&redirect_uri=" + redirect_url
 
         # Authenticate
         payload = {"grant_type": "authorization_code"}
-        lti_tool = LTITool(LTIToolStorage())
-        r = requests.post(
+        lti_tool = tool if tool is not None else LTITool(LTIToolStorage())
+        r = HttpClient().post(
             oauth_url,
             data=payload,
             auth=(lti_tool.config.learn_app_key, lti_tool.config.learn_app_secret),
@@ -68,7 +131,7 @@ class TokenClient:
         return learn_rest_token
 
     @staticmethod
-    def __request_bearer_client_credential(platform: LTIPlatform, tool: LTITool) -> str:
+    def __request_bearer_client_credential(platform: LTIPlatform, tool: LTITool) -> Tuple[str, int]:
         """
         Generate JWT and then request client credential grant access token.
         Tool Originating Messages: Client Credential grant:
@@ -98,15 +161,15 @@ class TokenClient:
             "scope": lti_scopes,
         }
 
-        r = requests.post(platform.config.auth_token_url, data=auth_request)
+        r = HttpClient().post(platform.config.auth_token_url, data=auth_request)
         if not r.ok:
             msg = f"Error retrieving access token from platfom {platform.config.auth_token_url}. {r.reason}: {r.text}"
             logging.error(msg)
             raise Exception(msg)
-        
+
         # access token (bearer token) to be used to communicate with the Provider (LMS)
-        access_token = r.json()["access_token"]
-        return access_token
+        token = r.json()
+        return token["access_token"], int(token.get("expires_in", 3600))
 
     def __request_bearer_auth_code(self) -> str:
         pass
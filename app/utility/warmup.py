@@ -0,0 +1,59 @@
+"""
+Pre-fork warm-up of a gunicorn master, see PRELOAD in ``gunicorn_config.py``.
+
+The master imports the application and fills the read-only state of the process before it forks the workers, which
+share it copy-on-write instead of each building its own on its first requests.
+"""
+import importlib
+import logging
+import time
+
+from flask import Flask
+
+from app.utility import init_logger
+from app.utility.aws import Singleton
+
+
+def warm(application: Flask):
+    """
+    Load the AWS clients' modules and service models, the tool's configuration and JWKS (``ToolConfigCache``), the
+    HTTP client's modules and the compiled templates. A failure is logged, what could not be loaded is loaded by each
+    worker on first use.
+    """
+    init_logger("Warmup")
+    start = time.perf_counter()
+    from app.models.tool_config import LTITool
+    from app.models.tool_config import LTIToolStorage
+    from app.utility.aws import Aws
+    from app.utility.http_client import HttpClient
+
+    try:
+        LTITool(LTIToolStorage())
+        # the clients are created on first use, loading their service models, see Aws
+        _ = Aws().kms
+    except Exception as e:
+        logging.getLogger("Warmup").warning(f"Tool configuration not warmed up, each worker loads it. {e}")
+    # the session is created on first use, importing requests and urllib3
+    _ = HttpClient().session
+    # imported by the id_token verification of the first launch
+    importlib.import_module("jwt")
+
+    # not the __pycache__ of the templates package
+    for name in application.jinja_env.list_templates(extensions=["html"]):
+        application.jinja_env.get_template(name)
+    logging.getLogger("Warmup").info("Warmed up in %.0fms", (time.perf_counter() - start) * 1000)
+
+
+def after_fork():
+    """
+    In a worker forked from a warmed-up master, drop what holds the master's sockets or threads: the AWS clients and
+    their connection pools, the HTTP session, the FanOut pool and the metrics aggregated so far. The caches are kept.
+    """
+    from app.utility.aws import Aws
+    from app.utility.fanout import FanOut
+    from app.utility.http_client import HttpClient
+    from app.utility.metrics import Metrics
+
+    Aws().reset_clients()
+    for cls in (HttpClient, FanOut, Metrics):
+        Singleton._instances.pop(cls, None)
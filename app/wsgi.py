@@ -1,9 +1,10 @@
 import logging
 
-import aws_lambda_wsgi
-
 from app import create_app
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
 from app.utility import init_logger
+from app.utility.metrics import flush_after
 from flask import render_template
 import werkzeug
 
@@ -17,11 +18,42 @@ def application_error_handler(e):
     return response
 
 
+@flush_after
 def lambda_handler(event, context):
-    __log().debug(f"Event: {event}")
+    import aws_lambda_wsgi
+
+    __log().debug("Event: %s", event)
     return aws_lambda_wsgi.response(application, event, context)
 
 
+@flush_after
+def state_sweeper_handler(event, context):
+    deleted = LTIState.delete_expired(LTIStateStorage())
+    __log().info(f"Deleted {deleted} expired State records")
+    return {"deleted": deleted}
+
+
+@flush_after
+def outbox_handler(event, context):
+    """
+    Publish the outbox: the OUTBOX# items of a DynamoDB stream event, or every due item when invoked on a schedule.
+    """
+    from app.models.outbox import outbox_record_codec
+    from app.utility.outbox_worker import OutboxWorker
+
+    worker = OutboxWorker()
+    if "Records" in event:
+        records = [
+            outbox_record_codec.decode(record["dynamodb"]["NewImage"])
+            for record in event["Records"]
+            if "NewImage" in record.get("dynamodb", {})
+        ]
+        report = worker.process(records)
+    else:
+        report = worker.drain()
+    return {"published": report.published, "retried": report.retried, "failed": report.failed}
+
+
 def __log():
     return logging.getLogger("app.endpoint")
 
@@ -0,0 +1,98 @@
+"""
+benchmarks
+----------
+Standalone measurements, run with ``python -m benchmarks.<name>``.
+"""
+import math
+import os
+import statistics
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable
+from typing import Optional
+
+PAYLOAD_PATH = Path(__file__).parent.parent.joinpath("payloads")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("TABLE_NAME", "benchmark")
+os.environ.setdefault("STATE_TTL", "7200")
+os.environ.setdefault("KMS_KEY_ID", "benchmark")
+os.environ.setdefault("KMS_SYMMETRIC_KEY_ID", "benchmark")
+os.environ.setdefault("LTI_TOOLING_API_URL_KEY", "/benchmark/lti-tooling/api/url")
+os.environ.setdefault("LEARN_APPLICATION_KEY_KEY", "/benchmark/learn/application/key")
+os.environ.setdefault("LEARN_APPLICATION_SECRET_KEY", "/benchmark/learn/application/secret")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def read_payload(file_name: str, variables: Optional[dict] = None) -> str:
+    data = PAYLOAD_PATH.joinpath(file_name).read_text()
+    if variables is not None:
+        for key, value in variables.items():
+            data = data.replace(key, value)
+    return data
+
+
+def attribute_size(value: dict) -> int:
+    """
+    Size in bytes of a DynamoDB attribute value, following
+    https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/CapacityUnitCalculations.html
+    """
+    (type_, v) = next(iter(value.items()))
+    if type_ == "S":
+        return len(v.encode("utf-8"))
+    if type_ == "B":
+        return len(v)
+    if type_ == "N":
+        digits = len(str(Decimal(v)).lstrip("-").replace(".", "").lstrip("0")) or 1
+        return math.ceil(digits / 2) + 1
+    if type_ in ("BOOL", "NULL"):
+        return 1
+    if type_ == "M":
+        return 3 + sum(len(k.encode("utf-8")) + attribute_size(a) + 1 for k, a in v.items())
+    if type_ == "L":
+        return 3 + sum(attribute_size(a) + 1 for a in v)
+    raise ValueError(f"Unsupported attribute type {type_}")
+
+
+def item_size(item: dict) -> int:
+    return sum(len(name.encode("utf-8")) + attribute_size(value) for name, value in item.items())
+
+
+def write_units(size: int) -> int:
+    return math.ceil(size / 1024)
+
+
+def read_units(size: int, consistent: bool = True) -> float:
+    units = math.ceil(size / 4096)
+    return units if consistent else units / 2
+
+
+def time_it(fn: Callable, iterations: int) -> list:
+    """
+    :return: per-call durations in microseconds
+    """
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: list) -> dict:
+    return dict(
+        n=len(samples),
+        mean=statistics.fmean(samples),
+        p50=percentile(samples, 50),
+        p99=percentile(samples, 99),
+    )
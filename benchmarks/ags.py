@@ -0,0 +1,48 @@
+"""
+Bulk score publishing through AgsClient against a local line item stub answering after 50 ms.
+
+"serial" posts one score at a time, the way a loop over ``publish_score`` would, "pooled" uses
+``publish_scores`` with the default AGS_MAX_WORKERS and AGS_HOST_CONCURRENCY, "throttled" is the same with every
+10th score answered 429 Retry-After: 0 first.
+
+    python -m benchmarks.ags [scores] [latency ms]
+"""
+import logging
+import sys
+from unittest.mock import patch
+
+from app.utility.ags_client import AgsClient
+from app.utility.token_client import TokenClient
+from benchmarks.environment import HttpStub
+from benchmarks.environment import ags_routes
+
+CASES = {
+    "serial": dict(max_workers=1, throttle_every=0),
+    "pooled": dict(max_workers=None, throttle_every=0),
+    "throttled": dict(max_workers=None, throttle_every=10),
+}
+
+
+def main(count: int, latency: float):
+    # the retries of the throttled case are logged as warnings
+    logging.getLogger("HttpClient").disabled = True
+    print(f"{count} scores, {latency * 1000:.0f} ms per POST")
+    print(f"  {'case':<12}{'published':>10}{'failed':>8}{'requests':>10}{'seconds':>9}{'scores/s':>10}")
+    with patch.object(TokenClient, "request_bearer_token", return_value="token"):
+        for case, options in CASES.items():
+            with HttpStub(ags_routes(latency, options["throttle_every"])) as stub:
+                client = AgsClient(platform=None, tool=None, max_workers=options["max_workers"])
+                scores = (AgsClient.score(f"user-{i}", i % 10, 10) for i in range(count))
+                report = client.publish_scores(f"{stub.url}/lineitems/1", scores)
+                print(
+                    f"  {case:<12}{report.published:>10}{len(report.failed):>8}"
+                    f"{stub.requests['POST /lineitems/1/scores']:>10}{report.seconds:>9.2f}"
+                    f"{report.published / report.seconds:>10.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05,
+    )
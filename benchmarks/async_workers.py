@@ -0,0 +1,68 @@
+"""
+Most launches per second the gunicorn deployment sustains with the gthread and the gevent worker classes, when AWS
+and the platform are slow to answer and a launch mostly waits.
+
+The stand-ins of ``benchmarks.load_test`` delay every answer, the latency of AWS and the platform, and gunicorn is
+started with ``gunicorn_config.py``, ``WORKER_CLASS`` and the given number of workers. Each mode serves more and more
+virtual users, as in ``benchmarks.load_test``, until it no longer keeps up: a load is sustained when less than
+MAX_ERROR_RATE of the requests fail and the p99 latency of every step is under SLO_MS. The rate reported for a mode is
+the highest one it sustained.
+
+    python -m benchmarks.async_workers [workers] [delay] [seconds]
+"""
+import sys
+
+from benchmarks.environment import PlatformKeys
+from benchmarks.load_test import gunicorn_process
+from benchmarks.load_test import measure
+from benchmarks.load_test import stand_ins_process
+
+MODES = ("gthread", "gevent")
+USERS = (4, 16, 64, 128, 256)
+MAX_ERROR_RATE = 0.01
+SLO_MS = 3000
+
+
+def error_rate(result: dict) -> float:
+    requests = sum(step["requests"] for step in result["steps"].values())
+    errors = sum(sum(step["errors"].values()) for step in result["steps"].values())
+    return errors / requests if requests else 0
+
+
+def sustained(result: dict) -> bool:
+    slow = any(step["p99_ms"] > SLO_MS for step in result["steps"].values())
+    return result["launches"] > 0 and error_rate(result) < MAX_ERROR_RATE and not slow
+
+
+def main(workers: int, delay: float, seconds: float):
+    keys = PlatformKeys()
+    print(f"{workers} workers, AWS and the platform answering in {delay * 1000:g} ms, {seconds:g} s per load")
+    print(f"  {'mode':<9}{'users':>6}{'launches/s':>12}{'p99 /launch ms':>16}{'error %':>9}  sustained")
+    best = {}
+    with stand_ins_process(keys, delay) as platform_url:
+        for mode in MODES:
+            best[mode] = 0.0
+            env = dict(WORKER_CLASS=mode, GUNICORN_CMD_ARGS=f"--workers {workers}")
+            with gunicorn_process(platform_url, **env) as (url, _):
+                for users in USERS:
+                    result = measure(url, platform_url, keys, users, seconds)
+                    ok = sustained(result)
+                    print(
+                        f"  {mode:<9}{users:>6}{result['launches_per_second']:>12.1f}"
+                        f"{result['steps']['/launch']['p99_ms']:>16.0f}{error_rate(result) * 100:>9.2f}  "
+                        f"{'yes' if ok else 'no'}"
+                    )
+                    if not ok:
+                        break
+                    best[mode] = max(best[mode], result["launches_per_second"])
+    print("most launches/s sustained")
+    for mode, rate in best.items():
+        print(f"  {mode:<9}{rate:>6.1f}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.25,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 15,
+    )
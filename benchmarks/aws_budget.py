@@ -0,0 +1,167 @@
+"""
+AWS call budget of each route of a launch: every boto3 operation made while serving a request is recorded with the
+table and key prefix it touches and the application frames that made it, and checked against ``BUDGETS``.
+
+The routes are served warm, after a first launch has filled the caches of the process, by the Flask test client with
+DynamoDB, KMS and SSM answered in memory (``benchmarks.memory_aws``). ``tests/app/unit/test_aws_budget.py`` fails
+when a route goes over its budget, printing the stack of every call of the offending category.
+
+    python -m benchmarks.aws_budget
+"""
+import sys
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from unittest.mock import patch
+
+from botocore.client import BaseClient
+
+from app import create_app
+from app.utility.aws import Singleton
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import learn_routes
+from benchmarks.launch_flow import launch
+from benchmarks.memory_aws import memory_aws
+
+APP_ROOT = str(Path(__file__).parent.parent.joinpath("app"))
+DYNAMODB_WRITES = frozenset(("PutItem", "UpdateItem", "DeleteItem", "BatchWriteItem"))
+
+# most calls each route may make when warm, by category: "total", a service ("ssm"), reads or writes of a service
+# ("dynamodb:write") or an operation ("dynamodb:Scan"). A category that is not listed is not limited.
+BUDGETS = {
+    "/login": {"total": 2, "dynamodb:read": 1, "dynamodb:write": 1, "dynamodb:Scan": 0, "ssm": 0, "kms": 0},
+    "/launch": {"total": 2, "dynamodb:read": 1, "dynamodb:write": 1, "dynamodb:Scan": 0, "ssm": 0, "kms": 0},
+    "/submit_assignment": {"total": 2, "dynamodb:write": 1, "dynamodb:Scan": 0, "ssm": 0, "kms": 0},
+    "/jwks.json": {"total": 0},
+}
+
+
+class AwsCall(NamedTuple):
+    service: str
+    operation: str
+    table: Optional[str]
+    key_prefix: Optional[str]
+    stack: List[str]
+
+    @property
+    def categories(self) -> List[str]:
+        access = "write" if self.operation in DYNAMODB_WRITES else "read"
+        categories = ["total", self.service, f"{self.service}:{self.operation}"]
+        return categories + [f"{self.service}:{access}"] if self.service == "dynamodb" else categories
+
+    def __str__(self) -> str:
+        target = " ".join(part for part in (self.table, self.key_prefix) if part)
+        return f"{self.service}:{self.operation} {target}".rstrip()
+
+
+def key_prefix(params: dict) -> Optional[str]:
+    """
+    :return: the partition keys of the items an operation reads or writes up to their first "#", e.g. "STATE#", the
+        prefix a scan filters on, or the parameter name for SSM
+    """
+    if "Name" in params:
+        return params["Name"]
+    keys = [params[name] for name in ("Key", "Item") if name in params]
+    for request in params.get("RequestItems", {}).values():
+        if isinstance(request, dict):
+            keys.extend(request["Keys"])
+            continue
+        # the PutRequest and DeleteRequest of a batch_write_item
+        for (write,) in (r.values() for r in request):
+            keys.append(write.get("Key") or write.get("Item"))
+    if keys:
+        return ",".join(dict.fromkeys(key["PK"]["S"].partition("#")[0] + "#" for key in keys if "PK" in key))
+    prefix = params.get("ExpressionAttributeValues", {}).get(":prefix")
+    return prefix["S"] if prefix else None
+
+
+def application_stack() -> List[str]:
+    """
+    :return: the formatted frames of the application in the current stack, outermost first
+    """
+    frames = [frame for frame in traceback.extract_stack() if frame.filename.startswith(APP_ROOT)]
+    return traceback.format_list(frames)
+
+
+@contextmanager
+def record_aws_calls():
+    """
+    Record every AWS operation made through botocore, on top of whatever answers it (moto or ``memory_aws``).
+
+    :return: the list the AwsCall are appended to
+    """
+    calls = []
+    make_api_call = BaseClient._make_api_call
+
+    def record(client, operation_name, api_params):
+        service = client.meta.service_model.service_name
+        table = api_params.get("TableName") or next(iter(api_params.get("RequestItems", {})), None)
+        calls.append(AwsCall(service, operation_name, table, key_prefix(api_params), application_stack()))
+        return make_api_call(client, operation_name, api_params)
+
+    with patch.object(BaseClient, "_make_api_call", record):
+        yield calls
+
+
+def over_budget(route: str, calls: List[AwsCall], budget: dict) -> List[str]:
+    """
+    :return: a description of every category of ``budget`` the calls exceed, with the stack of each call counted
+    """
+    problems = []
+    for category, limit in budget.items():
+        counted = [call for call in calls if category in call.categories]
+        if len(counted) <= limit:
+            continue
+        lines = [f"{route} made {len(counted)} {category} calls, budget {limit}:"]
+        for call in counted:
+            lines.append(f"  {call}")
+            lines.extend(f"    {line}" for frame in call.stack for line in frame.rstrip().splitlines())
+        problems.append("\n".join(lines))
+    return problems
+
+
+def warm_launch_calls() -> dict:
+    """
+    :return: by route, the AwsCall made serving it in a launch after a first one warmed up the process
+    """
+    keys = PlatformKeys()
+    routes = dict(learn_routes(), **{"/jwks.json": lambda request: (200, {}, keys.jwks)})
+    Singleton._instances.clear()
+    with HttpStub(routes) as platform, memory_aws(key_set_url=f"{platform.url}/jwks.json"):
+        client = create_app().test_client()
+        with record_aws_calls() as calls:
+            # the last launch's calls are kept, the first one fills the caches
+            for _ in range(2):
+                by_route = {}
+                flow = launch(client, keys, platform.url)
+                response = None
+                while True:
+                    try:
+                        route, send = flow.send(response)
+                    except StopIteration:
+                        break
+                    calls.clear()
+                    response = send()
+                    assert response.status_code in (200, 302), f"{route} returned {response.status_code}"
+                    by_route[route] = list(calls)
+    return by_route
+
+
+def main() -> int:
+    problems = []
+    for route, calls in warm_launch_calls().items():
+        print(f"{route}: {len(calls)} calls")
+        for call in calls:
+            print(f"  {call}")
+        problems.extend(over_budget(route, calls, BUDGETS[route]))
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Cold start and request latency of AWS client construction.
+
+Cold start runs each case in a fresh interpreter and times creating the clients a /jwks.json request needs:
+"eager" creates SSM, DynamoDB client, DynamoDB resource and KMS up front the way ``Aws.__init__`` used to,
+"lazy" only touches ``Aws().ssm`` and ``Aws().dynamodb``.
+
+Request latency drives /jwks.json and /login against moto, "client per storage" builds a new DynamoDB client
+every time ``LTIStateStorage()`` is constructed, as it used to, "shared" goes through the ``Aws`` singleton.
+
+    python -m benchmarks.aws_clients [runs] [requests]
+"""
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import boto3
+
+from app import create_app
+from app.models.state import LTIStateStorage
+from benchmarks import summarize
+from benchmarks import time_it
+from benchmarks.environment import CLIENT_ID
+from benchmarks.environment import DEPLOYMENT_ID
+from benchmarks.environment import ISS
+from benchmarks.environment import local_aws
+
+COLD_START = {
+    "eager": (
+        "import boto3\n"
+        "session = boto3.session.Session()\n"
+        "start = time.perf_counter()\n"
+        "clients = [session.client('ssm'), session.client('dynamodb'), session.resource('dynamodb'), "
+        "session.client('kms')]\n"
+    ),
+    "lazy": (
+        "from app.utility.aws import Aws\n"
+        "start = time.perf_counter()\n"
+        "aws = Aws()\n"
+        "clients = [aws.ssm, aws.dynamodb]\n"
+    ),
+}
+
+
+def cold_start(case: str) -> float:
+    script = "import time\n" + COLD_START[case] + "print((time.perf_counter() - start) * 1000)\n"
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+        env=dict(os.environ),
+    )
+    return float(output.stdout.strip())
+
+
+def client_per_storage(self):
+    self.TABLE_NAME = os.getenv("TABLE_NAME")
+    self.TTL = os.getenv("STATE_TTL", "7200")
+    self.ENCODING = os.getenv("STATE_ENCODING", "map")
+    self.ddbclient = boto3.client("dynamodb")
+
+
+def request_latency(shared: bool, requests: int) -> dict:
+    login = dict(
+        iss=ISS, client_id=CLIENT_ID, lti_deployment_id=DEPLOYMENT_ID, login_hint="hint", target_link_uri="/launch"
+    )
+    results = {}
+    with local_aws():
+        client = create_app().test_client()
+        with patch.object(LTIStateStorage, "__init__", LTIStateStorage.__init__ if shared else client_per_storage):
+            results["/jwks.json"] = summarize(time_it(lambda: client.get("/jwks.json"), requests))
+            results["/login"] = summarize(time_it(lambda: client.get("/login", query_string=login), requests))
+    return results
+
+
+def main(runs: int, requests: int):
+    print(f"cold start, clients for /jwks.json ({runs} fresh interpreters)")
+    for case in COLD_START:
+        samples = [cold_start(case) for _ in range(runs)]
+        print(f"  {case:<8}median {statistics.median(samples):8.1f} ms   max {max(samples):8.1f} ms")
+
+    print(f"request latency against moto ({requests} requests)")
+    for name, shared in (("client per storage", False), ("shared", True)):
+        for route, s in request_latency(shared, requests).items():
+            print(f"  {name:<20}{route:<12}p50 {s['p50'] / 1000:7.2f} ms   p99 {s['p99'] / 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
@@ -0,0 +1,69 @@
+"""
+Learn and AWS calls made for the course info of repeat launches into the same course.
+
+Each launch renders the course info the way ``render_ui`` does, from a state holding the Learn REST token.
+"uncached" drops the CourseInfoCache before every launch, which is what ``get_course_info`` used to do: load the
+state, KMS-decrypt the token and call Learn. "cached" keeps it, "revalidated" uses a COURSE_INFO_TTL of 0 so that
+every launch revalidates with an If-None-Match Learn answers 304 to.
+
+    python -m benchmarks.course_info [launches]
+"""
+import os
+import sys
+from collections import Counter
+
+from app import create_app
+from app.models.course_info import CourseInfoCache
+from app.models.jwt import LTIJwtPayload
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from app.utility.aws import Singleton
+from app.utility.learn_client import LearnClient
+from benchmarks import summarize
+from benchmarks import time_it
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import count_aws_calls
+from benchmarks.environment import learn_routes
+from benchmarks.environment import local_aws
+from benchmarks.environment import tool_platform
+
+MODES = {"uncached": "3600", "cached": "3600", "revalidated": "0"}
+
+
+def run(mode: str, launches: int) -> tuple:
+    os.environ["COURSE_INFO_TTL"] = MODES[mode]
+    Singleton._instances.pop(CourseInfoCache, None)
+    app = create_app()
+    with local_aws(), HttpStub(learn_routes()) as learn:
+        keys = PlatformKeys()
+        jwt_request = LTIJwtPayload(keys.id_token("nonce", **tool_platform(learn.url)))
+        state = LTIState(LTIStateStorage())
+        state.record.set_platform_learn_rest_token("learn-token")
+        state.save()
+
+        def launch():
+            if mode == "uncached":
+                Singleton._instances.pop(CourseInfoCache, None)
+            with app.test_request_context():
+                assert LearnClient().get_course_info(jwt_request, state.record.id)["uuid"]
+
+        with count_aws_calls() as aws_calls:
+            samples = time_it(launch, launches)
+        return Counter(learn.requests), dict(aws_calls), summarize(samples)
+
+
+def main(launches: int):
+    print(f"{launches} launches into the same course")
+    print(f"  {'mode':<14}{'Learn calls':>12}{'AWS calls':>11}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode in MODES:
+        learn_calls, aws_calls, s = run(mode, launches)
+        print(
+            f"  {mode:<14}{sum(learn_calls.values()):>12}{sum(aws_calls.values()):>11}"
+            f"{s['p50'] / 1000:>10.2f}{s['p99'] / 1000:>10.2f}"
+            f"   {', '.join(f'{k} {v}' for k, v in sorted(aws_calls.items()))}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,63 @@
+"""
+Deep linking N assignments through /create_assignment, with KMS Sign answered locally after 20 ms.
+
+"one response" posts the N assignments at once and gets one LtiDeepLinkingResponse with N content items, "N responses"
+posts them one at a time, the way a teacher had to before, each response signed on its own. The deep linking launch
+before each post is not timed, its state is stored in the counted AWS calls.
+
+    python -m benchmarks.deep_linking [items] [kms latency ms]
+"""
+import sys
+import time
+
+from app import create_app
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import count_aws_calls
+from benchmarks.environment import local_aws
+from benchmarks.environment import local_kms_sign
+
+CLAIMS = {
+    "https://purl.imsglobal.org/spec/lti/claim/message_type": "LtiDeepLinkingRequest",
+    "https://purl.imsglobal.org/spec/lti-dl/claim/deep_linking_settings": dict(
+        deep_link_return_url="https://learn/deep_link_return", data="csrf", accept_multiple=True
+    ),
+}
+
+
+def create(client, keys: PlatformKeys, assignments: list) -> float:
+    state = LTIState(LTIStateStorage())
+    state.record.id_token = keys.id_token("nonce", **CLAIMS)
+    state.save()
+    client.set_cookie("localhost", "state", state.record.id)
+    form = dict(state=state.record.id, name=[a[0] for a in assignments], points=[a[1] for a in assignments])
+    start = time.perf_counter()
+    response = client.post("/create_assignment", data=form)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.status_code
+    return elapsed
+
+
+def main(items: int, latency: float):
+    keys = PlatformKeys()
+    assignments = [(f"Assignment {i}", "10") for i in range(items)]
+    print(f"{items} assignments, KMS Sign after {latency * 1000:.0f} ms")
+    print(f"  {'case':<14}{'requests':>9}{'ms':>9}{'KMS Sign':>10}{'AWS calls':>11}")
+    with local_aws(), local_kms_sign(keys, latency) as signs:
+        client = create_app().test_client()
+        # the first request loads the tool's configuration
+        create(client, keys, assignments[:1])
+        cases = {"one response": [assignments], "N responses": [[assignment] for assignment in assignments]}
+        for case, posts in cases.items():
+            signs.clear()
+            with count_aws_calls() as calls:
+                elapsed = sum(create(client, keys, assignments) for assignments in posts)
+            print(f"  {case:<14}{len(posts):>9}{elapsed * 1000:>9.1f}{signs['Sign']:>10}{sum(calls.values()):>11}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02,
+    )
@@ -0,0 +1,451 @@
+"""
+Local stand-ins shared by the benchmarks: moto backed AWS seeded with a tool, a platform and tool keys, a platform
+key pair to sign launches with, a counter of the AWS calls made by the application and a local HTTP stub for the
+platform and Learn endpoints.
+"""
+import base64
+import datetime
+import ipaddress
+import json
+import os
+import ssl
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from itertools import cycle
+from typing import Callable
+from typing import Optional
+from urllib.parse import parse_qs
+from unittest.mock import patch
+
+import boto3
+import jwt
+from botocore.client import BaseClient
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from jwcrypto.jwk import JWK
+from moto import mock_dynamodb
+from moto import mock_kms
+from moto import mock_ssm
+
+from app.models.outbox import DUE_ATTRIBUTE
+from app.models.outbox import DUE_INDEX
+from benchmarks import read_payload
+
+CLIENT_ID = "75363971-2683-4ad9-a31b-93ec41e27772"
+ISS = "https://blackboard.com"
+DEPLOYMENT_ID = "f66151aa-a799-4b22-93ed-81dd16f70a4e"
+PLATFORM_KID = "75363971-2683-4ad9-a31b-93ec41e27772"
+TOOL_URL = "http://localhost/api/"
+COURSE_UUID = "7b0b3748346a407bb4d5c6d466ead9ba"
+TOOL_PLATFORM_CLAIM = "https://purl.imsglobal.org/spec/lti/claim/tool_platform"
+PLATFORM_KEY_SET_URL = "https://developer.blackboard.com/api/v1/management/applications/jwks.json"
+PLATFORM_AUTH_TOKEN_URL = "https://developer.blackboard.com/api/v1/gateway/oauth2/jwttoken"
+
+
+class PlatformKeys:
+    """
+    The platform's key pair, used to sign id_tokens and to serve the platform JWKS.
+    """
+
+    def __init__(self):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_key = key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        self.public_key = key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM, format=serialization.PublicFormat.PKCS1
+        )
+        jwk = JWK()
+        jwk.import_from_pem(data=self.public_key, kid=PLATFORM_KID)
+        self.jwks = {"keys": [jwk.export_public(as_dict=True)]}
+
+    def id_token(self, nonce: str, **claims) -> str:
+        now = int(time.time())
+        payload = json.loads(
+            read_payload("token_payload.json", {'"NOW"': str(now), '"EXPIRATION"': str(now + 300), "NONCE": nonce})
+        )
+        payload.update(claims)
+        return jwt.encode(payload, self.private_key, algorithm="RS256", headers={"kid": PLATFORM_KID})
+
+
+@contextmanager
+def local_aws(tool_keys: int = 2):
+    """
+    Start moto for DynamoDB, SSM and KMS and seed the LTI table, the tool's SSM parameters and the tool keys.
+    """
+    with mock_dynamodb(), mock_ssm(), mock_kms():
+        yield seed_aws(tool_keys)
+
+
+def seed_aws(
+    tool_keys: int = 2, key_set_url: str = PLATFORM_KEY_SET_URL, auth_token_url: str = PLATFORM_AUTH_TOKEN_URL
+):
+    """
+    Create the LTI table and seed it, the tool's SSM parameters and the tool keys, through whatever stands in for
+    AWS.
+
+    :param key_set_url: the platform JWKS
+    :param auth_token_url: the platform's OAuth2 token endpoint
+    :return: the DynamoDB client used
+    """
+    dynamodb = boto3.client("dynamodb")
+    dynamodb.create_table(
+        TableName=os.getenv("TABLE_NAME"),
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[
+            {"AttributeName": "PK", "AttributeType": "S"},
+            {"AttributeName": DUE_ATTRIBUTE, "AttributeType": "S"},
+            {"AttributeName": "next_attempt_at", "AttributeType": "N"},
+        ],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": DUE_INDEX,
+                "KeySchema": [
+                    {"AttributeName": DUE_ATTRIBUTE, "KeyType": "HASH"},
+                    {"AttributeName": "next_attempt_at", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+    )
+    ssm = boto3.client("ssm")
+    ssm.put_parameter(Name=os.getenv("LTI_TOOLING_API_URL_KEY"), Value=TOOL_URL, Type="String")
+    ssm.put_parameter(Name=os.getenv("LEARN_APPLICATION_KEY_KEY"), Value="LEARN_KEY", Type="String")
+    ssm.put_parameter(Name=os.getenv("LEARN_APPLICATION_SECRET_KEY"), Value="SECRET", Type="SecureString")
+    kms = boto3.client("kms")
+    os.environ["KMS_SYMMETRIC_KEY_ID"] = kms.create_key()["KeyMetadata"]["KeyId"]
+
+    tool_key = PlatformKeys()
+    for _ in range(tool_keys):
+        kid = str(uuid.uuid4())
+        dynamodb.put_item(
+            TableName=os.getenv("TABLE_NAME"),
+            Item={
+                "PK": {"S": f"JWK#{kid}"},
+                "kid": {"S": kid},
+                "kms_key_id": {"S": os.getenv("KMS_KEY_ID")},
+                "public_key_pem": {"S": base64.b64encode(tool_key.public_key).decode("utf-8")},
+                "ttl": {"N": str(int(time.time()) + 2592000)},
+            },
+        )
+    dynamodb.put_item(
+        TableName=os.getenv("TABLE_NAME"),
+        Item={
+            "PK": {"S": f"CONFIG#{CLIENT_ID}#{ISS}#{DEPLOYMENT_ID}"},
+            "auth_login_url": {"S": "https://developer.blackboard.com/api/v1/gateway/oidcauth"},
+            "auth_token_url": {"S": auth_token_url},
+            "client_id": {"S": CLIENT_ID},
+            "iss": {"S": ISS},
+            "key_set_url": {"S": key_set_url},
+            "lti_deployment_id": {"S": DEPLOYMENT_ID},
+        },
+    )
+    return dynamodb
+
+
+@contextmanager
+def count_aws_calls():
+    """
+    Count every AWS operation made through botocore, keyed by "service:Operation".
+    """
+    calls = Counter()
+    make_api_call = BaseClient._make_api_call
+
+    def record(client, operation_name, api_params):
+        calls[f"{client.meta.service_model.service_name}:{operation_name}"] += 1
+        return make_api_call(client, operation_name, api_params)
+
+    with patch.object(BaseClient, "_make_api_call", record):
+        yield calls
+
+
+@contextmanager
+def aws_latency(seconds: float):
+    """
+    Wait ``seconds`` before every AWS call, like the round trip to the service from Lambda.
+    """
+    make_api_call = BaseClient._make_api_call
+
+    def delayed(client, operation_name, api_params):
+        time.sleep(seconds)
+        return make_api_call(client, operation_name, api_params)
+
+    with patch.object(BaseClient, "_make_api_call", delayed):
+        yield
+
+
+@contextmanager
+def local_kms_sign(keys: PlatformKeys, latency: float = 0):
+    """
+    Answer KMS Sign, which moto does not implement, with ``keys``, after ``latency`` seconds like a KMS round trip.
+    Count the calls made.
+    """
+    private_key = serialization.load_pem_private_key(keys.private_key, password=None)
+    calls = Counter()
+    make_api_call = BaseClient._make_api_call
+
+    def sign(client, operation_name, api_params):
+        if operation_name != "Sign":
+            return make_api_call(client, operation_name, api_params)
+        calls["Sign"] += 1
+        time.sleep(latency)
+        message = api_params["Message"]
+        message = message.encode("utf-8") if isinstance(message, str) else message
+        signature = private_key.sign(message, padding.PKCS1v15(), hashes.SHA256())
+        return {"KeyId": api_params["KeyId"], "Signature": signature, "SigningAlgorithm": "RSASSA_PKCS1_V1_5_SHA_256"}
+
+    with patch.object(BaseClient, "_make_api_call", sign):
+        yield calls
+
+
+class StubServer(ThreadingHTTPServer):
+    # the default backlog of 5 resets the connections of a burst of clients, e.g. the greenlets of a load test
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class HttpStub:
+    """
+    A local HTTP/1.1 server with keep-alive, answering each path with a handler and counting the TCP connections.
+
+    A handler takes the ``BaseHTTPRequestHandler`` and returns (status, headers, body), body being bytes, str or a
+    JSON serializable object. Unknown paths return 404. With ``tls`` the stub serves HTTPS with a self-signed
+    certificate for 127.0.0.1, pass ``verify=stub.ca`` to the client.
+    """
+
+    def __init__(self, routes: dict, delay: float = 0, tls: bool = False):
+        self.routes = routes
+        self.delay = delay
+        self.connections = 0
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                with stub._lock:
+                    stub.connections += 1
+                super().setup()
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle_one_request_for(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.body = self.rfile.read(length) if length else b""
+                path = self.path.split("?")[0]
+                with stub._lock:
+                    stub.requests[f"{method} {path}"] += 1
+                handler: Callable = stub.routes.get(path)
+                status, headers, body = handler(self) if handler else (404, {}, b"")
+                if not isinstance(body, (bytes, str)):
+                    body = json.dumps(body)
+                    headers = {"Content-Type": "application/json", **headers}
+                body = body.encode("utf-8") if isinstance(body, str) else body
+                if stub.delay:
+                    time.sleep(stub.delay)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.handle_one_request_for("GET")
+
+            def do_POST(self):
+                self.handle_one_request_for("POST")
+
+            def do_PUT(self):
+                self.handle_one_request_for("PUT")
+
+        self.server = StubServer(("127.0.0.1", 0), Handler)
+        # clients that give up on a slow answer close the connection under the handler, that is expected
+        self.server.handle_error = lambda request, client_address: None
+        self.ca = None
+        if tls:
+            self.ca = self.__certificate()
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.ca)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        scheme = "https" if tls else "http"
+        self.url = f"{scheme}://127.0.0.1:{self.server.server_address[1]}"
+
+    @staticmethod
+    def __certificate() -> str:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+        now = datetime.datetime.utcnow()
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(minutes=5))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), False)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .sign(key, hashes.SHA256())
+        )
+        with tempfile.NamedTemporaryFile("wb", suffix=".pem", delete=False) as pem:
+            pem.write(
+                key.private_bytes(
+                    encoding=serialization.Encoding.PEM,
+                    format=serialization.PrivateFormat.PKCS8,
+                    encryption_algorithm=serialization.NoEncryption(),
+                )
+            )
+            pem.write(certificate.public_bytes(serialization.Encoding.PEM))
+        return pem.name
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.ca is not None:
+            os.unlink(self.ca)
+
+
+def learn_routes(course: Optional[dict] = None, etag: str = '"1"') -> dict:
+    """
+    Stub of the Learn public API a launch uses: the authorization code exchange and the course of the launch,
+    answering 304 to a matching If-None-Match.
+    """
+    course = course or {"id": "_1_1", "uuid": COURSE_UUID, "name": "LTI 101", "modified": "2022-06-01T00:00:00.000Z"}
+
+    def course_info(request):
+        if request.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag}, course
+
+    def token(request):
+        return 200, {}, {"access_token": "learn-token", "token_type": "bearer", "expires_in": 3600}
+
+    return {
+        "/learn/api/public/v1/oauth2/token": token,
+        f"/learn/api/public/v2/courses/uuid:{COURSE_UUID}": course_info,
+    }
+
+
+def tool_platform(url: str) -> dict:
+    """
+    The tool_platform claim of a launch from the Learn instance at ``url``.
+    """
+    return {TOOL_PLATFORM_CLAIM: {"name": "Blackboard, Inc.", "product_family_code": "BlackboardLearn", "url": url}}
+
+
+def member(index: int, status: str = "Active") -> dict:
+    return {
+        "status": status,
+        "name": f"Student {index}",
+        "given_name": "Student",
+        "family_name": str(index),
+        "email": f"student{index}@example.com",
+        "user_id": f"user-{index}",
+        "lis_person_sourcedid": f"sis-{index}",
+        "roles": ["http://purl.imsglobal.org/vocab/lis/v2/membership#Learner"],
+    }
+
+
+def nrps_routes(members: int, changes: int = 0) -> dict:
+    """
+    Stub of a Names and Role Provisioning Services roster of ``members`` members served in pages of the requested
+    ``limit`` linked with rel="next". The last page links rel="differences" to ``changes`` deleted members.
+    """
+
+    def roster(request):
+        query = parse_qs(request.path.partition("?")[2])
+        limit = int(query.get("limit", ["100"])[0])
+        offset = int(query.get("offset", ["0"])[0])
+        base = f"http://{request.headers['Host']}/nrps/memberships"
+        page = [member(i) for i in range(offset, min(offset + limit, members))]
+        if offset + limit < members:
+            link = f'<{base}?limit={limit}&offset={offset + limit}>; rel="next"'
+        else:
+            link = f'<{base}/differences?since={members}>; rel="differences"'
+        body = {"id": base, "context": {"id": COURSE_UUID, "title": "LTI 101"}, "members": page}
+        return 200, {"Link": link, "Content-Type": "application/vnd.ims.lti-nrps.v2.membershipcontainer+json"}, body
+
+    def differences(request):
+        base = f"http://{request.headers['Host']}/nrps/memberships"
+        page = [member(i, status="Deleted") for i in range(changes)]
+        link = f'<{base}/differences?since={members + changes}>; rel="differences"'
+        return 200, {"Link": link}, {"id": base, "members": page}
+
+    return {"/nrps/memberships": roster, "/nrps/memberships/differences": differences}
+
+
+def ags_routes(latency: float = 0, throttle_every: int = 0, score_maximum: float = 10) -> dict:
+    """
+    Stub of an Assignment and Grade Services line item accepting scores at /lineitems/1/scores after ``latency``
+    seconds, answering 429 with Retry-After: 0 to every ``throttle_every``-th score. The line item itself, with
+    ``score_maximum``, is at /lineitems/1.
+    """
+    received = Counter()
+    lock = threading.Lock()
+
+    def scores(request):
+        with lock:
+            received["scores"] += 1
+            count = received["scores"]
+        time.sleep(latency)
+        if throttle_every and count % throttle_every == 0:
+            return 429, {"Retry-After": "0"}, b""
+        return 200, {}, b""
+
+    def line_item(request):
+        return 200, {}, dict(id=request.path, scoreMaximum=score_maximum, label="Assignment", resourceId="1")
+
+    return {"/lineitems/1": line_item, "/lineitems/1/scores": scores}
+
+
+def line_item_routes(count: int, latency: float = 0) -> dict:
+    """
+    Stub of the Assignment and Grade Services lineitems endpoint of a context at /lineitems, with ``count`` line items
+    served in pages of the requested ``limit`` linked with rel="next", tagged "originality" every other one. A POST
+    creates a line item after ``latency`` seconds.
+    """
+    line_items = [
+        dict(id=f"/lineitems/{i}", label=f"Assignment {i}", scoreMaximum=10, resourceId=f"resource-{i}", tag=tag)
+        for i, tag in zip(range(count), cycle(["originality", "quiz"]))
+    ]
+    lock = threading.Lock()
+
+    def container(request):
+        base = f"http://{request.headers['Host']}/lineitems"
+        if request.command == "POST":
+            time.sleep(latency)
+            with lock:
+                line_item = dict(json.loads(request.body), id=f"{base}/{len(line_items)}")
+                line_items.append(line_item)
+            return 201, {"Content-Type": "application/vnd.ims.lis.v2.lineitem+json"}, line_item
+        query = parse_qs(request.path.partition("?")[2])
+        limit = int(query.get("limit", ["100"])[0])
+        offset = int(query.get("offset", ["0"])[0])
+        headers = {"Content-Type": "application/vnd.ims.lis.v2.lineitemcontainer+json"}
+        if offset + limit < len(line_items):
+            headers["Link"] = f'<{base}?limit={limit}&offset={offset + limit}>; rel="next"'
+        return 200, headers, line_items[offset : offset + limit]
+
+    return {"/lineitems": container}
@@ -0,0 +1,69 @@
+"""
+Connection reuse of the pooled HttpClient against bare ``requests`` calls.
+
+Calls a local keep-alive HTTP stub of the Learn course and token endpoints the way ``LearnClient`` and
+``TokenClient`` do, "per call" with ``requests.get``/``requests.post`` as they used to, "pooled" through
+``HttpClient``, sequentially and from a pool of threads, over plain HTTP and over TLS, and reports the TCP
+connections the stub accepted and the p50/p99 latency.
+
+    python -m benchmarks.http_client [requests] [threads]
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app.utility.http_client import HttpClient
+from benchmarks import summarize
+from benchmarks import time_it
+from benchmarks.environment import HttpStub
+
+COURSE_PATH = "/learn/api/public/v2/courses/uuid:course"
+TOKEN_PATH = "/learn/api/public/v1/oauth2/token"
+ROUTES = {
+    COURSE_PATH: lambda request: (200, {}, {"id": "_1_1", "name": "Course"}),
+    TOKEN_PATH: lambda request: (200, {}, {"access_token": "token"}),
+}
+
+
+def launch_calls(client, stub: HttpStub):
+    verify = stub.ca or True
+    client.post(f"{stub.url}{TOKEN_PATH}", data={"grant_type": "authorization_code"}, verify=verify).json()
+    client.get(f"{stub.url}{COURSE_PATH}", headers={"Authorization": "Bearer token"}, verify=verify).json()
+
+
+def run(client, count: int, threads: int, tls: bool) -> tuple:
+    with HttpStub(ROUTES, tls=tls) as stub:
+        if threads == 1:
+            samples = time_it(lambda: launch_calls(client, stub), count)
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                samples = [
+                    sample
+                    for chunk in executor.map(
+                        lambda _: time_it(lambda: launch_calls(client, stub), count // threads), range(threads)
+                    )
+                    for sample in chunk
+                ]
+        return stub.connections, summarize(samples)
+
+
+def main(count: int, threads: int):
+    print(f"{count} launches, one token POST and one course GET each")
+    print(f"  {'scheme':<8}{'client':<10}{'threads':>8}{'connections':>13}{'p50 ms':>10}{'p99 ms':>10}")
+    for tls in (False, True):
+        scheme = "https" if tls else "http"
+        for name, client in (("per call", requests), ("pooled", HttpClient())):
+            for workers in (1, threads):
+                connections, s = run(client, count, workers, tls)
+                print(
+                    f"  {scheme:<8}{name:<10}{workers:>8}{connections:>13}"
+                    f"{s['p50'] / 1000:>10.2f}{s['p99'] / 1000:>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+    )
@@ -0,0 +1,100 @@
+"""
+Import time of the application entry point, measured with ``python -X importtime`` in fresh interpreters.
+
+Reports the median cumulative import time of ``app.wsgi``, the slowest modules it pulls in and checks the result
+against the budget checked in as ``benchmarks/import_budget.json``: the cumulative time must stay under
+``max_cumulative_ms`` and none of the ``deferred`` modules may be imported eagerly, they are imported on first use.
+
+    python -m benchmarks.import_time [runs] [top]
+
+Exits with status 1 when the budget is exceeded.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+BUDGET_PATH = Path(__file__).parent.joinpath("import_budget.json")
+
+
+def load_budget() -> dict:
+    return json.loads(BUDGET_PATH.read_text())
+
+
+def import_times(module: str) -> dict:
+    """
+    Import a module in a fresh interpreter and return the cumulative import time in µs of every module it imported.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=dict(os.environ),
+    )
+    times = {}
+    for line in output.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str, runs: int) -> tuple:
+    """
+    :return: the median cumulative import time of the module in ms and the modules imported by the last run
+    """
+    samples = []
+    times = {}
+    for _ in range(runs):
+        times = import_times(module)
+        samples.append(times[module] / 1000)
+    return statistics.median(samples), times
+
+
+def violations(budget: dict, cumulative_ms: float, times: dict) -> list:
+    problems = []
+    if cumulative_ms > budget["max_cumulative_ms"]:
+        problems.append(f"{budget['module']} takes {cumulative_ms:.1f} ms, budget {budget['max_cumulative_ms']} ms")
+    return problems + deferred_violations(budget, times)
+
+
+def deferred_violations(budget: dict, times: dict) -> list:
+    """
+    :param times: the modules imported, as returned by ``import_times``
+    """
+    return [
+        f"{name} is imported by {budget['module']}, it should be imported on first use"
+        for name in budget["deferred"]
+        if name in times
+    ]
+
+
+def main(runs: int, top: int) -> int:
+    budget = load_budget()
+    cumulative_ms, times = measure(budget["module"], runs)
+    print(f"{budget['module']}: median {cumulative_ms:.1f} ms over {runs} runs (budget {budget['max_cumulative_ms']} ms)")
+    print("slowest modules (cumulative)")
+    for name, cumulative in sorted(times.items(), key=lambda item: item[1], reverse=True)[1 : top + 1]:
+        print(f"  {name:<48}{cumulative / 1000:8.1f} ms")
+
+    problems = violations(budget, cumulative_ms, times)
+    for problem in problems:
+        print(f"over budget: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 15,
+        )
+    )
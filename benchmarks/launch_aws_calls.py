@@ -0,0 +1,107 @@
+"""
+AWS calls per request for /login, /launch and /authcode, with and without the request-scoped LTIRepository.
+
+"per object" replays the same requests with the repository's batching and memoization switched off, i.e. every
+``state``/``platform``/``tool`` lookup goes to DynamoDB and SSM on its own, the way the models are used without it.
+
+    python -m benchmarks.launch_aws_calls
+"""
+from contextlib import ExitStack
+from unittest.mock import patch
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+from jwt import PyJWKClient
+
+from app import create_app
+from app.models.platform_config import LTIPlatform
+from app.models.platform_config import LTIPlatformStorage
+from app.models.repository import LTIRepository
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from app.models.tool_config import LTITool
+from app.models.tool_config import LTIToolStorage
+from app.utility.token_client import TokenClient
+from benchmarks.environment import CLIENT_ID
+from benchmarks.environment import DEPLOYMENT_ID
+from benchmarks.environment import ISS
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import count_aws_calls
+from benchmarks.environment import learn_routes
+from benchmarks.environment import local_aws
+from benchmarks.environment import tool_platform
+
+
+def per_object_repository():
+    return [
+        patch.object(LTIRepository, "prefetch", lambda self, *args, **kwargs: self),
+        patch.object(LTIRepository, "state", lambda self, id: LTIState(LTIStateStorage()).load(id)),
+        patch.object(LTIRepository, "platform", lambda self, *key: LTIPlatform(LTIPlatformStorage()).load(*key)),
+        patch.object(LTIRepository, "tool", lambda self: LTITool(LTIToolStorage())),
+    ]
+
+
+def launch_flow(client, keys: PlatformKeys, learn_url: str) -> dict:
+    calls = {}
+    with count_aws_calls() as counter:
+        response = client.get(
+            "/login",
+            query_string=dict(
+                iss=ISS,
+                client_id=CLIENT_ID,
+                lti_deployment_id=DEPLOYMENT_ID,
+                login_hint="hint",
+                target_link_uri="http://localhost/launch",
+            ),
+        )
+        assert response.status_code == 302, response.status_code
+        calls["/login"] = dict(counter)
+    query = parse_qs(urlsplit(response.headers["Location"]).query)
+    state, nonce = query["state"][0], query["nonce"][0]
+
+    with count_aws_calls() as counter:
+        response = client.post(
+            "/launch",
+            data=dict(id_token=keys.id_token(nonce, **tool_platform(learn_url)), state=state),
+            headers={"Cookie": f"state={state}"},
+        )
+        assert response.status_code == 302, response.status_code
+        calls["/launch"] = dict(counter)
+
+    with count_aws_calls() as counter:
+        response = client.get(
+            "/authcode", query_string=dict(code="code", state=state), headers={"Cookie": f"state={state}"}
+        )
+        assert response.status_code == 200, response.status_code
+        calls["/authcode"] = dict(counter)
+    return calls
+
+
+def main():
+    keys = PlatformKeys()
+    results = {}
+    for mode in ("per object", "repository"):
+        with local_aws(), HttpStub(learn_routes()) as learn, ExitStack() as stack:
+            stack.enter_context(patch.object(PyJWKClient, "fetch_data", return_value=keys.jwks))
+            stack.enter_context(patch.object(TokenClient, "get_learn_access_token", return_value="learn-token"))
+            if mode == "per object":
+                for p in per_object_repository():
+                    stack.enter_context(p)
+            results[mode] = launch_flow(create_app().test_client(), keys, learn.url)
+
+    print(f"  {'operation':<28}{'per object':>12}{'repository':>12}")
+    for route in ("/login", "/launch", "/authcode"):
+        print(route)
+        operations = sorted(set(results["per object"][route]) | set(results["repository"][route]))
+        for operation in operations:
+            before = results["per object"][route].get(operation, 0)
+            after = results["repository"][route].get(operation, 0)
+            print(f"  {operation:<28}{before:>12}{after:>12}")
+        total_before = sum(results["per object"][route].values())
+        total_after = sum(results["repository"][route].values())
+        print(f"  {'total':<28}{total_before:>12}{total_after:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Latency of /launch and /authcode with the independent steps run one after another and fanned out.
+
+Every AWS call waits 10 ms, the platform JWKS 80 ms and the Learn stub (code exchange and course) 80 ms, about
+what they take from Lambda. The course is revalidated with Learn on every launch (COURSE_INFO_TTL=0).
+"sequential" sets FANOUT_MAX_WORKERS=0, "fanned out" uses the default pool. Reports the median time of each route
+and the median of each of its phases.
+
+    python -m benchmarks.launch_fanout [launches]
+"""
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from unittest.mock import patch
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+from flask import g
+from jwt import PyJWKClient
+
+from app import create_app
+from app.utility.aws import Singleton
+from benchmarks.environment import CLIENT_ID
+from benchmarks.environment import DEPLOYMENT_ID
+from benchmarks.environment import ISS
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import aws_latency
+from benchmarks.environment import learn_routes
+from benchmarks.environment import local_aws
+from benchmarks.environment import tool_platform
+
+AWS_LATENCY = 0.01
+JWKS_LATENCY = 0.08
+LEARN_LATENCY = 0.08
+MODES = {"sequential": "0", "fanned out": "8"}
+
+
+def launch(client, keys: PlatformKeys, learn_url: str, timings: dict):
+    login = dict(iss=ISS, client_id=CLIENT_ID, lti_deployment_id=DEPLOYMENT_ID, login_hint="hint")
+    response = client.get("/login", query_string=dict(login, target_link_uri="http://localhost/launch"))
+    query = parse_qs(urlsplit(response.headers["Location"]).query)
+    state, nonce = query["state"][0], query["nonce"][0]
+    client.set_cookie("localhost", "state", state)
+
+    id_token = keys.id_token(nonce, **tool_platform(learn_url))
+    for route, send in (
+        ("/launch", lambda: client.post("/launch", data=dict(id_token=id_token, state=state))),
+        ("/authcode", lambda: client.get("/authcode", query_string=dict(code="code", state=state))),
+    ):
+        start = time.perf_counter()
+        response = send()
+        timings[route]["total"].append((time.perf_counter() - start) * 1000)
+        assert response.status_code in (200, 302), response.status_code
+        for phase, ms in g.phase_timings.phases.items():
+            timings[route][phase].append(ms)
+
+
+def main(launches: int):
+    keys = PlatformKeys()
+    os.environ["COURSE_INFO_TTL"] = "0"
+
+    def fetch_jwks(self):
+        time.sleep(JWKS_LATENCY)
+        return keys.jwks
+
+    print(
+        f"{launches} launches, AWS {AWS_LATENCY * 1000:.0f} ms, JWKS {JWKS_LATENCY * 1000:.0f} ms, "
+        f"Learn {LEARN_LATENCY * 1000:.0f} ms"
+    )
+    for mode, workers in MODES.items():
+        os.environ["FANOUT_MAX_WORKERS"] = workers
+        Singleton._instances.clear()
+        timings = defaultdict(lambda: defaultdict(list))
+        with local_aws(), HttpStub(learn_routes(), delay=LEARN_LATENCY) as learn, aws_latency(AWS_LATENCY):
+            with patch.object(PyJWKClient, "fetch_data", fetch_jwks):
+                # the client keeps the context of its last request, g holds the phase timings
+                with create_app().test_client() as client:
+                    for _ in range(launches):
+                        launch(client, keys, learn.url, timings)
+        print(mode)
+        for route, phases in timings.items():
+            medians = {phase: statistics.median(ms) for phase, ms in phases.items()}
+            breakdown = " ".join(f"{phase}={ms:.0f}" for phase, ms in medians.items() if phase != "total")
+            print(f"  {route:<10}{medians['total']:>7.0f} ms   {breakdown}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,171 @@
+"""
+Latency, AWS calls and allocations of each step of a launch: /login, /launch, /submit_assignment and /jwks.json.
+
+The Flask test client drives the flow with the id_token of ``payloads/token_payload.json``, signed by a local platform
+key. DynamoDB, KMS and SSM are answered in memory (``benchmarks.memory_aws``), the platform JWKS and Learn by a
+local HTTP stub, so the time measured is the application's. Allocations are the peak of ``tracemalloc`` during each
+step, measured in separate launches because tracing slows everything down.
+
+The results are checked against the baseline checked in as ``benchmarks/launch_baseline.json``: a step must not
+make more AWS calls than its baseline, nor take or allocate more than the ``tolerance`` of each measurement over it.
+
+    python -m benchmarks.launch_flow [launches] [--update]
+
+``--update`` writes the results as the new baseline. Exits with status 1 when the baseline is exceeded.
+"""
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+from typing import Generator
+from typing import Tuple
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+from werkzeug.test import TestResponse
+
+from app import create_app
+from app.utility.aws import Singleton
+from benchmarks import percentile
+from benchmarks.environment import CLIENT_ID
+from benchmarks.environment import DEPLOYMENT_ID
+from benchmarks.environment import ISS
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import learn_routes
+from benchmarks.environment import tool_platform
+from benchmarks.memory_aws import memory_aws
+
+BASELINE_PATH = Path(__file__).parent.joinpath("launch_baseline.json")
+STEPS = ("/login", "/launch", "/submit_assignment", "/jwks.json")
+TARGET_LINK_URI = "http://localhost/launch"
+AGS_CLAIM = "https://purl.imsglobal.org/spec/lti-ags/claim/endpoint"
+# fraction over the baseline a measurement may go, the tail latency is the noisiest
+DEFAULT_TOLERANCE = {"p50_ms": 0.5, "p99_ms": 1.0, "alloc_kib": 0.25}
+# launches traced with tracemalloc
+ALLOCATION_LAUNCHES = 10
+
+
+def load_baseline() -> dict:
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def launch(client, keys: PlatformKeys, platform_url: str) -> Generator[Tuple[str, Callable], TestResponse, None]:
+    """
+    The requests of one launch, in order. Each one is yielded as the step and a function sending it, the response
+    is sent back to the generator, so that preparing a request (e.g. signing the id_token) is not timed.
+    """
+    login = dict(iss=ISS, client_id=CLIENT_ID, lti_deployment_id=DEPLOYMENT_ID, login_hint="hint")
+    response = yield "/login", lambda: client.get("/login", query_string=dict(login, target_link_uri=TARGET_LINK_URI))
+    query = parse_qs(urlsplit(response.headers["Location"]).query)
+    state, nonce = query["state"][0], query["nonce"][0]
+    client.set_cookie("localhost", "state", state)
+
+    endpoint = {"lineitem": f"{platform_url}/lineitems/1", "lineitems": f"{platform_url}/lineitems", "scope": []}
+    id_token = keys.id_token(nonce, **tool_platform(platform_url), **{AGS_CLAIM: endpoint})
+    yield "/launch", lambda: client.post("/launch", data=dict(id_token=id_token, state=state))
+    submission = dict(state=state, submission=uuid.uuid4().hex, ackOauth="on", ackGradeReturn="on")
+    yield "/submit_assignment", lambda: client.post("/submit_assignment", data=submission)
+    yield "/jwks.json", lambda: client.get("/jwks.json")
+
+
+def measure(launches: int, allocation_launches: int = ALLOCATION_LAUNCHES) -> dict:
+    """
+    :return: by step, the p50 and p99 latency in ms, the AWS calls per launch by operation and the allocation peak
+        in KiB
+    """
+    keys = PlatformKeys()
+    routes = dict(learn_routes(), **{"/jwks.json": lambda request: (200, {}, keys.jwks)})
+    times = {step: [] for step in STEPS}
+    calls = {step: Counter() for step in STEPS}
+    allocations = {step: [] for step in STEPS}
+    Singleton._instances.clear()
+    with HttpStub(routes) as platform, memory_aws(key_set_url=f"{platform.url}/jwks.json") as aws:
+        client = create_app().test_client()
+        # the first launch creates the clients and fills the caches of the process
+        for i in range(-1, launches + allocation_launches):
+            traced = i >= launches
+            if traced:
+                tracemalloc.start()
+            flow = launch(client, keys, platform.url)
+            response = None
+            while True:
+                try:
+                    step, send = flow.send(response)
+                except StopIteration:
+                    break
+                before = Counter(aws.calls)
+                if traced:
+                    tracemalloc.reset_peak()
+                    start_bytes = tracemalloc.get_traced_memory()[0]
+                start = time.perf_counter()
+                response = send()
+                elapsed = (time.perf_counter() - start) * 1000
+                assert response.status_code in (200, 302), f"{step} returned {response.status_code}"
+                if traced:
+                    allocations[step].append((tracemalloc.get_traced_memory()[1] - start_bytes) / 1024)
+                    continue
+                if i < 0:
+                    continue
+                times[step].append(elapsed)
+                calls[step].update(Counter(aws.calls) - before)
+            if traced:
+                tracemalloc.stop()
+    return {
+        step: dict(
+            p50_ms=round(statistics.median(times[step]), 3),
+            p99_ms=round(percentile(times[step], 99), 3),
+            aws_calls={operation: count / launches for operation, count in sorted(calls[step].items())},
+            alloc_kib=round(statistics.median(allocations[step]), 1) if allocations[step] else 0,
+        )
+        for step in STEPS
+    }
+
+
+def violations(baseline: dict, results: dict, timings: bool = True) -> list:
+    """
+    :param timings: whether to check the latency and allocations, which depend on the machine, or the AWS calls only
+    """
+    problems = []
+    for step, expected in baseline["steps"].items():
+        actual = results[step]
+        for operation, count in actual["aws_calls"].items():
+            if count > expected["aws_calls"].get(operation, 0):
+                problems.append(
+                    f"{step} makes {count:g} {operation} calls, baseline {expected['aws_calls'].get(operation, 0):g}"
+                )
+        if not timings:
+            continue
+        for metric, tolerance in baseline["tolerance"].items():
+            if actual[metric] > expected[metric] * (1 + tolerance):
+                problems.append(f"{step} {metric} is {actual[metric]:g}, baseline {expected[metric]:g}")
+    return problems
+
+
+def main(launches: int, update: bool) -> int:
+    results = measure(launches)
+    print(f"{launches} launches")
+    print(f"  {'step':<20}{'p50 ms':>9}{'p99 ms':>9}{'alloc KiB':>11}  AWS calls")
+    for step, result in results.items():
+        calls = " ".join(f"{operation}={count:g}" for operation, count in result["aws_calls"].items())
+        print(f"  {step:<20}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['alloc_kib']:>11.1f}  {calls}")
+
+    if update:
+        tolerance = load_baseline()["tolerance"] if BASELINE_PATH.exists() else DEFAULT_TOLERANCE
+        BASELINE_PATH.write_text(json.dumps(dict(tolerance=tolerance, steps=results), indent=2) + "\n")
+        print(f"baseline written to {BASELINE_PATH}")
+        return 0
+    problems = violations(load_baseline(), results)
+    for problem in problems:
+        print(f"regression: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if argument != "--update"]
+    sys.exit(main(int(arguments[0]) if arguments else 200, "--update" in sys.argv))
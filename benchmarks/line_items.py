@@ -0,0 +1,67 @@
+"""
+Line item lookups and creation through AgsClient against a local lineitems stub answering after 50 ms.
+
+"lookup" finds a line item by resourceId 100 times in a context of 250 line items: listing the context every time,
+the way a lookup without a cache would, against ``AgsClient.line_items`` served from LineItemCache. "create" creates
+the line items of a 20 item deep linking response one at a time against ``AgsClient.create_line_items``.
+
+    python -m benchmarks.line_items [items] [latency ms]
+"""
+import sys
+import time
+from unittest.mock import patch
+
+from app.utility.ags_client import AgsClient
+from app.utility.ags_client import LineItemCache
+from app.utility.token_client import TokenClient
+from benchmarks.environment import HttpStub
+from benchmarks.environment import line_item_routes
+
+LOOKUPS = 100
+CONTEXT = 250
+
+
+def lookup(url: str):
+    client = AgsClient(platform=None, tool=None)
+    cases = {
+        "uncached": lambda: [i for i in client.list_line_items(url) if i.get("resourceId") == "resource-7"],
+        "cached": lambda: client.line_items(url, resource_id="resource-7"),
+    }
+    print(f"lookup, {LOOKUPS} lookups in a context of {CONTEXT} line items")
+    print(f"  {'case':<12}{'seconds':>9}{'ms/lookup':>11}")
+    for case, find in cases.items():
+        start = time.perf_counter()
+        for _ in range(LOOKUPS):
+            assert len(find()) == 1
+        elapsed = time.perf_counter() - start
+        print(f"  {case:<12}{elapsed:>9.2f}{elapsed / LOOKUPS * 1000:>11.2f}")
+
+
+def create(url: str, items: int):
+    client = AgsClient(platform=None, tool=None)
+    line_items = [dict(label=f"Item {i}", scoreMaximum=10, resourceId=f"item-{i}") for i in range(items)]
+    cases = {
+        "serial": lambda: [client.create_line_item(url, line_item) for line_item in line_items],
+        "concurrent": lambda: client.create_line_items(url, line_items),
+    }
+    print(f"create, {items} line items")
+    print(f"  {'case':<12}{'seconds':>9}")
+    for case, run in cases.items():
+        start = time.perf_counter()
+        assert len(run()) == items
+        print(f"  {case:<12}{time.perf_counter() - start:>9.2f}")
+
+
+def main(items: int, latency: float):
+    with patch.object(TokenClient, "request_bearer_token", return_value="token"):
+        with HttpStub(line_item_routes(CONTEXT), delay=latency) as stub:
+            lookup(f"{stub.url}/lineitems")
+            LineItemCache().invalidate(f"{stub.url}/lineitems")
+            create(f"{stub.url}/lineitems", items)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05,
+    )
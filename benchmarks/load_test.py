@@ -0,0 +1,386 @@
+"""
+Load test of the gunicorn deployment: ``gunicorn_config.py`` serving the application to virtual users that each
+replay /login, /launch and /submit_assignment, with launches signed by a local platform key, as fast as they can.
+
+Three processes take part:
+
+- the stand-ins (``--stand-ins``): one ``MemoryAws`` shared by every gunicorn worker over HTTP, the platform JWKS and
+  token endpoint, Learn and the line item the scores are published to;
+- gunicorn, started with ``gunicorn_config.py``, whose workers forward their botocore calls to the stand-ins, see
+  ``worker_app``. The outbox workers publish the submitted scores as they would in production;
+- this driver, signing the id_tokens (not timed) and timing each request.
+
+    python -m benchmarks.load_test [users] [seconds]
+
+Reports the launches completed per second and, by step, the latency percentiles and the errors. GUNICORN_CMD_ARGS
+overrides ``gunicorn_config.py``, e.g. ``GUNICORN_CMD_ARGS="--workers 8 --threads 2"``.
+"""
+import http.client
+import json
+import os
+import pickle
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import List
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+import boto3
+import requests
+from botocore.exceptions import ClientError
+
+from benchmarks import percentile
+from benchmarks.aws_budget import key_prefix
+from benchmarks.environment import CLIENT_ID
+from benchmarks.environment import DEPLOYMENT_ID
+from benchmarks.environment import ISS
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import ags_routes
+from benchmarks.environment import learn_routes
+from benchmarks.environment import tool_platform
+from benchmarks.memory_aws import MemoryAws
+from benchmarks.memory_aws import memory_aws
+
+ROOT = Path(__file__).parent.parent
+STEPS = ("/login", "/launch", "/submit_assignment")
+AGS_CLAIM = "https://purl.imsglobal.org/spec/lti-ags/claim/endpoint"
+# launches every user makes before the measurement, they create the clients and fill the caches of the workers
+WARM_UP_LAUNCHES = 2
+REQUEST_TIMEOUT = 30
+READY_PATH = "/load-test-ready"
+
+
+def stand_in_routes(memory: MemoryAws, jwks: dict) -> dict:
+    """
+    The AWS calls of the workers (a pickled service, operation and parameters POSTed to /aws, answered with a
+    pickled ("ok", response) or ("error", error response)), the platform JWKS and token endpoint, Learn and the line
+    item. /calls counts the AWS calls by operation and key prefix, e.g. "dynamodb:GetItem CONFIG#", and the platform
+    JWKS fetches.
+    """
+    clients = {service: boto3.client(service) for service in ("dynamodb", "kms", "ssm")}
+    calls = Counter()
+    lock = threading.Lock()
+
+    def count(call: str):
+        with lock:
+            calls[call] += 1
+
+    def aws(request):
+        service, operation, params = pickle.loads(request.body)
+        count(f"{service}:{operation} {key_prefix(params) or ''}".rstrip())
+        try:
+            outcome = ("ok", memory.call(clients[service], operation, params))
+        except ClientError as error:
+            outcome = ("error", error.response)
+        return 200, {}, pickle.dumps(outcome)
+
+    def platform_jwks(request):
+        count("GET /jwks.json")
+        return 200, {}, jwks
+
+    def token(request):
+        return 200, {}, {"access_token": "platform-token", "token_type": "bearer", "expires_in": 3600}
+
+    def counted(request):
+        with lock:
+            return 200, {}, dict(calls)
+
+    return dict(
+        learn_routes(),
+        **ags_routes(),
+        **{"/aws": aws, "/jwks.json": platform_jwks, "/oauth2/jwttoken": token, "/calls": counted},
+    )
+
+
+def aws_forwarder(url: str) -> Callable:
+    """
+    :param url: the stand-ins
+    :return: a replacement for botocore's ``BaseClient._make_api_call`` sending every call to the stand-ins, over a
+        pool of keep-alive connections per process, a connection per request being served at the same time whether
+        they are threads or greenlets
+    """
+    address = urlsplit(url)
+    pool = dict(pid=None, idle=[])
+    lock = threading.Lock()
+
+    def make_api_call(client, operation_name: str, api_params: dict) -> dict:
+        with lock:
+            # a worker forked from a master that made calls has a copy of the master's connections
+            if pool["pid"] != os.getpid():
+                pool.update(pid=os.getpid(), idle=[])
+            connection = pool["idle"].pop() if pool["idle"] else None
+        if connection is None:
+            connection = http.client.HTTPConnection(address.hostname, address.port, timeout=REQUEST_TIMEOUT)
+        service = client.meta.service_model.service_name
+        try:
+            connection.request("POST", "/aws", body=pickle.dumps((service, operation_name, api_params)))
+            outcome, result = pickle.loads(connection.getresponse().read())
+        except Exception:
+            connection.close()
+            raise
+        with lock:
+            pool["idle"].append(connection)
+        if outcome == "error":
+            raise client.exceptions.from_code(result["Error"]["Code"])(result, operation_name)
+        return result
+
+    return make_api_call
+
+
+def worker_app():
+    """
+    The application of a gunicorn worker, its AWS calls answered by the stand-ins at LOAD_TEST_AWS_URL.
+    """
+    from botocore.client import BaseClient
+
+    from app import create_app
+
+    BaseClient._make_api_call = aws_forwarder(os.environ["LOAD_TEST_AWS_URL"])
+    return create_app()
+
+
+def stand_ins():
+    """
+    Serve the stand-ins until terminated, the platform JWKS is read from LOAD_TEST_JWKS and every answer is delayed
+    by LOAD_TEST_DELAY seconds. The URL is written to stdout once they are seeded.
+    """
+    jwks = json.loads(os.environ["LOAD_TEST_JWKS"])
+    # the serving threads inherit the mask, SIGTERM is left to sigwait
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM, signal.SIGINT})
+    stub = HttpStub({}, delay=float(os.getenv("LOAD_TEST_DELAY", "0")))
+    with memory_aws(key_set_url=f"{stub.url}/jwks.json", auth_token_url=f"{stub.url}/oauth2/jwttoken") as memory:
+        stub.routes = stand_in_routes(memory, jwks)
+        with stub:
+            print(stub.url, flush=True)
+            signal.sigwait([signal.SIGTERM, signal.SIGINT])
+
+
+class Results:
+    """
+    The latency of every successful request by step, the errors by step and reason, and the launches completed.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {step: [] for step in STEPS}
+        self.errors: Dict[str, Counter] = {step: Counter() for step in STEPS}
+        self.launches = 0
+        self._lock = threading.Lock()
+
+    def request(self, step: str, ms: float, error: str = None):
+        with self._lock:
+            if error is None:
+                self.latencies[step].append(ms)
+            else:
+                self.errors[step][error] += 1
+
+    def launch(self):
+        with self._lock:
+            self.launches += 1
+
+
+def user(url: str, platform_url: str, keys: PlatformKeys, launches: Callable[[], bool], results: Results):
+    """
+    Replay launches over one keep-alive session while ``launches()`` is true. A launch stops at its first error.
+    """
+    session = requests.Session()
+
+    def send(step: str, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        try:
+            method = session.get if step == "/login" else session.post
+            response = method(f"{url}{step}", allow_redirects=False, timeout=REQUEST_TIMEOUT, **kwargs)
+        except requests.RequestException as e:
+            results.request(step, 0, type(e).__name__)
+            return None
+        ms = (time.perf_counter() - start) * 1000
+        error = None if response.status_code in (200, 302) else f"HTTP {response.status_code}"
+        results.request(step, ms, error)
+        return response if error is None else None
+
+    login = dict(iss=ISS, client_id=CLIENT_ID, lti_deployment_id=DEPLOYMENT_ID, login_hint="hint")
+    endpoint = {"lineitem": f"{platform_url}/lineitems/1", "lineitems": f"{platform_url}/lineitems", "scope": []}
+    while launches():
+        response = send("/login", params=dict(login, target_link_uri=f"{url}/launch"))
+        if response is None:
+            continue
+        query = parse_qs(urlsplit(response.headers["Location"]).query)
+        state, nonce = query["state"][0], query["nonce"][0]
+        # the state cookie is Secure, it is not sent back over http by the session
+        cookies = {"state": state}
+        id_token = keys.id_token(nonce, **tool_platform(platform_url), **{AGS_CLAIM: endpoint})
+        if send("/launch", data=dict(id_token=id_token, state=state), cookies=cookies) is None:
+            continue
+        submission = dict(state=state, submission=uuid.uuid4().hex, ackOauth="on", ackGradeReturn="on")
+        if send("/submit_assignment", data=submission, cookies=cookies) is not None:
+            results.launch()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30):
+    """
+    Wait until a worker answers, READY_PATH is not a route of the application, its 404 warms up nothing.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"gunicorn exited with status {process.returncode}")
+        try:
+            requests.get(f"{url}{READY_PATH}", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise Exception(f"gunicorn did not answer at {url} within {timeout} s")
+
+
+@contextmanager
+def stand_ins_process(keys: PlatformKeys, delay: float = 0):
+    """
+    Run the stand-ins in their own process, see ``stand_ins``.
+
+    :param delay: seconds every answer of the stand-ins is delayed by, the latency of AWS and the platform
+    :return: their URL
+    """
+    stand_in = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--stand-ins"],
+        cwd=ROOT,
+        env=dict(os.environ, LOAD_TEST_JWKS=json.dumps(keys.jwks), LOAD_TEST_DELAY=str(delay)),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        yield stand_in.stdout.readline().strip()
+    finally:
+        stand_in.send_signal(signal.SIGTERM)
+        stand_in.wait(timeout=REQUEST_TIMEOUT)
+
+
+@contextmanager
+def gunicorn_process(platform_url: str, **env):
+    """
+    Run gunicorn with ``gunicorn_config.py`` and ``env`` on a free local port, its workers answered by the stand-ins
+    at ``platform_url``, until a worker answers. The outbox and the shared cache are files of a fresh directory, the
+    configurations cached by a previous run name the stand-ins of that run.
+
+    :return: the URL of gunicorn and its process
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as directory:
+        environment = dict(
+            os.environ,
+            LOAD_TEST_AWS_URL=platform_url,
+            OUTBOX_SQLITE_PATH=f"{directory}/outbox.sqlite3",
+            SHARED_CACHE_PATH=f"{directory}/shared-cache",
+        )
+        environment.update(env)
+        gunicorn = subprocess.Popen(
+            [
+                sys.executable,
+                *("-m", "gunicorn", "-c", "gunicorn_config.py", "--bind", f"127.0.0.1:{port}"),
+                "benchmarks.load_test:worker_app()",
+            ],
+            cwd=ROOT,
+            env=environment,
+        )
+        try:
+            wait_until_up(url, gunicorn)
+            yield url, gunicorn
+        finally:
+            gunicorn.send_signal(signal.SIGTERM)
+            gunicorn.wait(timeout=REQUEST_TIMEOUT)
+
+
+def run(users: int, seconds: float) -> dict:
+    """
+    :return: the launches completed, their rate, and by step the requests, latency percentiles and errors
+    """
+    keys = PlatformKeys()
+    with stand_ins_process(keys) as platform_url, gunicorn_process(platform_url) as (url, _):
+        return measure(url, platform_url, keys, users, seconds)
+
+
+def measure(url: str, platform_url: str, keys: PlatformKeys, users: int, seconds: float) -> dict:
+    """
+    Warm up the workers of gunicorn at ``url``, then make ``users`` launch for ``seconds``.
+
+    :return: the launches completed, their rate, and by step the requests, latency percentiles and errors
+    """
+    warm_up = Counter()
+    lock = threading.Lock()
+
+    def warming() -> bool:
+        with lock:
+            warm_up[threading.get_ident()] += 1
+            return warm_up[threading.get_ident()] <= WARM_UP_LAUNCHES
+
+    run_users(users, lambda: user(url, platform_url, keys, warming, Results()))
+    results = Results()
+    deadline = time.monotonic() + seconds
+    start = time.perf_counter()
+    run_users(users, lambda: user(url, platform_url, keys, lambda: time.monotonic() < deadline, results))
+    elapsed = time.perf_counter() - start
+
+    return dict(
+        launches=results.launches,
+        launches_per_second=results.launches / elapsed,
+        steps={
+            step: dict(
+                requests=len(results.latencies[step]) + sum(results.errors[step].values()),
+                p50_ms=percentile(results.latencies[step], 50) if results.latencies[step] else 0,
+                p95_ms=percentile(results.latencies[step], 95) if results.latencies[step] else 0,
+                p99_ms=percentile(results.latencies[step], 99) if results.latencies[step] else 0,
+                errors=dict(results.errors[step]),
+            )
+            for step in STEPS
+        },
+    )
+
+
+def run_users(users: int, target: Callable):
+    threads = [threading.Thread(target=target, daemon=True) for _ in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def main(users: int, seconds: float):
+    result = run(users, seconds)
+    print(f"{users} users for {seconds:g} s, gunicorn_config.py {os.getenv('GUNICORN_CMD_ARGS', '')}".rstrip())
+    print(f"  {result['launches']} launches, {result['launches_per_second']:.1f} launches/s")
+    print(f"  {'step':<20}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'error %':>9}  errors")
+    for step, s in result["steps"].items():
+        failed = sum(s["errors"].values())
+        rate = failed / s["requests"] * 100 if s["requests"] else 0
+        errors = " ".join(f"{reason}={count}" for reason, count in s["errors"].items())
+        print(
+            f"  {step:<20}{s['requests']:>9}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{rate:>9.2f}"
+            f"  {errors}"
+        )
+
+
+if __name__ == "__main__":
+    if "--stand-ins" in sys.argv:
+        stand_ins()
+    else:
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+            float(sys.argv[2]) if len(sys.argv) > 2 else 30,
+        )
@@ -0,0 +1,142 @@
+"""
+Logging overhead of a launch (/login then /launch) by LOG_LEVEL, LOG_FORMAT and LOG_DEBUG_SAMPLE_RATE.
+
+Every setting runs in its own process, because LOG_LEVEL is read once, with a root handler that counts the records
+and bytes it would write and the time it spends on them ("logging ms", per launch). AWS is moto without added
+latency, the platform JWKS and Learn answer at once. "off" is LOG_LEVEL=CRITICAL: nothing is written. Also times
+``init_logger`` for a logger that is already set up and an ``LTIJwtPayload`` built from an id_token at INFO.
+
+    python -m benchmarks.logging_overhead [launches]
+"""
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+SETTINGS = {
+    "off": dict(LOG_LEVEL="CRITICAL", LOG_FORMAT="text", LOG_DEBUG_SAMPLE_RATE="1"),
+    "INFO text": dict(LOG_LEVEL="INFO", LOG_FORMAT="text", LOG_DEBUG_SAMPLE_RATE="1"),
+    "INFO json": dict(LOG_LEVEL="INFO", LOG_FORMAT="json", LOG_DEBUG_SAMPLE_RATE="1"),
+    "DEBUG json": dict(LOG_LEVEL="DEBUG", LOG_FORMAT="json", LOG_DEBUG_SAMPLE_RATE="1"),
+    "DEBUG json 1%": dict(LOG_LEVEL="DEBUG", LOG_FORMAT="json", LOG_DEBUG_SAMPLE_RATE="0.01"),
+}
+CALLS = 100000
+
+
+class CountingHandler(logging.StreamHandler):
+    """
+    Counts the records and bytes written, and the time spent filtering, formatting and writing them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        start = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def emit(self, record: logging.LogRecord):
+        self.records += 1
+        self.bytes += len(self.format(record)) + 1
+
+
+def child(launches: int) -> dict:
+    handler = CountingHandler()
+    logging.getLogger().addHandler(handler)
+
+    from jwt import PyJWKClient
+
+    from app import create_app
+    from app.models.jwt import LTIJwtPayload
+    from app.utility import init_logger
+    from benchmarks.environment import CLIENT_ID
+    from benchmarks.environment import DEPLOYMENT_ID
+    from benchmarks.environment import ISS
+    from benchmarks.environment import HttpStub
+    from benchmarks.environment import PlatformKeys
+    from benchmarks.environment import learn_routes
+    from benchmarks.environment import local_aws
+    from benchmarks.environment import tool_platform
+
+    keys = PlatformKeys()
+    times = []
+    with local_aws(), HttpStub(learn_routes()) as learn:
+        with patch.object(PyJWKClient, "fetch_data", lambda self: keys.jwks):
+            client = create_app().test_client()
+            login = dict(iss=ISS, client_id=CLIENT_ID, lti_deployment_id=DEPLOYMENT_ID, login_hint="hint")
+            for i in range(launches + 1):
+                start = time.perf_counter()
+                response = client.get("/login", query_string=dict(login, target_link_uri="http://localhost/launch"))
+                query = parse_qs(urlsplit(response.headers["Location"]).query)
+                state, nonce = query["state"][0], query["nonce"][0]
+                client.set_cookie("localhost", "state", state)
+                id_token = keys.id_token(nonce, **tool_platform(learn.url))
+                response = client.post("/launch", data=dict(id_token=id_token, state=state))
+                assert response.status_code in (200, 302), response.status_code
+                if i == 0:
+                    # the first launch warms up the clients and caches
+                    handler.records = handler.bytes = handler.seconds = 0
+                else:
+                    times.append((time.perf_counter() - start) * 1000)
+
+    records, written, logging_ms = handler.records, handler.bytes, handler.seconds * 1000
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        init_logger("LTIJwtPayload")
+    init_us = (time.perf_counter() - start) / CALLS * 1e6
+
+    logging.getLogger("LTIJwtPayload").setLevel("INFO")
+    start = time.perf_counter()
+    for _ in range(CALLS // 10):
+        LTIJwtPayload(id_token)
+    payload_us = (time.perf_counter() - start) / (CALLS // 10) * 1e6
+    return dict(
+        p50=statistics.median(times),
+        mean=statistics.mean(times),
+        records=records / launches,
+        bytes=written / launches,
+        logging_ms=logging_ms / launches,
+        init_us=init_us,
+        payload_us=payload_us,
+    )
+
+
+def main(launches: int):
+    print(f"{launches} launches, /login then /launch")
+    print(f"  {'setting':<15}{'p50 ms':>8}{'mean ms':>9}{'records':>9}{'bytes':>8}{'logging ms':>12}")
+    results = {}
+    for name, env in SETTINGS.items():
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.logging_overhead", "--child", str(launches)],
+            env=dict(os.environ, **env),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        results[name] = result = json.loads(output.splitlines()[-1])
+        print(
+            f"  {name:<15}{result['p50']:>8.2f}{result['mean']:>9.2f}{result['records']:>9.1f}"
+            f"{result['bytes']:>8.0f}{result['logging_ms']:>12.4f}"
+        )
+    info = results["INFO json"]
+    print(f"init_logger, logger already set up: {info['init_us']:.3f} us per call")
+    print(f"LTIJwtPayload(id_token) at INFO: {info['payload_us']:.1f} us")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        print(json.dumps(child(int(sys.argv[-1]))))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,268 @@
+"""
+In-memory stand-in for the DynamoDB, KMS and SSM operations the application uses, answering from dictionaries in
+the calling thread. It replaces botocore's ``_make_api_call``, so the application's clients are the real ones but no
+request is serialized, sent or parsed: an operation costs microseconds instead of the milliseconds of moto, and
+the time measured is the application's own.
+
+Operations and expressions the application does not use raise NotImplementedError, so a new one shows up in the
+benchmarks instead of being answered wrongly.
+"""
+import re
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextlib import nullcontext
+from decimal import Decimal
+from unittest.mock import patch
+
+from botocore.client import BaseClient
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from benchmarks.environment import PLATFORM_AUTH_TOKEN_URL
+from benchmarks.environment import PLATFORM_KEY_SET_URL
+from benchmarks.environment import seed_aws
+
+_comparison = re.compile(r"^(\S+)\s*(=|<>|<=|>=|<|>)\s*(:\w+)$")
+_function = re.compile(r"^(attribute_exists|attribute_not_exists|begins_with)\((\S+?)(?:,\s*(:\w+))?\)$")
+_clauses = re.compile(r"\b(SET|ADD|REMOVE)\b")
+
+
+def _value(attribute: dict):
+    (type_, value), = attribute.items()
+    return Decimal(value) if type_ == "N" else value
+
+
+class Condition:
+    """
+    A condition or filter expression: clauses joined by AND, each a comparison of an attribute with a value,
+    ``attribute_exists``, ``attribute_not_exists`` or ``begins_with``.
+    """
+
+    def __init__(self, expression: str, names: dict, values: dict):
+        self.clauses = []
+        for clause in expression.split(" AND "):
+            clause = clause.strip()
+            function, comparison = _function.match(clause), _comparison.match(clause)
+            if function is not None:
+                name, path, value = function.groups()
+            elif comparison is not None:
+                path, name, value = comparison.groups()
+            else:
+                raise NotImplementedError(f"Unsupported expression {clause!r}")
+            self.clauses.append((name, names.get(path, path), values.get(value)))
+
+    def matches(self, item: dict) -> bool:
+        return all(self.__matches(item, *clause) for clause in self.clauses)
+
+    @staticmethod
+    def __matches(item: dict, name: str, path: str, value) -> bool:
+        if name == "attribute_exists":
+            return path in item
+        if name == "attribute_not_exists":
+            return path not in item
+        if path not in item:
+            return False
+        actual, expected = _value(item[path]), _value(value)
+        if name == "begins_with":
+            return actual.startswith(expected)
+        return {
+            "=": actual == expected,
+            "<>": actual != expected,
+            "<": actual < expected,
+            "<=": actual <= expected,
+            ">": actual > expected,
+            ">=": actual >= expected,
+        }[name]
+
+
+class MemoryAws:
+    """
+    The tables, parameters and keys of the stand-in, and the operations made, keyed by "service:Operation" like
+    ``benchmarks.environment.count_aws_calls``.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.parameters = {}
+        self.keys = set()
+        self.calls = Counter()
+        self._lock = threading.RLock()
+        self._signing_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def call(self, client, operation: str, params: dict) -> dict:
+        service = client.meta.service_model.service_name
+        handler = getattr(self, f"_{service}_{operation}", None)
+        if handler is None:
+            raise NotImplementedError(f"{service}:{operation} is not implemented in memory")
+        with self._lock:
+            self.calls[f"{service}:{operation}"] += 1
+        # conditional writes are atomic, signatures are made concurrently
+        with self._lock if service == "dynamodb" else nullcontext():
+            return handler(client, **params)
+
+    @staticmethod
+    def _error(client, operation: str, code: str, message: str = ""):
+        response = {"Error": {"Code": code, "Message": message}}
+        return client.exceptions.from_code(code)(response, operation)
+
+    @staticmethod
+    def _condition(params: dict, key: str = "ConditionExpression"):
+        if key not in params:
+            return None
+        names, values = params.get("ExpressionAttributeNames", {}), params.get("ExpressionAttributeValues", {})
+        return Condition(params[key], names, values)
+
+    def _table(self, client, operation: str, name: str) -> dict:
+        if name not in self.tables:
+            raise self._error(client, operation, "ResourceNotFoundException", f"Table {name} not found")
+        return self.tables[name]
+
+    def _dynamodb_CreateTable(self, client, TableName, **params):
+        self.tables.setdefault(TableName, {})
+        return {"TableDescription": {"TableName": TableName, "TableStatus": "ACTIVE"}}
+
+    def _dynamodb_DescribeTable(self, client, TableName, **params):
+        self._table(client, "DescribeTable", TableName)
+        return {"Table": {"TableName": TableName, "TableStatus": "ACTIVE"}}
+
+    def _dynamodb_GetItem(self, client, TableName, Key, **params):
+        item = self._table(client, "GetItem", TableName).get(Key["PK"]["S"])
+        return {"Item": dict(item)} if item is not None else {}
+
+    def _dynamodb_PutItem(self, client, TableName, Item, **params):
+        table = self._table(client, "PutItem", TableName)
+        condition = self._condition(params)
+        if condition is not None and not condition.matches(table.get(Item["PK"]["S"], {})):
+            raise self._error(client, "PutItem", "ConditionalCheckFailedException")
+        table[Item["PK"]["S"]] = dict(Item)
+        return {}
+
+    def _dynamodb_DeleteItem(self, client, TableName, Key, **params):
+        self._table(client, "DeleteItem", TableName).pop(Key["PK"]["S"], None)
+        return {}
+
+    def _dynamodb_UpdateItem(self, client, TableName, Key, UpdateExpression, **params):
+        table = self._table(client, "UpdateItem", TableName)
+        existing = table.get(Key["PK"]["S"])
+        condition = self._condition(params)
+        if condition is not None and not condition.matches(existing or {}):
+            raise self._error(client, "UpdateItem", "ConditionalCheckFailedException")
+        item = dict(existing or Key)
+        names, values = params.get("ExpressionAttributeNames", {}), params.get("ExpressionAttributeValues", {})
+        parts = _clauses.split(UpdateExpression)[1:]
+        for action, actions in zip(parts[0::2], parts[1::2]):
+            for update in actions.split(","):
+                path, _, value = update.strip().replace("=", " ").partition(" ")
+                path, value = names.get(path, path), values.get(value.strip())
+                if action == "SET":
+                    item[path] = value
+                elif action == "ADD":
+                    total = _value(item[path]) + _value(value) if path in item else _value(value)
+                    item[path] = {"N": str(total)}
+                else:
+                    item.pop(path, None)
+        table[Key["PK"]["S"]] = item
+        return {}
+
+    def _dynamodb_BatchGetItem(self, client, RequestItems, **params):
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self._table(client, "BatchGetItem", name)
+            keys = [key["PK"]["S"] for key in request["Keys"]]
+            responses[name] = [dict(table[key]) for key in keys if key in table]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def _dynamodb_BatchWriteItem(self, client, RequestItems, **params):
+        for name, requests in RequestItems.items():
+            table = self._table(client, "BatchWriteItem", name)
+            for request in requests:
+                if "PutRequest" in request:
+                    table[request["PutRequest"]["Item"]["PK"]["S"]] = dict(request["PutRequest"]["Item"])
+                else:
+                    table.pop(request["DeleteRequest"]["Key"]["PK"]["S"], None)
+        return {"UnprocessedItems": {}}
+
+    def _dynamodb_Scan(self, client, TableName, **params):
+        condition = self._condition(params, "FilterExpression")
+        items = [
+            dict(item)
+            for item in self._table(client, "Scan", TableName).values()
+            if condition is None or condition.matches(item)
+        ]
+        if "ProjectionExpression" in params:
+            projection = [name.strip() for name in params["ProjectionExpression"].split(",")]
+            items = [{name: item[name] for name in projection if name in item} for item in items]
+        return {"Items": items, "Count": len(items)}
+
+    def _dynamodb_Query(self, client, TableName, KeyConditionExpression, **params):
+        names, values = params.get("ExpressionAttributeNames", {}), params.get("ExpressionAttributeValues", {})
+        key_condition = Condition(KeyConditionExpression, names, values)
+        condition = self._condition(params, "FilterExpression")
+        items = [
+            dict(item)
+            for item in self._table(client, "Query", TableName).values()
+            if key_condition.matches(item) and (condition is None or condition.matches(item))
+        ]
+        # by the sort key, the attribute of the last clause of the key condition
+        sort_key = key_condition.clauses[-1][1]
+        items.sort(key=lambda item: _value(item[sort_key]))
+        return {"Items": items, "Count": len(items)}
+
+    def _kms_CreateKey(self, client, **params):
+        key_id = str(uuid.uuid4())
+        self.keys.add(key_id)
+        return {"KeyMetadata": {"KeyId": key_id}}
+
+    def _kms_Encrypt(self, client, KeyId, Plaintext, **params):
+        return {"KeyId": KeyId, "CiphertextBlob": b"memory:" + Plaintext}
+
+    def _kms_Decrypt(self, client, CiphertextBlob, **params):
+        if not CiphertextBlob.startswith(b"memory:"):
+            raise self._error(client, "Decrypt", "InvalidCiphertextException")
+        return {"KeyId": params.get("KeyId"), "Plaintext": CiphertextBlob[len(b"memory:") :]}
+
+    def _kms_Sign(self, client, KeyId, Message, **params):
+        message = Message.encode("utf-8") if isinstance(Message, str) else Message
+        signature = self._signing_key.sign(message, padding.PKCS1v15(), hashes.SHA256())
+        return {"KeyId": KeyId, "Signature": signature, "SigningAlgorithm": "RSASSA_PKCS1_V1_5_SHA_256"}
+
+    def _kms_GetPublicKey(self, client, KeyId, **params):
+        public_key = self._signing_key.public_key().public_bytes(
+            encoding=serialization.Encoding.DER, format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return {"KeyId": KeyId, "PublicKey": public_key, "KeySpec": "RSA_2048", "KeyUsage": "SIGN_VERIFY"}
+
+    def _ssm_PutParameter(self, client, Name, Value, **params):
+        if Name in self.parameters and not params.get("Overwrite"):
+            raise self._error(client, "PutParameter", "ParameterAlreadyExists")
+        self.parameters[Name] = {"Name": Name, "Value": Value, "Type": params.get("Type", "String")}
+        return {"Version": 1}
+
+    def _ssm_GetParameter(self, client, Name, **params):
+        if Name not in self.parameters:
+            raise self._error(client, "GetParameter", "ParameterNotFound")
+        return {"Parameter": dict(self.parameters[Name])}
+
+
+@contextmanager
+def memory_aws(
+    tool_keys: int = 2, key_set_url: str = PLATFORM_KEY_SET_URL, auth_token_url: str = PLATFORM_AUTH_TOKEN_URL
+):
+    """
+    Answer DynamoDB, KMS and SSM in memory and seed them like ``benchmarks.environment.local_aws``.
+
+    :return: the MemoryAws, its ``calls`` start empty after the seeding
+    """
+    memory = MemoryAws()
+
+    def make_api_call(client, operation: str, params: dict) -> dict:
+        return memory.call(client, operation, params)
+
+    with patch.object(BaseClient, "_make_api_call", make_api_call):
+        seed_aws(tool_keys, key_set_url, auth_token_url)
+        memory.calls.clear()
+        yield memory
@@ -0,0 +1,60 @@
+"""
+Cost of the EMF metrics.
+
+Times recording a latency with METRICS off and on, /jwks.json with METRICS off and on (moto DynamoDB and SSM), and
+the flush of the metrics of those requests: the EMF documents and bytes written to stdout.
+
+    python -m benchmarks.metrics [requests]
+"""
+import io
+import os
+import statistics
+import sys
+import time
+
+from app import create_app
+from app.utility.aws import Singleton
+from app.utility.metrics import Metrics
+from benchmarks.environment import local_aws
+
+CALLS = 1000000
+
+
+def main(requests: int):
+    for setting in ("false", "true"):
+        os.environ["METRICS"] = setting
+        Singleton._instances.clear()
+        metrics = Metrics(stream=io.StringIO())
+        start = time.perf_counter()
+        for i in range(CALLS):
+            metrics.latency("GET /jwks.json", i % 500)
+        per_call = (time.perf_counter() - start) / CALLS * 1e6
+        print(f"Metrics().latency with METRICS={setting}: {per_call:.2f} us per call")
+
+    print(f"/jwks.json, {requests} requests")
+    print(f"  {'METRICS':<9}{'p50 ms':>9}{'mean ms':>9}{'flush ms':>10}{'documents':>11}{'bytes':>8}")
+    for setting in ("false", "true"):
+        os.environ["METRICS"] = setting
+        Singleton._instances.clear()
+        stream = io.StringIO()
+        with local_aws():
+            metrics = Metrics(stream=stream)
+            client = create_app().test_client()
+            client.get("/jwks.json")
+            metrics.documents()
+            times = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                client.get("/jwks.json")
+                times.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            metrics.flush()
+            flush_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"  {setting:<9}{statistics.median(times):>9.3f}{statistics.mean(times):>9.3f}{flush_ms:>10.3f}"
+            f"{len(stream.getvalue().splitlines()):>11}{len(stream.getvalue()):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
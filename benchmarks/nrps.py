@@ -0,0 +1,58 @@
+"""
+Memory and throughput of reading a large Names and Role Provisioning Services roster.
+
+Reads a roster of 50k members from a local stub, paginated with rel="next", through ``NrpsClient.members``:
+"generator" consumes the members as they are yielded, "list" collects the whole roster first. Reports the time, the
+members per second and the peak of Python allocations (tracemalloc, the stub runs in the same process so a page it
+builds is included).
+
+    python -m benchmarks.nrps [members]
+"""
+import sys
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from app.utility.nrps_client import NrpsClient
+from app.utility.token_client import TokenClient
+from benchmarks.environment import HttpStub
+from benchmarks.environment import nrps_routes
+
+CONSUMERS = {
+    "generator": lambda members: sum(1 for _ in members),
+    "list": lambda members: len(list(members)),
+}
+
+
+def run(url: str, page_size: int, consumer: str, traced: bool) -> tuple:
+    client = NrpsClient(platform=None, tool=None, page_size=page_size)
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    count = CONSUMERS[consumer](client.members(url))
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if traced:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main(members: int):
+    print(f"roster of {members} members")
+    print(f"  {'consumer':<12}{'page size':>10}{'seconds':>10}{'members/s':>12}{'peak MiB':>10}")
+    with HttpStub(nrps_routes(members)) as stub, patch.object(TokenClient, "request_bearer_token", return_value="t"):
+        url = f"{stub.url}/nrps/memberships"
+        for page_size in (100, 1000):
+            for consumer in CONSUMERS:
+                count, elapsed, _ = run(url, page_size, consumer, traced=False)
+                _, _, peak = run(url, page_size, consumer, traced=True)
+                assert count == members, count
+                print(
+                    f"  {consumer:<12}{page_size:>10}{elapsed:>10.2f}{count / elapsed:>12.0f}"
+                    f"{peak / 1024 / 1024:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,105 @@
+"""
+Score submission through the outbox against a local line item stub answering after 200 ms.
+
+"submit" compares the time the /submit_assignment request spends on the score: posting it to the platform inline
+against appending it to the outbox. "drain" appends the given number of scores and reports the throughput of
+``OutboxWorker.drain`` and the lag from submission to publication, on SQLite and on the (moto) LTI table.
+
+    python -m benchmarks.outbox [scores] [latency ms]
+"""
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from unittest.mock import patch
+
+from app.models.outbox import OutboxRecord
+from app.models.outbox import OutboxStorage
+from app.models.outbox import SqliteOutboxStorage
+from app.models.platform_config import LTIPlatform
+from app.models.platform_config import LTIPlatformStorage
+from app.models.tool_config import LTITool
+from app.models.tool_config import LTIToolStorage
+from app.utility.ags_client import AgsClient
+from app.utility.outbox_worker import OutboxWorker
+from app.utility.token_client import TokenClient
+from benchmarks.environment import CLIENT_ID
+from benchmarks.environment import DEPLOYMENT_ID
+from benchmarks.environment import ISS
+from benchmarks.environment import HttpStub
+from benchmarks.environment import ags_routes
+from benchmarks.environment import local_aws
+
+SUBMISSIONS = 50
+
+
+def record(lineitem_url: str, index: int) -> OutboxRecord:
+    now = time.time()
+    return OutboxRecord(
+        id=uuid.uuid4().hex,
+        client_id=CLIENT_ID,
+        iss=ISS,
+        lti_deployment_id=DEPLOYMENT_ID,
+        lineitem_url=lineitem_url,
+        score=json.dumps(AgsClient.score(f"user-{index}", index % 10, 10)),
+        created_at_ms=int(now * 1000),
+        next_attempt_at=int(now),
+    )
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def submit(lineitem_url: str, storages: dict):
+    client = AgsClient(LTIPlatform(LTIPlatformStorage()).load(CLIENT_ID, ISS, DEPLOYMENT_ID), LTITool(LTIToolStorage()))
+    cases = {"inline": [timed(lambda: client.publish_score(lineitem_url, AgsClient.score("user", 1, 10)))]}
+    for name, storage in storages.items():
+        cases[f"outbox {name}"] = [timed(lambda: storage.append(record(lineitem_url, 0)))]
+    for _ in range(SUBMISSIONS - 1):
+        cases["inline"].append(timed(lambda: client.publish_score(lineitem_url, AgsClient.score("user", 1, 10))))
+        for name, storage in storages.items():
+            cases[f"outbox {name}"].append(timed(lambda: storage.append(record(lineitem_url, 0))))
+
+    print(f"submit, {SUBMISSIONS} submissions")
+    print(f"  {'case':<18}{'p50 ms':>9}{'max ms':>9}")
+    for case, times in cases.items():
+        print(f"  {case:<18}{statistics.median(times):>9.2f}{max(times):>9.2f}")
+
+
+def drain(lineitem_url: str, storages: dict, count: int):
+    print(f"drain, {count} scores")
+    print(f"  {'storage':<12}{'published':>10}{'seconds':>9}{'scores/s':>10}{'lag p50 s':>11}{'lag max s':>11}")
+    for name, storage in storages.items():
+        for i in range(count):
+            storage.append(record(lineitem_url, i))
+        report = OutboxWorker(storage).drain()
+        print(
+            f"  {name:<12}{report.published:>10}{report.seconds:>9.2f}{report.throughput():>10.0f}"
+            f"{report.lag_percentile(50):>11.2f}{max(report.lag, default=0):>11.2f}"
+        )
+
+
+def main(count: int, latency: float):
+    logging.getLogger("OutboxWorker").disabled = True
+    with local_aws(), tempfile.TemporaryDirectory() as directory, HttpStub(ags_routes(latency)) as stub:
+        with patch.object(TokenClient, "request_bearer_token", return_value="token"):
+            lineitem_url = f"{stub.url}/lineitems/1"
+            storages = {"sqlite": SqliteOutboxStorage(f"{directory}/outbox.sqlite3"), "dynamodb": OutboxStorage()}
+            submit(lineitem_url, storages)
+            # the submit case leaves its records in the outbox, drain them first
+            for storage in storages.values():
+                OutboxWorker(storage).drain()
+            drain(lineitem_url, storages, count)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.2,
+    )
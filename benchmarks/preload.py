@@ -0,0 +1,91 @@
+"""
+First-request latency and memory of the gunicorn workers, with and without PRELOAD.
+
+"first request" starts gunicorn with a single worker, waits until it answers (a 404, which warms up nothing) and
+times the steps of its first launch, the median over several starts. "memory" starts ``gunicorn_config.py`` as it
+is (4 workers), makes every user launch a few times and reads the memory of each worker from
+``/proc/<pid>/smaps_rollup``: RSS, PSS (the pages shared with the master and the other workers divided between them)
+and private memory, which is what a worker really adds. AWS and the platform are the stand-ins of
+``benchmarks.load_test``.
+
+    python -m benchmarks.preload [starts] [users]
+"""
+import statistics
+import sys
+from pathlib import Path
+from typing import Callable
+from typing import List
+
+from benchmarks.environment import PlatformKeys
+from benchmarks.load_test import STEPS
+from benchmarks.load_test import Results
+from benchmarks.load_test import gunicorn_process
+from benchmarks.load_test import run_users
+from benchmarks.load_test import stand_ins_process
+from benchmarks.load_test import user
+
+MODES = {"no preload": "false", "preload": "true"}
+LAUNCHES_PER_USER = 5
+
+
+def at_most(launches: int) -> Callable[[], bool]:
+    remaining = iter(range(launches))
+    return lambda: next(remaining, None) is not None
+
+
+def first_request(platform_url: str, keys: PlatformKeys, preload: str) -> dict:
+    """
+    :return: by step, the milliseconds of the first launch of a fresh worker
+    """
+    with gunicorn_process(platform_url, PRELOAD=preload, GUNICORN_CMD_ARGS="--workers 1") as (url, _):
+        results = Results()
+        user(url, platform_url, keys, at_most(1), results)
+    return {step: results.latencies[step][0] for step in STEPS}
+
+
+def workers(pid: int) -> List[int]:
+    return [int(child) for child in Path(f"/proc/{pid}/task/{pid}/children").read_text().split()]
+
+
+def memory_kib(pid: int) -> dict:
+    """
+    :return: the Rss, Pss and private (clean and dirty) memory of the process, in KiB
+    """
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0])
+    return dict(rss=fields["Rss"], pss=fields["Pss"], private=fields["Private_Clean"] + fields["Private_Dirty"])
+
+
+def memory(platform_url: str, keys: PlatformKeys, preload: str, users: int) -> dict:
+    """
+    :return: the mean memory of a worker in KiB, after every user launched LAUNCHES_PER_USER times
+    """
+    with gunicorn_process(platform_url, PRELOAD=preload) as (url, gunicorn):
+        run_users(users, lambda: user(url, platform_url, keys, at_most(LAUNCHES_PER_USER), Results()))
+        measured = [memory_kib(pid) for pid in workers(gunicorn.pid)]
+    return {name: statistics.mean(m[name] for m in measured) for name in ("rss", "pss", "private")}
+
+
+def main(starts: int, users: int):
+    keys = PlatformKeys()
+    with stand_ins_process(keys) as platform_url:
+        print(f"first request of a worker, median of {starts} starts, ms")
+        print(f"  {'mode':<12}" + "".join(f"{step:>20}" for step in STEPS))
+        for mode, preload in MODES.items():
+            times = [first_request(platform_url, keys, preload) for _ in range(starts)]
+            print(f"  {mode:<12}" + "".join(f"{statistics.median(t[step] for t in times):>20.1f}" for step in STEPS))
+
+        print(f"memory of a worker, {users} users x {LAUNCHES_PER_USER} launches, MiB")
+        print(f"  {'mode':<12}{'RSS':>9}{'PSS':>9}{'private':>9}")
+        for mode, preload in MODES.items():
+            m = memory(platform_url, keys, preload, users)
+            print(f"  {mode:<12}{m['rss'] / 1024:>9.1f}{m['pss'] / 1024:>9.1f}{m['private'] / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+    )
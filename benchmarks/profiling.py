@@ -0,0 +1,47 @@
+"""
+Cost of the request profiling hook.
+
+Times /jwks.json (warm, AWS answered in memory) with PROFILING off, on without the request being selected, and on
+with every request profiled by ``cProfile`` and by the sampler, both with ``tracemalloc``.
+
+    python -m benchmarks.profiling [requests]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from app import create_app
+from app.utility.aws import Singleton
+from benchmarks.memory_aws import memory_aws
+
+SETTINGS = {
+    "off": dict(PROFILING="false"),
+    "on, not selected": dict(PROFILING="true", PROFILE_SAMPLE_RATE="0"),
+    "on, cprofile": dict(PROFILING="true", PROFILE_SAMPLE_RATE="1", PROFILE_MODE="cprofile"),
+    "on, sample": dict(PROFILING="true", PROFILE_SAMPLE_RATE="1", PROFILE_MODE="sample"),
+}
+
+
+def main(requests: int):
+    print(f"/jwks.json, {requests} requests")
+    print(f"  {'setting':<18}{'p50 ms':>9}{'mean ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["PROFILE_DIR"] = directory
+        for name, env in SETTINGS.items():
+            os.environ.update(env)
+            Singleton._instances.clear()
+            with memory_aws():
+                client = create_app().test_client()
+                client.get("/jwks.json")
+                times = []
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    client.get("/jwks.json")
+                    times.append((time.perf_counter() - start) * 1000)
+            print(f"  {name:<18}{statistics.median(times):>9.3f}{statistics.mean(times):>9.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,82 @@
+"""
+Per-record encode and decode time of the DynamoDB marshalling used by the models.
+
+"generic" is the previous path: ``TypeSerializer().serialize(record.dict())`` and
+``Model(**TypeDeserializer().deserialize(item))``. "codec" is the model's precompiled ``RecordCodec``.
+
+    python -m benchmarks.record_codecs [iterations]
+"""
+import sys
+
+from boto3.dynamodb.types import TypeDeserializer
+from boto3.dynamodb.types import TypeSerializer
+
+from app.models.jwks import JwkRecord
+from app.models.jwks import jwk_record_codec
+from app.models.platform_config import LTIPlatformConfig
+from app.models.platform_config import platform_config_codec
+from app.models.state import LTIStateRecord
+from app.models.state import state_record_codec
+from benchmarks import summarize
+from benchmarks import time_it
+
+
+def records():
+    return [
+        (
+            state_record_codec,
+            LTIStateRecord(
+                PK="STATE#9f1a2b7e-7c1d-4b5e-9a57-2d7d0c3e1f00",
+                id="9f1a2b7e-7c1d-4b5e-9a57-2d7d0c3e1f00",
+                nonce="1d2c3b4a-5e6f-4a7b-8c9d-0e1f2a3b4c5d",
+                nonce_count=0,
+                ttl=1658684348,
+                data={"course_id": "_3_1", "resource_link_id": "_3_1sign-up-list"},
+                platform_lti_token="Y2lwaGVydGV4dA==\n" * 40,
+                id_token="eyJhbGciOiJSUzI1NiJ9." + "x" * 2400 + ".signature",
+                learn_rest_token="Y2lwaGVydGV4dA==\n" * 12,
+            ),
+        ),
+        (
+            platform_config_codec,
+            LTIPlatformConfig(
+                PK="CONFIG#75363971-2683-4ad9-a31b-93ec41e27772#https://blackboard.com#f66151aa",
+                auth_token_url="https://developer.blackboard.com/api/v1/gateway/oauth2/jwttoken",
+                auth_login_url="https://developer.blackboard.com/api/v1/gateway/oidcauth",
+                client_id="75363971-2683-4ad9-a31b-93ec41e27772",
+                lti_deployment_id="f66151aa-a799-4b22-93ed-81dd16f70a4e",
+                iss="https://blackboard.com",
+                key_set_url="https://developer.blackboard.com/api/v1/management/applications/jwks.json",
+            ),
+        ),
+        (
+            jwk_record_codec,
+            JwkRecord(
+                PK="JWK#db9de74b-4990-4acf-af63-0da8adeb2a49",
+                kid="db9de74b-4990-4acf-af63-0da8adeb2a49",
+                kms_key_id="arn:aws:kms:us-east-2:200982613275:key/02f144bb-80c8-42ba-836b-d4248bd876c3",
+                public_key_pem="LS0tLS1CRUdJTiBSU0EgUFVCTElDIEtFWS0tLS0t" * 11,
+                ttl=1658684348,
+            ),
+        ),
+    ]
+
+
+def main(iterations: int):
+    print(f"{'record':<20}{'operation':<10}{'path':<9}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+    for codec, record in records():
+        model = type(record)
+        item = codec.encode(record)
+        cases = {
+            ("encode", "generic"): lambda: TypeSerializer().serialize(record.dict())["M"],
+            ("encode", "codec"): lambda: codec.encode(record),
+            ("decode", "generic"): lambda: model(**TypeDeserializer().deserialize({"M": item})),
+            ("decode", "codec"): lambda: codec.decode(item),
+        }
+        for (operation, path), fn in cases.items():
+            s = summarize(time_it(fn, iterations))
+            print(f"{model.__name__:<20}{operation:<10}{path:<9}{s['mean']:>10.2f}{s['p50']:>10.2f}{s['p99']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,63 @@
+"""
+Streaming a synthetic gradebook file through ``ScoreImporter`` to a local line item stub.
+
+Writes CSV and JSONL files of 10k and of the given number of rows, every 100th row invalid, and imports each one.
+Reports the time, the rows per second and the peak RSS of the process so far (the stub runs in the same process and is
+included): the peak should not grow with the size of the file.
+
+    python -m benchmarks.score_import [rows]
+"""
+import json
+import logging
+import resource
+import sys
+import tempfile
+from unittest.mock import patch
+
+from app.utility.ags_client import AgsClient
+from app.utility.score_import import CSV
+from app.utility.score_import import JSONL
+from app.utility.score_import import ScoreImporter
+from app.utility.token_client import TokenClient
+from benchmarks.environment import HttpStub
+from benchmarks.environment import ags_routes
+
+
+def row(index: int) -> dict:
+    # every 100th score is above the scoreMaximum of 10
+    return dict(sub=f"user-{index}", score=11 if index % 100 == 99 else index % 11, comment=f"Imported row {index}")
+
+
+def write(path: str, format: str, rows: int):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        if format == CSV:
+            file.write("sub,score,comment\n")
+        for i in range(rows):
+            r = row(i)
+            file.write(json.dumps(r) + "\n" if format == JSONL else f"{r['sub']},{r['score']},{r['comment']}\n")
+
+
+def main(rows: int):
+    logging.getLogger("ScoreImporter").disabled = True
+    print(f"{'format':<8}{'rows':>8}{'published':>11}{'rejected':>10}{'seconds':>9}{'rows/s':>9}{'peak RSS MiB':>14}")
+    # a plain function rather than a Mock, which would keep every call
+    with HttpStub(ags_routes()) as stub, patch.object(TokenClient, "request_bearer_token", new=lambda **kw: "token"):
+        with tempfile.TemporaryDirectory() as directory:
+            for format in (CSV, JSONL):
+                for count in sorted({10000, rows}):
+                    path = f"{directory}/scores.{format}"
+                    write(path, format, count)
+                    client = AgsClient(platform=None, tool=None)
+                    importer = ScoreImporter(client, lineitem_url=f"{stub.url}/lineitems/1")
+                    with open(path, "rb") as file:
+                        report = importer.run(file, format)
+                    # KiB on Linux
+                    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+                    print(
+                        f"{format:<8}{count:>8}{report.published:>11}{report.rejected:>10}{report.seconds:>9.2f}"
+                        f"{report.rows / report.seconds:>9.0f}{peak / 1024 / 1024:>14.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
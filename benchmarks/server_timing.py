@@ -0,0 +1,46 @@
+"""
+Cost of the Server-Timing instrumentation.
+
+Times ``timed`` outside of a timed request, the path every HTTP call takes with SERVER_TIMING off, and /jwks.json
+with SERVER_TIMING off and on (moto DynamoDB, one Scan per request).
+
+    python -m benchmarks.server_timing [requests]
+"""
+import os
+import statistics
+import sys
+import time
+
+from app import create_app
+from app.utility.aws import Singleton
+from app.utility.server_timing import timed
+from benchmarks.environment import local_aws
+
+CALLS = 1000000
+
+
+def main(requests: int):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        with timed("http"):
+            pass
+    print(f"timed() without a timed request: {(time.perf_counter() - start) / CALLS * 1e6:.2f} us per call")
+
+    print(f"/jwks.json, {requests} requests")
+    print(f"  {'SERVER_TIMING':<15}{'p50 ms':>9}{'mean ms':>9}")
+    for setting in ("false", "true"):
+        os.environ["SERVER_TIMING"] = setting
+        Singleton._instances.clear()
+        with local_aws():
+            client = create_app().test_client()
+            client.get("/jwks.json")
+            times = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                client.get("/jwks.json")
+                times.append((time.perf_counter() - start) * 1000)
+        print(f"  {setting:<15}{statistics.median(times):>9.3f}{statistics.mean(times):>9.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
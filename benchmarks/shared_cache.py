@@ -0,0 +1,86 @@
+"""
+Upstream calls of a gunicorn deployment, with and without the cache shared by the workers of the host
+(``app.utility.shared_cache``). Without it, each worker caches the tool's configuration and every launch reads the
+platform configuration and JWKS.
+
+gunicorn is started with ``gunicorn_config.py`` and 4, then 16 workers, SHARED_CACHE_PATH empty or a fresh file, and
+the same short TTL for every cache so that they are refreshed during the run. Virtual users launch for a while, as
+in ``benchmarks.load_test``, whose stand-ins count the calls: the SSM parameters and the tool JWKS scan (the tool's
+configuration), the reads of CONFIG# items (the platform configurations) and the platform JWKS fetches. The counts
+start before gunicorn does, the workers loading what they need on their first requests are counted.
+
+    python -m benchmarks.shared_cache [users] [seconds] [ttl]
+"""
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import requests
+
+from benchmarks.environment import PlatformKeys
+from benchmarks.load_test import Results
+from benchmarks.load_test import gunicorn_process
+from benchmarks.load_test import run_users
+from benchmarks.load_test import stand_ins_process
+from benchmarks.load_test import user
+
+WORKERS = (4, 16)
+# upstream calls reported, by the calls counted by the stand-ins they are made of
+UPSTREAM = {
+    "tool SSM": lambda call: call.startswith("ssm:GetParameter"),
+    "tool JWKS": lambda call: call.startswith("dynamodb:Scan"),
+    "platform config": lambda call: call.startswith("dynamodb:") and "CONFIG#" in call,
+    "platform JWKS": lambda call: call == "GET /jwks.json",
+}
+
+
+def counted(platform_url: str) -> Counter:
+    return Counter(requests.get(f"{platform_url}/calls", timeout=5).json())
+
+
+def upstream_calls(
+    platform_url: str, keys: PlatformKeys, workers: int, shared: bool, users: int, seconds: float, ttl: int
+) -> dict:
+    """
+    :return: the launches completed and the upstream calls made, by UPSTREAM category
+    """
+    before = counted(platform_url)
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            GUNICORN_CMD_ARGS=f"--workers {workers}",
+            SHARED_CACHE_PATH=f"{directory}/shared-cache" if shared else "",
+            TOOL_CONFIG_TTL=str(ttl),
+            PLATFORM_CACHE_TTL=str(ttl),
+            PLATFORM_JWKS_TTL=str(ttl),
+        )
+        with gunicorn_process(platform_url, **env) as (url, _):
+            results = Results()
+            deadline = time.monotonic() + seconds
+            run_users(users, lambda: user(url, platform_url, keys, lambda: time.monotonic() < deadline, results))
+    calls = counted(platform_url) - before
+    upstream = {name: sum(n for call, n in calls.items() if matches(call)) for name, matches in UPSTREAM.items()}
+    return dict(launches=results.launches, **upstream)
+
+
+def main(users: int, seconds: float, ttl: int):
+    keys = PlatformKeys()
+    print(f"{users} users for {seconds:g} s, caches refreshed every {ttl} s, upstream calls")
+    print(f"  {'workers':<9}{'shared':<8}{'launches':>9}" + "".join(f"{name:>17}" for name in UPSTREAM))
+    with stand_ins_process(keys) as platform_url:
+        for workers in WORKERS:
+            for shared in (False, True):
+                result = upstream_calls(platform_url, keys, workers, shared, users, seconds, ttl)
+                mode = "shared" if shared else "off"
+                print(
+                    f"  {workers:<9}{mode:<8}{result['launches']:>9}"
+                    + "".join(f"{result[name]:>17}" for name in UPSTREAM)
+                )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 5,
+    )
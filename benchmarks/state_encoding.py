@@ -0,0 +1,83 @@
+"""
+Capacity units consumed by a launch's state item with the "map" and "compact" STATE_ENCODING.
+
+The item is built the way a Learn launch fills it: the platform id_token taken from payloads/launch.json
+(signed over payloads/token_payload.json) and KMS ciphertexts for the LTI and Learn REST tokens.
+
+    python -m benchmarks.state_encoding
+"""
+import base64
+import json
+import os
+import time
+from urllib.parse import parse_qs
+
+import jwt
+from boto3.dynamodb.types import TypeSerializer
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.models.state import LTIStateRecord
+from app.utility.codecs import CompactStateCodec
+from benchmarks import item_size
+from benchmarks import read_payload
+from benchmarks import read_units
+from benchmarks import write_units
+
+# A symmetric KMS ciphertext blob is the plaintext plus roughly 150 bytes of header, IV and tag.
+KMS_CIPHERTEXT_OVERHEAD = 150
+
+
+def id_token() -> str:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_key = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    now = int(time.time())
+    payload = json.loads(
+        read_payload(
+            "token_payload.json",
+            {'"NOW"': str(now), '"EXPIRATION"': str(now + 300), "NONCE": "nonce"},
+        )
+    )
+    token = jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": "benchmark"})
+    launch = json.loads(read_payload("launch.json", {"{STATE}": "state", "{ID_TOKEN}": token}))
+    return parse_qs(launch["body"])["id_token"][0]
+
+
+def kms_ciphertext(plaintext_length: int) -> str:
+    return base64.encodebytes(os.urandom(plaintext_length + KMS_CIPHERTEXT_OVERHEAD)).decode("utf-8")
+
+
+def launch_record() -> dict:
+    record = LTIStateRecord(
+        id_token=id_token(),
+        platform_lti_token=kms_ciphertext(1024),
+        learn_rest_token=kms_ciphertext(32),
+        data={"course_id": "_3_1", "resource_link_id": "_3_1sign-up-list"},
+    )
+    record.PK = f"STATE#{record.id}"
+    record.ttl = int(time.time()) + 7200
+    return record.dict()
+
+
+def main():
+    record = launch_record()
+    items = {
+        "map": TypeSerializer().serialize(record)["M"],
+        "compact": CompactStateCodec.encode(record),
+    }
+    print(f"{'encoding':<10}{'bytes':>8}{'WCU':>6}{'RCU':>6}{'RCU (eventual)':>16}")
+    for name, item in items.items():
+        size = item_size(item)
+        print(f"{name:<10}{size:>8}{write_units(size):>6}{read_units(size):>6}{read_units(size, False):>16}")
+
+    map_size = item_size(items["map"])
+    compact_size = item_size(items["compact"])
+    print(f"compact item is {100 * (1 - compact_size / map_size):.1f}% smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,94 @@
+import gc
+import os
+import stat
+import tempfile
+
 bind = "0.0.0.0:5000"
 workers = 4
 threads = 4
 timeout = 120
+# WORKER_CLASS=gevent serves every request of a worker in a greenlet, up to WORKER_CONNECTIONS at a time, for launches
+# that mostly wait on AWS and the platform. The default gthread serves `threads` requests at a time.
+worker_class = os.getenv("WORKER_CLASS", "gthread")
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", "1000"))
+if worker_class == "gevent":
+    # before the master imports anything that uses sockets, ssl or threads, the application when PRELOAD is true
+    from gevent import monkey
+
+    monkey.patch_all()
+# requests a worker serves at the same time
+concurrency = worker_connections if worker_class == "gevent" else threads
+# One pooled AWS connection per request served at the same time, up to 50: a gevent worker serves up to 1000 requests
+# at a time, mostly waiting on the platform, and should not keep as many connections to each AWS service open. A
+# request beyond the pool opens a connection that is closed after use. See app.utility.aws.client_config
+max_pool_connections = os.getenv("AWS_MAX_POOL_CONNECTIONS", str(min(concurrency, 50)))
+# The files shared by the workers of the host are kept in a directory of the user running gunicorn that no other user
+# can enter, not in /tmp itself where another user could create them first: $XDG_RUNTIME_DIR/lti-tool, else
+# lti-tool-<uid> in the temporary directory, or LTI_RUNTIME_DIR
+runtime_dir = os.getenv("LTI_RUNTIME_DIR") or (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], "lti-tool")
+    if os.getenv("XDG_RUNTIME_DIR")
+    else os.path.join(tempfile.gettempdir(), f"lti-tool-{os.geteuid()}")
+)
+os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+runtime_dir_status = os.lstat(runtime_dir)
+if (
+    not stat.S_ISDIR(runtime_dir_status.st_mode)
+    or runtime_dir_status.st_uid != os.geteuid()
+    or stat.S_IMODE(runtime_dir_status.st_mode) != 0o700
+):
+    raise Exception(f"Refusing {runtime_dir}, it is not a directory of user {os.geteuid()} with mode 0700")
+# Scores go through a SQLite outbox shared by the workers of the host, see app.models.outbox
+# The tool and platform configurations and the platform JWKS are cached once for the workers of the host, see
+# app.utility.shared_cache, SHARED_CACHE_PATH="" disables it
+raw_env = [
+    f"AWS_MAX_POOL_CONNECTIONS={max_pool_connections}",
+    f"OUTBOX_BACKEND={os.getenv('OUTBOX_BACKEND', 'sqlite')}",
+    f"OUTBOX_SQLITE_PATH={os.getenv('OUTBOX_SQLITE_PATH', os.path.join(runtime_dir, 'outbox.sqlite3'))}",
+    f"SHARED_CACHE_PATH={os.getenv('SHARED_CACHE_PATH', os.path.join(runtime_dir, 'shared-cache'))}",
+]
+if worker_class == "gevent":
+    # the FanOut pool is made of greenlets, two steps for each launch served at the same time, see app.utility.fanout
+    raw_env.append(f"FANOUT_MAX_WORKERS={os.getenv('FANOUT_MAX_WORKERS', str(2 * concurrency))}")
+# PRELOAD=true imports and warms up the application in the master, the workers share it copy-on-write, see
+# app.utility.warmup
+preload_app = os.getenv("PRELOAD", "false").lower() == "true"
+if preload_app:
+    # a collection in the master would leave holes in the pages the workers share
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        from app.utility import warmup
+
+        warmup.warm(server.app.wsgi())
+        # the collections of the workers leave the objects of the master, and the pages holding them, untouched
+        gc.freeze()
+        # the master keeps running, e.g. forking new workers, the objects it creates from now on are collected
+        gc.enable()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+        from app.utility import warmup
+
+        warmup.after_fork()
+
+
+def post_worker_init(worker):
+    # every worker drains the outbox, records are claimed so each score is published once
+    from app.utility.outbox_worker import OutboxWorker
+
+    OutboxWorker().start(float(os.getenv("OUTBOX_INTERVAL", "1")))
+    # EMF metrics are written to stdout, see app.utility.metrics
+    from app.utility.metrics import Metrics
+
+    Metrics().start(float(os.getenv("METRICS_INTERVAL", "60")))
+
+
+def worker_exit(server, worker):
+    from app.utility.metrics import Metrics
+
+    Metrics().stop()
@@ -1,6 +1,10 @@
 import aws_cdk
 from aws_cdk import aws_apigateway
+from aws_cdk import aws_events
+from aws_cdk import aws_events_targets
 from aws_cdk import aws_iam
+from aws_cdk import aws_lambda
+from aws_cdk import aws_lambda_event_sources
 from aws_cdk import aws_ssm
 from constructs import Construct
 
@@ -19,6 +23,8 @@ class Application(Construct):
             "KMS_KEY_ID": keys.asymmetric_key.key_arn,
             "KMS_SYMMETRIC_KEY_ID": keys.symmetric_key.key_arn,
             "STATE_TTL": "7200",
+            "METRICS": "true",
+            "LOG_FORMAT": "json",
             "LTI_TOOLING_API_URL_KEY": f"/anthology/workshop/lti-tooling/api/url/{self.node.path}",
             "LEARN_APPLICATION_KEY_KEY": f"/anthology/workshop/learn/application/key/{self.node.path}",
             "LEARN_APPLICATION_SECRET_KEY": f"/anthology/workshop/learn/application/secret/{self.node.path}",
@@ -29,6 +35,45 @@ class Application(Construct):
         keys.grant_read(flask_endpoint_function)
         flask_endpoint_function.add_layers(deps_layer)
         tables.lti_table.grant_read_write_data(flask_endpoint_function)
+        state_sweeper_function, state_sweeper_alias = lambdas.state_sweeper_lambda(
+            self, environment=environment, branch=branch
+        )
+        state_sweeper_function.add_layers(deps_layer)
+        tables.lti_table.grant_read_write_data(state_sweeper_function)
+        aws_events.Rule(
+            self,
+            "state-sweeper-schedule",
+            schedule=aws_events.Schedule.rate(aws_cdk.Duration.hours(1)),
+            targets=[aws_events_targets.LambdaFunction(state_sweeper_alias)],
+        )
+        outbox_function, outbox_alias = lambdas.outbox_lambda(self, environment=environment, branch=branch)
+        outbox_function.add_layers(deps_layer)
+        keys.grant_read(outbox_function)
+        tables.lti_table.grant_read_write_data(outbox_function)
+        outbox_alias.add_event_source(
+            aws_lambda_event_sources.DynamoEventSource(
+                tables.lti_table,
+                starting_position=aws_lambda.StartingPosition.LATEST,
+                batch_size=100,
+                max_batching_window=aws_cdk.Duration.seconds(1),
+                retry_attempts=2,
+                filters=[
+                    aws_lambda.FilterCriteria.filter(
+                        {
+                            "eventName": aws_lambda.FilterRule.is_equal("INSERT"),
+                            "dynamodb": {"Keys": {"PK": {"S": aws_lambda.FilterRule.begins_with("OUTBOX#")}}},
+                        }
+                    )
+                ],
+            )
+        )
+        # scores the stream could not publish are retried by a scheduled drain
+        aws_events.Rule(
+            self,
+            "outbox-schedule",
+            schedule=aws_events.Schedule.rate(aws_cdk.Duration.minutes(1)),
+            targets=[aws_events_targets.LambdaFunction(outbox_alias)],
+        )
         api = aws_apigateway.LambdaRestApi(
             self,
             f"api-{clean_name(branch)}",
@@ -67,4 +112,5 @@ class Application(Construct):
         )
 
         policy.attach_to_role(flask_endpoint_function.role)
+        policy.attach_to_role(outbox_function.role)
         self.api_url = api.url
@@ -425,3 +425,33 @@ def flask_endpoint_lambda(scope: Construct, environment: dict, branch: str):
         memory_size=256,
     )
     return z.function, z.alias
+
+
+def outbox_lambda(scope: Construct, environment: dict, branch: str):
+    z = __lambda_zip(
+        scope,
+        f"outbox-lambda-{clean_name(branch)}",
+        "wsgi.py",
+        os.path.join(os.getcwd(), "app"),
+        f"outbox-{clean_name(branch)}",
+        handler="app.wsgi.outbox_handler",
+        environment=environment,
+        timeout=Duration.minutes(1),
+        memory_size=256,
+    )
+    return z.function, z.alias
+
+
+def state_sweeper_lambda(scope: Construct, environment: dict, branch: str):
+    z = __lambda_zip(
+        scope,
+        f"state-sweeper-lambda-{clean_name(branch)}",
+        "wsgi.py",
+        os.path.join(os.getcwd(), "app"),
+        f"state-sweeper-{clean_name(branch)}",
+        handler="app.wsgi.state_sweeper_handler",
+        environment=environment,
+        timeout=Duration.minutes(5),
+        memory_size=256,
+    )
+    return z.function, z.alias
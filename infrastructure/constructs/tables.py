@@ -21,5 +21,13 @@ class Tables(Construct):
             time_to_live_attribute="ttl",
             billing_mode=dynamo_.BillingMode.PAY_PER_REQUEST,
             point_in_time_recovery=True,
+            # OUTBOX# items are published by the outbox lambda as they are written
+            stream=dynamo_.StreamViewType.NEW_IMAGE,
             removal_policy=aws_cdk.RemovalPolicy.DESTROY,
         )
+        # sparse index of the pending OUTBOX# items, by the time they are due, see app.models.outbox
+        self.lti_table.add_global_secondary_index(
+            index_name="outbox-due",
+            partition_key=dynamo_.Attribute(name="outbox_due", type=dynamo_.AttributeType.STRING),
+            sort_key=dynamo_.Attribute(name="next_attempt_at", type=dynamo_.AttributeType.NUMBER),
+        )
@@ -0,0 +1,11 @@
+import pytest
+
+from app.utility.aws import Singleton
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_singletons():
+    yield
+    # Aws, HttpClient and CourseInfoCache are process wide, drop the instances bound to this test's moto clients
+    # and environment
+    Singleton._instances.clear()
@@ -0,0 +1,259 @@
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from app.utility.ags_client import SCORE
+from app.utility.ags_client import AgsClient
+from app.utility.ags_client import LineItemCache
+from app.utility.fanout import deadline
+from app.utility.token_client import BearerTokenCache
+from app.utility.token_client import TokenClient
+from benchmarks.environment import HttpStub
+from benchmarks.environment import ags_routes
+from benchmarks.environment import line_item_routes
+
+
+@pytest.fixture(scope="function")
+def bearer_token():
+    with patch.object(TokenClient, "request_bearer_token", return_value="token") as request_bearer_token:
+        with patch.object(TokenClient, "invalidate_bearer_token"):
+            yield request_bearer_token
+
+
+@pytest.fixture(scope="function")
+def no_backoff(monkeypatch):
+    monkeypatch.setenv("HTTP_BACKOFF", "0")
+
+
+def scores_for(count: int):
+    return (AgsClient.score(f"user-{i}", 1, 1) for i in range(count))
+
+
+def test_scores_url():
+    assert AgsClient.scores_url("https://learn/lineitems/1") == "https://learn/lineitems/1/scores"
+    assert AgsClient.scores_url("https://learn/lineitems/1/?type=x") == "https://learn/lineitems/1/scores?type=x"
+
+
+def test_publish_score(bearer_token):
+    received = []
+
+    def scores(request):
+        received.append((dict(request.headers), json.loads(request.body)))
+        return 200, {}, b""
+
+    with HttpStub({"/lineitems/1/scores": scores}) as stub:
+        score = AgsClient.score("user-1", 2, 3, comment="Acknowledged")
+        response = AgsClient(platform=None, tool=None).publish_score(f"{stub.url}/lineitems/1", score)
+
+    assert response.ok
+    headers, body = received[0]
+    assert headers["Authorization"] == "Bearer token"
+    assert headers["Content-Type"] == SCORE
+    assert body == score
+
+
+def test_publish_scores_is_concurrent_within_host_limit(bearer_token):
+    in_flight = []
+    current = [0]
+    lock = threading.Lock()
+
+    def scores(request):
+        with lock:
+            current[0] += 1
+            in_flight.append(current[0])
+        time.sleep(0.02)
+        with lock:
+            current[0] -= 1
+        return 200, {}, b""
+
+    with HttpStub({"/lineitems/1/scores": scores}) as stub:
+        client = AgsClient(platform=None, tool=None, max_workers=8, host_concurrency=4)
+        report = client.publish_scores(f"{stub.url}/lineitems/1", scores_for(40))
+
+    assert report.published == 40
+    assert report.failed == []
+    assert 1 < max(in_flight) <= 4
+
+
+def test_throttled_scores_are_retried(bearer_token, no_backoff):
+    with HttpStub(ags_routes(throttle_every=3)) as stub:
+        client = AgsClient(platform=None, tool=None, max_workers=1)
+        report = client.publish_scores(f"{stub.url}/lineitems/1", scores_for(6))
+
+    assert report.published == 6
+    assert stub.requests["POST /lineitems/1/scores"] > 6
+
+
+def test_failures_are_aggregated(bearer_token):
+    def scores(request):
+        return (400, {}, "Unknown user") if json.loads(request.body)["userId"] == "user-2" else (200, {}, b"")
+
+    with HttpStub({"/lineitems/1/scores": scores}) as stub:
+        client = AgsClient(platform=None, tool=None)
+        report = client.publish_scores(f"{stub.url}/lineitems/1", scores_for(5))
+
+    assert report.published == 4
+    assert report.failed == [dict(userId="user-2", status=400, error="Unknown user")]
+
+
+def test_publish_runs_in_the_callers_context(bearer_token, monkeypatch):
+    request_id = contextvars.ContextVar("request_id", default=None)
+    seen = []
+    monkeypatch.setattr(AgsClient, "publish_score", lambda self, url, score: seen.append(request_id.get()))
+
+    request_id.set("request-1")
+    AgsClient(platform=None, tool=None, max_workers=4).publish_scores("https://learn/lineitems/1", scores_for(8))
+
+    assert seen == ["request-1"] * 8
+
+
+def test_publish_stops_at_the_deadline(bearer_token):
+    with HttpStub(ags_routes(latency=0.05)) as stub:
+        client = AgsClient(platform=None, tool=None, max_workers=2, host_concurrency=2)
+        start = time.monotonic()
+        with deadline(0.2):
+            report = client.publish_scores(f"{stub.url}/lineitems/1", scores_for(40))
+        elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    assert 0 < report.published < 40
+    assert report.published + report.failures + report.in_flight == 40
+    assert dict(userId="user-39", status=None, error="Deadline exceeded") in report.failed
+
+
+def test_scores_being_posted_at_the_deadline_are_in_flight(bearer_token, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(AgsClient, "publish_score", lambda self, url, score: release.wait(1))
+    client = AgsClient(platform=None, tool=None, max_workers=1)
+
+    with deadline(0.1):
+        report = client.publish_scores("https://learn/lineitems/1", scores_for(3))
+    release.set()
+
+    assert (report.published, report.in_flight, report.failures) == (0, 1, 2)
+    assert sorted(failure["userId"] for failure in report.failed) == ["user-1", "user-2"]
+
+
+def test_host_slots_are_per_host_concurrency(bearer_token):
+    with HttpStub(ags_routes()) as stub:
+        for host_concurrency in (1, 4):
+            client = AgsClient(platform=None, tool=None, host_concurrency=host_concurrency)
+            assert client.publish_score(f"{stub.url}/lineitems/1", AgsClient.score("user-1", 1, 1)).ok
+        host = stub.url.split("://")[1]
+
+    assert (host, 1) in AgsClient._host_slots and (host, 4) in AgsClient._host_slots
+
+
+def test_bearer_tokens_are_requested_once():
+    requests = []
+
+    def request():
+        requests.append(1)
+        time.sleep(0.01)
+        return "token", 3600
+
+    cache = BearerTokenCache()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tokens = list(executor.map(lambda _: cache.get(("url", "client", "scope"), request), range(32)))
+
+    assert set(tokens) == {"token"}
+    assert len(requests) == 1
+
+    cache.invalidate(("url", "client", "scope"))
+    cache.get(("url", "client", "scope"), request)
+    assert len(requests) == 2
+
+
+def test_bearer_tokens_expire(monkeypatch):
+    monkeypatch.setenv("BEARER_TOKEN_EXPIRY_MARGIN", "60")
+    cache = BearerTokenCache()
+    tokens = iter([("first", 30), ("second", 3600)])
+
+    assert cache.get(("url",), lambda: next(tokens)) == "first"
+    # 30 seconds is within the expiry margin, the token is not reused
+    assert cache.get(("url",), lambda: next(tokens)) == "second"
+
+
+def test_bearer_token_locks_do_not_grow_with_the_keys():
+    cache = BearerTokenCache()
+    locks = list(cache._locks)
+
+    for i in range(1000):
+        cache.get(("url", f"client-{i}"), lambda: ("token", 3600))
+
+    assert cache._locks == locks
+
+
+
+def test_line_items_are_listed_once_and_cached(bearer_token, monkeypatch):
+    monkeypatch.setenv("LINE_ITEM_PAGE_SIZE", "10")
+    with HttpStub(line_item_routes(25)) as stub:
+        client = AgsClient(platform=None, tool=None)
+        url = f"{stub.url}/lineitems"
+
+        assert len(client.line_items(url)) == 25
+        assert [item["id"] for item in client.line_items(url, resource_id="resource-3")] == ["/lineitems/3"]
+        assert len(client.line_items(url, tag="quiz")) == 12
+        assert client.line_items(url, resource_id="resource-3", tag="originality") == []
+        assert client.line_items(url, resource_id="unknown") == []
+
+    # three pages, read once
+    assert stub.requests["GET /lineitems"] == 3
+
+
+def test_line_items_are_listed_once_by_concurrent_lookups(bearer_token):
+    with HttpStub(line_item_routes(5), delay=0.05) as stub:
+        client = AgsClient(platform=None, tool=None)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            found = list(executor.map(lambda _: client.line_items(f"{stub.url}/lineitems"), range(8)))
+
+    assert all(len(items) == 5 for items in found)
+    assert stub.requests["GET /lineitems"] == 1
+
+
+def test_line_item_locks_do_not_grow_with_the_contexts():
+    cache = LineItemCache()
+    locks = list(cache._locks)
+
+    for i in range(1000):
+        cache.get(f"https://platform.example.org/contexts/{i}/lineitems", lambda: [])
+
+    assert cache._locks == locks
+
+
+def test_create_line_items_concurrently(bearer_token):
+    with HttpStub(line_item_routes(0, latency=0.1)) as stub:
+        client = AgsClient(platform=None, tool=None)
+        url = f"{stub.url}/lineitems"
+        assert client.line_items(url) == []
+
+        line_items = [dict(label=f"Item {i}", scoreMaximum=10, resourceId=f"new-{i}") for i in range(10)]
+        start = time.perf_counter()
+        created = client.create_line_items(url, line_items)
+        elapsed = time.perf_counter() - start
+
+        assert [item["resourceId"] for item in created] == [f"new-{i}" for i in range(10)]
+        assert all(item["id"].startswith(f"{url}/") for item in created)
+        # served from the cache, the new line items included
+        assert client.line_items(url, resource_id="new-7") == [created[7]]
+
+    assert elapsed < 0.5
+    assert stub.requests["POST /lineitems"] == 10
+    assert stub.requests["GET /lineitems"] == 1
+
+
+def test_create_line_items_reports_failures(bearer_token):
+    def refuse(request):
+        body = json.loads(request.body)
+        return (400, {}, "Invalid label") if body["label"] == "bad" else (201, {}, dict(body, id="/lineitems/1"))
+
+    with HttpStub({"/lineitems": refuse}) as stub:
+        with pytest.raises(Exception, match="1 of 2 line items were not created"):
+            AgsClient(platform=None, tool=None).create_line_items(
+                f"{stub.url}/lineitems", [dict(label="good", scoreMaximum=1), dict(label="bad", scoreMaximum=1)]
+            )
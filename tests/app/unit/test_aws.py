@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from app.utility.aws import Aws
+from app.utility.aws import client_config
+
+
+def test_clients_are_created_on_first_use():
+    with patch("boto3.session.Session") as session:
+        aws = Aws()
+        session.assert_not_called()
+
+        assert aws.ssm is aws.ssm
+        session.return_value.client.assert_called_once_with("ssm", config=aws.config)
+        session.return_value.resource.assert_not_called()
+
+
+def test_injected_clients_are_used():
+    ssm = MagicMock()
+    with patch("boto3.session.Session") as session:
+        assert Aws(ssm=ssm).ssm is ssm
+        session.assert_not_called()
+
+
+def test_concurrent_first_use_creates_one_client():
+    with patch("boto3.session.Session") as session:
+        session.return_value.client.side_effect = lambda *args, **kwargs: MagicMock()
+        aws = Aws()
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            clients = list(executor.map(lambda _: aws.kms, range(64)))
+
+        assert len({id(client) for client in clients}) == 1
+        session.return_value.client.assert_called_once()
+
+
+def test_client_config(monkeypatch):
+    monkeypatch.setenv("AWS_MAX_POOL_CONNECTIONS", "16")
+    monkeypatch.setenv("AWS_CONNECT_TIMEOUT", "0.5")
+    config = client_config()
+
+    assert config.max_pool_connections == 16
+    assert config.connect_timeout == 0.5
+    assert config.retries["mode"] == "adaptive"
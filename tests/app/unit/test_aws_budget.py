@@ -0,0 +1,32 @@
+from app.models.tool_config import LTITool
+from app.models.tool_config import LTIToolStorage
+from benchmarks.aws_budget import BUDGETS
+from benchmarks.aws_budget import over_budget
+from benchmarks.aws_budget import record_aws_calls
+from benchmarks.aws_budget import warm_launch_calls
+from benchmarks.memory_aws import memory_aws
+
+
+def test_routes_within_budget():
+    calls = warm_launch_calls()
+
+    assert list(calls) == list(BUDGETS)
+    problems = [problem for route, made in calls.items() for problem in over_budget(route, made, BUDGETS[route])]
+    assert not problems, "\n".join(problems)
+
+
+def test_over_budget_prints_the_stack(monkeypatch):
+    # without the cache, every LTITool reads its configuration and JWKS again
+    monkeypatch.setenv("TOOL_CONFIG_TTL", "0")
+    with memory_aws():
+        LTITool(LTIToolStorage())
+        with record_aws_calls() as calls:
+            LTITool(LTIToolStorage())
+
+    problems = over_budget("/jwks.json", calls, BUDGETS["/jwks.json"])
+
+    assert len(problems) == 1
+    assert problems[0].startswith("/jwks.json made 4 total calls, budget 0:")
+    assert problems[0].count("ssm:GetParameter") == 3
+    assert "dynamodb:Scan" in problems[0] and "JWK#" in problems[0]
+    assert "tool_config.py" in problems[0]
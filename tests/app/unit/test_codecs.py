@@ -0,0 +1,69 @@
+from boto3.dynamodb.types import TypeSerializer
+
+from app.models.jwks import JwkRecord
+from app.models.jwks import jwk_record_codec
+from app.models.platform_config import LTIPlatformConfig
+from app.models.platform_config import platform_config_codec
+from app.models.state import LTIStateRecord
+from app.models.state import state_record_codec
+
+
+def state_record() -> LTIStateRecord:
+    return LTIStateRecord(
+        PK="STATE#1",
+        id="1",
+        nonce="nonce",
+        nonce_count=1,
+        ttl=1658684348,
+        data={"course": "_3_1", "points": 3, "tags": ["a", "b"], "graded": True, "empty": None},
+        platform_lti_token=None,
+        id_token="header.payload.signature",
+        learn_rest_token="Y2lwaGVydGV4dA==\n",
+    )
+
+
+def platform_config() -> LTIPlatformConfig:
+    return LTIPlatformConfig(
+        PK="CONFIG#1234#https://blackboard.com#4567",
+        auth_token_url="www.example.org/token",
+        auth_login_url="www.example.org/login",
+        client_id="1234",
+        lti_deployment_id="4567",
+        iss="https://blackboard.com",
+        key_set_url="www.example.org/key/jwks.json",
+    )
+
+
+def jwk_record() -> JwkRecord:
+    return JwkRecord(PK="JWK#1", kid="1", kms_key_id="arn:aws:kms:key", public_key_pem="cGVt", ttl=1658684348)
+
+
+def test_codecs_match_type_serializer():
+    serializer = TypeSerializer()
+    for codec, record in (
+        (state_record_codec, state_record()),
+        (platform_config_codec, platform_config()),
+        (jwk_record_codec, jwk_record()),
+    ):
+        assert codec.encode(record) == serializer.serialize(record.dict())["M"]
+
+
+def test_codecs_round_trip():
+    for codec, record in (
+        (state_record_codec, state_record()),
+        (platform_config_codec, platform_config()),
+        (jwk_record_codec, jwk_record()),
+    ):
+        decoded = codec.decode(codec.encode(record))
+        assert isinstance(decoded, type(record))
+        assert decoded == record
+
+
+def test_codec_applies_defaults_for_missing_attributes():
+    item = platform_config_codec.encode(platform_config())
+    del item["learn_application_key"]
+    del item["learn_application_secret"]
+
+    decoded = platform_config_codec.decode(item)
+    assert decoded.learn_application_key is None
+    assert decoded.learn_application_secret is None
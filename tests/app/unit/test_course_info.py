@@ -0,0 +1,130 @@
+import os
+
+import boto3
+import pytest
+from botocore.client import BaseClient
+from flask import Flask
+from moto import mock_dynamodb
+from moto import mock_kms
+
+from app.models.course_info import CourseInfoCache
+from app.models.course_info import CourseInfoStorage
+from app.models.jwt import LTIJwtPayload
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from app.utility.aws import Singleton
+from app.utility.learn_client import LearnClient
+from benchmarks.environment import COURSE_UUID
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import learn_routes
+from benchmarks.environment import tool_platform
+
+
+@pytest.fixture(scope="function")
+def aws(monkeypatch):
+    with mock_dynamodb(), mock_kms():
+        dynamodb = boto3.client("dynamodb")
+        dynamodb.create_table(
+            TableName=os.getenv("TABLE_NAME"),
+            BillingMode="PAY_PER_REQUEST",
+            AttributeDefinitions=[
+                {"AttributeName": "PK", "AttributeType": "S"},
+            ],
+            KeySchema=[
+                {"AttributeName": "PK", "KeyType": "HASH"},
+            ],
+        )
+        monkeypatch.setenv("KMS_SYMMETRIC_KEY_ID", boto3.client("kms").create_key()["KeyMetadata"]["KeyId"])
+        yield dynamodb
+
+
+@pytest.fixture(scope="function")
+def state(aws):
+    state = LTIState(LTIStateStorage())
+    state.record.set_platform_learn_rest_token("learn-token")
+    return state.save()
+
+
+@pytest.fixture(scope="function")
+def learn():
+    with HttpStub(learn_routes()) as learn:
+        yield learn
+
+
+@pytest.fixture(scope="function")
+def jwt_request(learn):
+    return LTIJwtPayload(PlatformKeys().id_token("nonce", **tool_platform(learn.url)))
+
+
+@pytest.fixture(scope="function")
+def aws_calls(monkeypatch):
+    calls = []
+    make_api_call = BaseClient._make_api_call
+
+    def record(client, operation_name, api_params):
+        calls.append(operation_name)
+        return make_api_call(client, operation_name, api_params)
+
+    monkeypatch.setattr(BaseClient, "_make_api_call", record)
+    return calls
+
+
+def course_info(jwt_request, state_id):
+    with Flask(__name__).test_request_context():
+        return LearnClient().get_course_info(jwt_request, state_id)
+
+
+def test_repeat_launches_are_served_from_the_cache(jwt_request, state, learn, aws_calls):
+    assert course_info(jwt_request, state.record.id)["uuid"] == COURSE_UUID
+    assert aws_calls == ["GetItem", "Decrypt"]
+
+    for _ in range(3):
+        assert course_info(jwt_request, state.record.id)["uuid"] == COURSE_UUID
+    assert aws_calls == ["GetItem", "Decrypt"]
+    assert learn.requests == {f"GET /learn/api/public/v2/courses/uuid:{COURSE_UUID}": 1}
+
+
+def test_stale_entries_are_revalidated(jwt_request, state, learn, monkeypatch):
+    monkeypatch.setenv("COURSE_INFO_TTL", "0")
+    first = course_info(jwt_request, state.record.id)
+    assert course_info(jwt_request, state.record.id) == first
+
+    cached = CourseInfoCache(CourseInfoStorage()).get(learn.url, COURSE_UUID)
+    assert cached.etag == '"1"'
+    assert sum(learn.requests.values()) == 2
+
+
+def test_stale_entry_is_served_when_learn_fails(jwt_request, state, learn, monkeypatch):
+    monkeypatch.setenv("COURSE_INFO_TTL", "0")
+    first = course_info(jwt_request, state.record.id)
+    learn.routes.clear()
+
+    assert course_info(jwt_request, state.record.id) == first
+
+
+def test_no_learn_token_no_call(jwt_request, aws, learn):
+    state = LTIState(LTIStateStorage()).save()
+
+    assert course_info(jwt_request, state.record.id) == {}
+    assert sum(learn.requests.values()) == 0
+
+
+def test_memory_cap_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setenv("COURSE_INFO_CACHE_BYTES", "100")
+    cache = CourseInfoCache(CourseInfoStorage())
+    for course in range(5):
+        cache.put("https://learn", str(course), "x" * 40, None, None)
+
+    assert cache.get("https://learn", "0") is None
+    assert cache.get("https://learn", "4").body == "x" * 40
+
+
+def test_shared_cache(jwt_request, state, learn, monkeypatch):
+    monkeypatch.setenv("COURSE_INFO_SHARED", "true")
+    first = course_info(jwt_request, state.record.id)
+
+    # another instance starts with an empty cache
+    Singleton._instances.pop(CourseInfoCache, None)
+    assert course_info(jwt_request, state.record.id) == first
+    assert sum(learn.requests.values()) == 1
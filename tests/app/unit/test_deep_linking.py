@@ -0,0 +1,81 @@
+import os
+
+import jwt
+import pytest
+
+from app import create_app
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import local_aws
+from benchmarks.environment import local_kms_sign
+
+CONTENT_ITEMS = "https://purl.imsglobal.org/spec/lti-dl/claim/content_items"
+MESSAGE_TYPE = "https://purl.imsglobal.org/spec/lti/claim/message_type"
+SETTINGS = "https://purl.imsglobal.org/spec/lti-dl/claim/deep_linking_settings"
+
+
+@pytest.fixture(scope="function")
+def deep_linking(monkeypatch):
+    monkeypatch.setenv("KMS_SYMMETRIC_KEY_ID", os.getenv("KMS_SYMMETRIC_KEY_ID", "placeholder"))
+    keys = PlatformKeys()
+    with local_aws(), local_kms_sign(keys) as kms_calls:
+        client = create_app().test_client()
+
+        def post(accept_multiple=True, **form):
+            settings = dict(deep_link_return_url="https://learn/deep_link_return", data="csrf", accept_multiple=True)
+            settings["accept_multiple"] = accept_multiple
+            claims = {MESSAGE_TYPE: "LtiDeepLinkingRequest", SETTINGS: settings}
+            state = LTIState(LTIStateStorage())
+            state.record.id_token = keys.id_token("nonce", **claims)
+            state.save()
+            client.set_cookie("localhost", "state", state.record.id)
+            return client.post("/create_assignment", data=dict(state=state.record.id, **form))
+
+        yield post, keys, kms_calls
+
+
+def response_jwt(response, keys: PlatformKeys) -> dict:
+    html = response.get_data(as_text=True)
+    token = html.split('name="JWT" value="')[1].split('"')[0]
+    public_key = jwt.algorithms.RSAAlgorithm.from_jwk(keys.jwks["keys"][0])
+    return jwt.decode(token, public_key, algorithms=["RS256"], options={"verify_aud": False})
+
+
+def test_create_assignments_signs_one_response(deep_linking):
+    post, keys, kms_calls = deep_linking
+    names = [f"Assignment {i}" for i in range(20)]
+
+    response = post(name=names, points=[str(i + 1) for i in range(20)])
+
+    assert response.status_code == 200
+    assert kms_calls["Sign"] == 1
+    assert 'action="https://learn/deep_link_return"' in response.get_data(as_text=True)
+    claims = response_jwt(response, keys)
+    items = claims[CONTENT_ITEMS]
+    assert [item["title"] for item in items] == names
+    assert [item["lineItem"]["scoreMaximum"] for item in items] == [float(i + 1) for i in range(20)]
+    assert len({item["lineItem"]["resourceId"] for item in items}) == 20
+    assert claims["https://purl.imsglobal.org/spec/lti-dl/claim/data"] == "csrf"
+
+
+def test_create_assignment_skips_blank_rows(deep_linking):
+    post, keys, _ = deep_linking
+
+    response = post(name=["Essay", ""], points=["10", ""])
+
+    assert response.status_code == 200
+    assert [item["title"] for item in response_jwt(response, keys)[CONTENT_ITEMS]] == ["Essay"]
+
+
+def test_create_assignments_validates(deep_linking):
+    post, _, kms_calls = deep_linking
+
+    assert post(name=["Essay"], points=["ten"]).status_code == 400
+    assert post(name=[""], points=["10"]).status_code == 400
+    assert post(name=[""], points=[""]).status_code == 400
+    for points in ("nan", "inf", "1e400"):
+        assert post(name=["Essay"], points=[points]).status_code == 400
+    assert post(name=["Essay", "Quiz"], points=["10"]).status_code == 400
+    assert post(accept_multiple=False, name=["Essay", "Quiz"], points=["10", "5"]).status_code == 400
+    assert kms_calls["Sign"] == 0
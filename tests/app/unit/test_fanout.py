@@ -0,0 +1,98 @@
+import time
+
+import pytest
+import requests
+from flask import Flask
+from flask import g
+
+from app.utility.fanout import FanOut
+from app.utility.fanout import PhaseTimings
+from app.utility.fanout import deadline
+from app.utility.fanout import remaining
+from app.utility.http_client import HttpClient
+from benchmarks.environment import HttpStub
+
+
+def sleeper(seconds: float, result=None):
+    def step():
+        time.sleep(seconds)
+        return result
+
+    return step
+
+
+def test_steps_run_concurrently():
+    timings = PhaseTimings()
+    start = time.perf_counter()
+    results = FanOut().run(dict(a=sleeper(0.1, 1), b=sleeper(0.1, 2), c=sleeper(0.1, 3)), timings)
+    elapsed = time.perf_counter() - start
+
+    assert results == dict(a=1, b=2, c=3)
+    assert elapsed < 0.2
+    assert set(timings.phases) == {"a", "b", "c"}
+    assert all(ms >= 100 for ms in timings.phases.values())
+
+
+def test_steps_run_one_after_another_without_workers(monkeypatch):
+    monkeypatch.setenv("FANOUT_MAX_WORKERS", "0")
+    start = time.perf_counter()
+    FanOut().run(dict(a=sleeper(0.05), b=sleeper(0.05)), PhaseTimings())
+
+    assert time.perf_counter() - start >= 0.1
+
+
+def test_first_failure_is_raised_once_every_step_is_done():
+    done = []
+
+    def fail(message: str, after: float):
+        def step():
+            time.sleep(after)
+            done.append(message)
+            raise Exception(message)
+
+        return step
+
+    with pytest.raises(Exception, match="first"):
+        FanOut().run(dict(a=fail("first", 0.05), b=fail("second", 0), c=sleeper(0.1)), PhaseTimings())
+    assert sorted(done) == ["first", "second"]
+
+
+def test_deadline_stops_waiting():
+    with deadline(0.05):
+        with pytest.raises(TimeoutError, match="slow"):
+            FanOut().run(dict(fast=sleeper(0), slow=sleeper(0.5)), PhaseTimings())
+
+
+def test_nested_deadline_keeps_the_earliest():
+    assert remaining() is None
+    with deadline(0.1):
+        with deadline(10):
+            assert remaining() <= 0.1
+    assert remaining() is None
+
+
+def test_steps_share_the_request_context():
+    application = Flask(__name__)
+    with application.test_request_context("/launch"):
+        g.repository = object()
+        with deadline(5):
+            results = FanOut().run(dict(a=lambda: (g.repository, remaining()), b=lambda: g.repository))
+
+        assert results["a"][0] is g.repository
+        assert results["b"] is g.repository
+        assert 0 < results["a"][1] <= 5
+        assert set(g.phase_timings.phases) == {"a", "b"}
+
+
+def test_http_timeouts_are_cut_to_the_deadline(monkeypatch):
+    monkeypatch.setenv("HTTP_MAX_RETRIES", "3")
+    with HttpStub({"/slow": lambda request: (200, {}, b"")}, delay=0.5) as stub:
+        start = time.perf_counter()
+        with deadline(0.1):
+            with pytest.raises(requests.Timeout):
+                HttpClient().get(f"{stub.url}/slow")
+        elapsed = time.perf_counter() - start
+
+    # one attempt cut to the deadline, no retry after it
+    assert elapsed < 0.3
+    assert stub.requests["GET /slow"] == 1
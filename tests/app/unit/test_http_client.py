@@ -0,0 +1,75 @@
+import pytest
+import requests
+
+from app.utility.http_client import HttpClient
+from benchmarks.environment import HttpStub
+
+
+@pytest.fixture(scope="function")
+def no_backoff(monkeypatch):
+    monkeypatch.setenv("HTTP_BACKOFF", "0")
+    monkeypatch.setenv("HTTP_MAX_RETRIES", "2")
+
+
+def responses(*statuses):
+    remaining = list(statuses)
+    return lambda request: (remaining.pop(0) if len(remaining) > 1 else remaining[0], {}, {"ok": True})
+
+
+def test_connections_are_reused():
+    with HttpStub({"/course": lambda request: (200, {}, {"id": "_1_1"})}) as stub:
+        client = HttpClient()
+        for _ in range(5):
+            assert client.get(f"{stub.url}/course").json() == {"id": "_1_1"}
+
+    assert stub.connections == 1
+
+
+def test_idempotent_requests_are_retried(no_backoff):
+    with HttpStub({"/course": responses(503, 502, 200)}) as stub:
+        response = HttpClient().get(f"{stub.url}/course")
+
+    assert response.status_code == 200
+    assert stub.requests["GET /course"] == 3
+
+
+def test_retries_are_bounded(no_backoff):
+    with HttpStub({"/course": responses(503)}) as stub:
+        response = HttpClient().get(f"{stub.url}/course")
+
+    assert response.status_code == 503
+    assert stub.requests["GET /course"] == 3
+
+
+def test_post_is_not_retried(no_backoff):
+    with HttpStub({"/token": responses(503, 200)}) as stub:
+        response = HttpClient().post(f"{stub.url}/token", data={"grant_type": "client_credentials"})
+
+    assert response.status_code == 503
+    assert stub.requests["POST /token"] == 1
+
+
+def test_read_timeout(monkeypatch):
+    monkeypatch.setenv("HTTP_READ_TIMEOUT", "0.1")
+    monkeypatch.setenv("HTTP_MAX_RETRIES", "0")
+    with HttpStub({"/course": responses(200)}, delay=0.5) as stub:
+        with pytest.raises(requests.Timeout):
+            HttpClient().get(f"{stub.url}/course")
+
+
+def test_cookies_are_not_shared():
+    with HttpStub({"/course": lambda request: (200, {"Set-Cookie": "session=user-1; Path=/"}, {})}) as stub:
+        client = HttpClient()
+        client.get(f"{stub.url}/course")
+
+    assert len(client.session.cookies) == 0
+
+
+def test_backoff(monkeypatch):
+    monkeypatch.setenv("HTTP_BACKOFF", "0.1")
+    monkeypatch.setenv("HTTP_BACKOFF_MAX", "2")
+    client = HttpClient()
+
+    assert all(0 <= client.backoff(attempt) <= min(0.1 * 2**attempt, 2) for attempt in range(6) for _ in range(20))
+    assert client.backoff(0, retry_after="1") == 1
+    assert client.backoff(0, retry_after="120") == 2
@@ -0,0 +1,9 @@
+from benchmarks.import_time import deferred_violations
+from benchmarks.import_time import import_times
+from benchmarks.import_time import load_budget
+
+
+def test_deferred_modules_are_imported_on_first_use():
+    budget = load_budget()
+
+    assert deferred_violations(budget, import_times(budget["module"])) == []
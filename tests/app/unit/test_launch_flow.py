@@ -0,0 +1,26 @@
+from benchmarks.launch_flow import STEPS
+from benchmarks.launch_flow import load_baseline
+from benchmarks.launch_flow import measure
+from benchmarks.launch_flow import violations
+
+
+def test_launch_flow_aws_calls_within_baseline():
+    baseline = load_baseline()
+    results = measure(launches=3, allocation_launches=1)
+
+    assert list(results) == list(STEPS) == list(baseline["steps"])
+    assert violations(baseline, results, timings=False) == []
+
+
+def test_regressions_are_reported():
+    baseline = load_baseline()
+    results = {
+        step: dict(expected, aws_calls=dict(expected["aws_calls"])) for step, expected in baseline["steps"].items()
+    }
+    results["/login"]["aws_calls"]["dynamodb:GetItem"] += 1
+    results["/launch"]["p50_ms"] = baseline["steps"]["/launch"]["p50_ms"] * 3
+
+    assert violations(baseline, results) == [
+        "/login makes 2 dynamodb:GetItem calls, baseline 1",
+        f"/launch p50_ms is {results['/launch']['p50_ms']:g}, baseline {baseline['steps']['/launch']['p50_ms']:g}",
+    ]
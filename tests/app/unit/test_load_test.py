@@ -0,0 +1,68 @@
+import os
+import threading
+from unittest.mock import patch
+
+import boto3
+import pytest
+import requests
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from app.models.tool_config import LTITool
+from app.models.tool_config import LTIToolStorage
+from benchmarks.environment import TOOL_URL
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.load_test import aws_forwarder
+from benchmarks.load_test import stand_in_routes
+from benchmarks.memory_aws import memory_aws
+
+
+@pytest.fixture(scope="function")
+def forwarded():
+    """
+    The AWS calls of the test forwarded to the stand-ins, like those of a load test's gunicorn worker.
+    """
+    with memory_aws() as memory, HttpStub(stand_in_routes(memory, PlatformKeys().jwks)) as stub:
+        with patch.object(BaseClient, "_make_api_call", aws_forwarder(stub.url)):
+            yield memory
+
+
+def test_aws_calls_are_answered_by_the_stand_ins(forwarded):
+    assert LTITool(LTIToolStorage()).config.url == TOOL_URL
+
+    state = LTIState(LTIStateStorage()).save()
+    loaded = LTIState(LTIStateStorage()).load(state.record.id)
+
+    assert loaded.record.nonce == state.record.nonce
+    assert forwarded.calls["ssm:GetParameter"] == 3
+    assert forwarded.calls["dynamodb:GetItem"] == 1
+
+
+def test_errors_are_raised_in_the_worker(forwarded):
+    state = LTIState(LTIStateStorage()).save()
+    replayed = LTIState(LTIStateStorage()).load(state.record.id)
+
+    assert state.validate_and_save(state.record.nonce)
+    # the conditional put of the second launch with the same nonce fails in the stand-ins
+    assert not replayed.validate_and_save(state.record.nonce)
+    with pytest.raises(ClientError) as error:
+        boto3.client("ssm").get_parameter(Name="/missing")
+    assert error.value.response["Error"]["Code"] == "ParameterNotFound"
+
+
+def test_connections_to_the_stand_ins_are_pooled_and_calls_counted():
+    with memory_aws() as memory, HttpStub(stand_in_routes(memory, PlatformKeys().jwks)) as stub:
+        with patch.object(BaseClient, "_make_api_call", aws_forwarder(stub.url)):
+            ssm = boto3.client("ssm")
+            name = os.getenv("LTI_TOOLING_API_URL_KEY")
+            for _ in range(3):
+                thread = threading.Thread(target=ssm.get_parameter, kwargs=dict(Name=name))
+                thread.start()
+                thread.join()
+
+        assert stub.connections == 1
+        calls = requests.get(f"{stub.url}/calls").json()
+        assert calls == {f"ssm:GetParameter {name}": 3}
@@ -0,0 +1,119 @@
+import json
+import os
+import time
+
+import pytest
+
+from app import create_app
+from app.utility.metrics import MAX_VALUES
+from app.utility.metrics import Metrics
+from app.utility.metrics import bucket
+from app.utility.metrics import flush_after
+from app.utility.token_client import BearerTokenCache
+from benchmarks.environment import local_aws
+
+
+@pytest.fixture(scope="function")
+def aws(monkeypatch):
+    monkeypatch.setenv("KMS_SYMMETRIC_KEY_ID", os.getenv("KMS_SYMMETRIC_KEY_ID", "placeholder"))
+    with local_aws() as dynamodb:
+        yield dynamodb
+
+
+def documents(output: str) -> list:
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+
+
+def metric_names(document: dict) -> list:
+    return [metric["Name"] for metric in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+
+
+def test_request_latency_and_aws_calls(aws, monkeypatch, capsys):
+    monkeypatch.setenv("METRICS", "true")
+    client = create_app().test_client()
+
+    for _ in range(3):
+        assert client.get("/jwks.json").status_code == 200
+    Metrics().flush()
+
+    emitted = documents(capsys.readouterr().out)
+    latency = next(d for d in emitted if "Latency" in d)
+    assert latency["Route"] == "GET /jwks.json"
+    assert len(latency["Latency"]) == 3
+    assert latency["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "LtiTool"
+    assert latency["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Route"]]
+    calls = next(d for d in emitted if d.get("AwsService") == "dynamodb")
+    assert (calls["Operation"], calls["AwsCalls"]) == ("Scan", 1)
+    assert calls["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["AwsService"], ["AwsService", "Operation"]]
+    cache = next(d for d in emitted if d.get("Cache") == "ToolConfig")
+    assert (cache["CacheHits"], cache["CacheMisses"]) == (2, 1)
+
+
+def test_flush_once_per_invocation(monkeypatch, capsys):
+    monkeypatch.setenv("METRICS", "true")
+
+    @flush_after
+    def handler(event, context):
+        Metrics().latency("GET /", 12.34)
+        Metrics().aws_call("kms", "Sign")
+        return "done"
+
+    assert handler({}, None) == "done"
+    first = documents(capsys.readouterr().out)
+    assert handler({}, None) == "done"
+    second = documents(capsys.readouterr().out)
+
+    for emitted in (first, second):
+        assert [d["Latency"] for d in emitted if "Latency" in d] == [[12.0]]
+        kms = next(d for d in emitted if "AwsCalls" in d)
+        assert (kms["AwsService"], kms["Operation"], kms["AwsCalls"]) == ("kms", "Sign", 1)
+
+
+def test_cache_hits_and_misses(monkeypatch, capsys):
+    monkeypatch.setenv("METRICS", "true")
+
+    for _ in range(3):
+        BearerTokenCache().get(("token", "client"), lambda: ("token", 3600))
+    Metrics().flush()
+
+    cache = next(d for d in documents(capsys.readouterr().out) if d.get("Cache") == "BearerToken")
+    assert (cache["CacheHits"], cache["CacheMisses"]) == (2, 1)
+    assert metric_names(cache) == ["CacheHits", "CacheMisses"]
+
+
+def test_latency_histogram(monkeypatch):
+    monkeypatch.setenv("METRICS", "true")
+    metrics = Metrics()
+
+    for i in range(250):
+        metrics.latency("POST /launch", 100 + i % 7)
+    emitted = metrics.documents()
+
+    assert [len(d["Latency"]) for d in emitted] == [MAX_VALUES, MAX_VALUES, 50]
+    assert {value for d in emitted for value in d["Latency"]} == {100.0, 110.0}
+    assert bucket(0.1234) == 0.12
+    assert bucket(1234) == 1200
+    assert metrics.documents() == []
+
+
+def test_disabled_by_default(aws, capsys):
+    client = create_app().test_client()
+
+    client.get("/jwks.json")
+    BearerTokenCache().get(("token", "client"), lambda: ("token", 3600))
+    Metrics().flush()
+
+    assert documents(capsys.readouterr().out) == []
+
+
+def test_flush_on_an_interval(monkeypatch, capsys):
+    monkeypatch.setenv("METRICS", "true")
+    metrics = Metrics()
+    metrics.start(0.05)
+
+    metrics.aws_call("dynamodb", "GetItem")
+    time.sleep(0.2)
+    metrics.stop()
+
+    calls = [d for d in documents(capsys.readouterr().out) if "AwsCalls" in d]
+    assert [(d["Operation"], d["AwsCalls"]) for d in calls] == [("GetItem", 1)]
@@ -0,0 +1,140 @@
+import os
+from unittest.mock import patch
+
+import boto3
+import pytest
+from moto import mock_dynamodb
+
+from app.models.jwt import LTIJwtPayload
+from app.models.membership_sync import MembershipSync
+from app.models.membership_sync import MembershipSyncStorage
+from app.utility.nrps_client import MEMBERSHIP_CONTAINER
+from app.utility.nrps_client import NrpsClient
+from app.utility.token_client import TokenClient
+from benchmarks.environment import COURSE_UUID
+from benchmarks.environment import HttpStub
+from benchmarks.environment import nrps_routes
+
+
+@pytest.fixture(scope="function")
+def dynamodb():
+    with mock_dynamodb():
+        dynamodb = boto3.client("dynamodb")
+        dynamodb.create_table(
+            TableName=os.getenv("TABLE_NAME"),
+            BillingMode="PAY_PER_REQUEST",
+            AttributeDefinitions=[
+                {"AttributeName": "PK", "AttributeType": "S"},
+            ],
+            KeySchema=[
+                {"AttributeName": "PK", "KeyType": "HASH"},
+            ],
+        )
+        yield dynamodb
+
+
+@pytest.fixture(scope="function")
+def bearer_token():
+    with patch.object(TokenClient, "request_bearer_token", return_value="token") as request_bearer_token:
+        with patch.object(TokenClient, "invalidate_bearer_token"):
+            yield request_bearer_token
+
+
+def test_members_are_yielded_across_pages(bearer_token):
+    with HttpStub(nrps_routes(25)) as stub:
+        client = NrpsClient(platform=None, tool=None, page_size=10)
+        members = client.members(f"{stub.url}/nrps/memberships")
+
+        assert next(members)["user_id"] == "user-0"
+        assert stub.requests["GET /nrps/memberships"] == 1
+        assert [m["user_id"] for m in members] == [f"user-{i}" for i in range(1, 25)]
+        assert stub.requests["GET /nrps/memberships"] == 3
+
+    bearer_token.assert_called_once()
+    assert client.differences_url == f"{stub.url}/nrps/memberships/differences?since=25"
+
+
+def test_requests_are_authorized(bearer_token):
+    headers = []
+
+    def roster(request):
+        headers.append(dict(request.headers))
+        return 200, {}, {"members": []}
+
+    with HttpStub({"/nrps": roster}) as stub:
+        assert list(NrpsClient(platform=None, tool=None).members(f"{stub.url}/nrps", role="Learner")) == []
+
+    assert headers[0]["Authorization"] == "Bearer token"
+    assert headers[0]["Accept"] == MEMBERSHIP_CONTAINER
+
+
+def test_expired_token_is_renewed(bearer_token):
+    statuses = [401, 200]
+
+    def roster(request):
+        return statuses.pop(0), {}, {"members": [{"user_id": "user-0"}]}
+
+    with HttpStub({"/nrps": roster}) as stub:
+        assert len(list(NrpsClient(platform=None, tool=None).members(f"{stub.url}/nrps"))) == 1
+
+    assert bearer_token.call_count == 2
+
+
+def test_sync_reads_differences_after_the_first_sync(dynamodb, bearer_token):
+    with HttpStub(nrps_routes(15, changes=2)) as stub:
+        jwt_request = LTIJwtPayload(
+            iss="https://blackboard.com",
+            context_id=COURSE_UUID,
+            context_memberships_url=f"{stub.url}/nrps/memberships",
+        )
+        client = NrpsClient(platform=None, tool=None, page_size=10)
+
+        assert len(list(client.sync(jwt_request))) == 15
+        sync = MembershipSync(MembershipSyncStorage()).load(jwt_request.iss, COURSE_UUID)
+        assert sync.record.differences_url == f"{stub.url}/nrps/memberships/differences?since=15"
+
+        assert [m["status"] for m in client.sync(jwt_request)] == ["Deleted", "Deleted"]
+        sync = MembershipSync(MembershipSyncStorage()).load(jwt_request.iss, COURSE_UUID)
+        assert sync.record.differences_url == f"{stub.url}/nrps/memberships/differences?since=17"
+
+
+def test_role_filtered_sync_keeps_its_own_differences(dynamodb, bearer_token):
+    with HttpStub(nrps_routes(15, changes=2)) as stub:
+        jwt_request = LTIJwtPayload(
+            iss="https://blackboard.com",
+            context_id=COURSE_UUID,
+            context_memberships_url=f"{stub.url}/nrps/memberships",
+        )
+        client = NrpsClient(platform=None, tool=None, page_size=10)
+
+        list(client.sync(jwt_request, role="Learner"))
+
+        assert MembershipSync(MembershipSyncStorage()).load(jwt_request.iss, COURSE_UUID).record.differences_url is None
+        assert len(list(client.sync(jwt_request))) == 15
+        sync = MembershipSync(MembershipSyncStorage()).load(jwt_request.iss, COURSE_UUID, "Learner")
+        assert sync.record.differences_url is not None
+
+
+def test_interrupted_sync_keeps_the_previous_differences(dynamodb, bearer_token):
+    with HttpStub(nrps_routes(15)) as stub:
+        jwt_request = LTIJwtPayload(
+            iss="https://blackboard.com",
+            context_id=COURSE_UUID,
+            context_memberships_url=f"{stub.url}/nrps/memberships",
+        )
+        members = NrpsClient(platform=None, tool=None, page_size=10).sync(jwt_request)
+        next(members)
+        members.close()
+
+    sync = MembershipSync(MembershipSyncStorage()).load(jwt_request.iss, COURSE_UUID)
+    assert sync.record.differences_url is None
+
+
+def test_storage_errors_are_reported(dynamodb):
+    dynamodb.delete_table(TableName=os.getenv("TABLE_NAME"))
+    sync = MembershipSync(MembershipSyncStorage())
+
+    with pytest.raises(Exception, match="Error retrieving membership sync"):
+        sync.load("https://blackboard.com", COURSE_UUID)
+    with pytest.raises(Exception, match="Error persisting membership sync"):
+        sync.save()
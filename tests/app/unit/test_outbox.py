@@ -0,0 +1,228 @@
+import json
+import os
+import sqlite3
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app
+from app import wsgi
+from app.models.outbox import DUE_INDEX
+from app.models.outbox import FAILED
+from app.models.outbox import PENDING
+from app.models.outbox import OutboxRecord
+from app.models.outbox import OutboxStorage
+from app.models.outbox import SqliteOutboxStorage
+from app.models.outbox import outbox_record_codec
+from app.models.outbox import outbox_storage
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from app.utility.ags_client import AgsClient
+from app.utility.outbox_worker import OutboxWorker
+from app.utility.token_client import TokenClient
+from benchmarks.environment import CLIENT_ID
+from benchmarks.environment import DEPLOYMENT_ID
+from benchmarks.environment import ISS
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import local_aws
+
+
+@pytest.fixture(scope="function")
+def aws(monkeypatch):
+    # local_aws sets the KMS key of its moto account, restore the environment afterwards
+    monkeypatch.setenv("KMS_SYMMETRIC_KEY_ID", os.getenv("KMS_SYMMETRIC_KEY_ID", "placeholder"))
+    monkeypatch.setenv("HTTP_MAX_RETRIES", "0")
+    with local_aws() as dynamodb:
+        yield dynamodb
+
+
+@pytest.fixture(scope="function", params=["dynamodb", "sqlite"])
+def storage(request, aws, tmp_path, monkeypatch):
+    monkeypatch.setenv("OUTBOX_BACKEND", request.param)
+    monkeypatch.setenv("OUTBOX_SQLITE_PATH", str(tmp_path.joinpath("outbox.sqlite3")))
+    return outbox_storage()
+
+
+@pytest.fixture(scope="function")
+def bearer_token():
+    with patch.object(TokenClient, "request_bearer_token", return_value="token"):
+        yield
+
+
+def scores_stub(statuses: dict):
+    received = []
+
+    def scores(request):
+        score = json.loads(request.body)
+        received.append(score)
+        return statuses.get(score["userId"], 200), {}, b""
+
+    return HttpStub({"/lineitems/1/scores": scores}), received
+
+
+def record(id: str, lineitem_url: str, user_id: str = "user-1") -> OutboxRecord:
+    now = time.time()
+    return OutboxRecord(
+        id=id,
+        client_id=CLIENT_ID,
+        iss=ISS,
+        lti_deployment_id=DEPLOYMENT_ID,
+        lineitem_url=lineitem_url,
+        score=json.dumps(AgsClient.score(user_id, 1, 3)),
+        created_at_ms=int(now * 1000),
+        next_attempt_at=int(now),
+    )
+
+
+def test_append_is_idempotent(storage):
+    assert storage.append(record("submission-1", "https://learn/lineitems/1"))
+    assert not storage.append(record("submission-1", "https://learn/lineitems/1"))
+
+    assert [r.id for r in storage.claim_due(10, lease=60)] == ["submission-1"]
+
+
+def test_claimed_records_are_not_claimed_twice(storage):
+    for i in range(3):
+        storage.append(record(f"submission-{i}", "https://learn/lineitems/1"))
+
+    first = storage.claim_due(2, lease=60)
+    second = storage.claim_due(10, lease=60)
+
+    assert len(first) == 2
+    assert len(second) == 1
+    assert {r.id for r in first + second} == {"submission-0", "submission-1", "submission-2"}
+    assert storage.claim_due(10, lease=60) == []
+
+
+def test_drain_publishes_and_deletes(storage, bearer_token):
+    stub, received = scores_stub({})
+    with stub:
+        for i in range(5):
+            storage.append(record(f"submission-{i}", f"{stub.url}/lineitems/1", user_id=f"user-{i}"))
+        report = OutboxWorker(storage).drain()
+
+    assert report.published == 5
+    assert len(report.lag) == 5
+    assert sorted(score["userId"] for score in received) == [f"user-{i}" for i in range(5)]
+    assert storage.claim_due(10, lease=60) == []
+
+
+def test_drain_retries_and_fails(storage, bearer_token, monkeypatch):
+    monkeypatch.setenv("OUTBOX_MAX_ATTEMPTS", "2")
+    stub, _ = scores_stub({"user-retry": 503, "user-refused": 400})
+    with stub:
+        storage.append(record("retry", f"{stub.url}/lineitems/1", user_id="user-retry"))
+        storage.append(record("refused", f"{stub.url}/lineitems/1", user_id="user-refused"))
+        report = OutboxWorker(storage).drain()
+
+    assert (report.published, report.retried, report.failed) == (0, 1, 1)
+    # the retry is scheduled in the future
+    assert storage.claim_due(10, lease=60) == []
+
+
+def test_retries_run_out(storage, bearer_token, monkeypatch):
+    monkeypatch.setenv("OUTBOX_MAX_ATTEMPTS", "1")
+    stub, _ = scores_stub({"user-retry": 503})
+    with stub:
+        storage.append(record("retry", f"{stub.url}/lineitems/1", user_id="user-retry"))
+        report = OutboxWorker(storage).drain()
+
+    assert report.failed == 1
+    assert storage.claim_due(10, lease=60) == []
+
+
+def test_submit_assignment_appends_to_the_outbox(aws, bearer_token):
+    stub, received = scores_stub({})
+    with stub:
+        endpoint = {"https://purl.imsglobal.org/spec/lti-ags/claim/endpoint": {"lineitem": f"{stub.url}/lineitems/1"}}
+        state = LTIState(LTIStateStorage())
+        state.record.id_token = PlatformKeys().id_token("nonce", **endpoint)
+        state.save()
+
+        client = create_app().test_client()
+        client.set_cookie("localhost", "state", state.record.id)
+        form = dict(state=state.record.id, submission="submission-1", ackOauth="on", ackREST="on")
+        assert client.post("/submit_assignment", data=form).status_code == 200
+        assert client.post("/submit_assignment", data=form).status_code == 200
+        assert received == []
+
+        report = OutboxWorker(OutboxStorage()).drain()
+
+    assert report.published == 1
+    assert received[0]["scoreGiven"] == 2
+    assert received[0]["scoreMaximum"] == 3
+
+
+def test_outbox_handler_publishes_stream_records(aws, bearer_token):
+    stub, received = scores_stub({})
+    with stub:
+        item = record("submission-1", f"{stub.url}/lineitems/1")
+        OutboxStorage().append(item)
+        event = {"Records": [{"eventName": "INSERT", "dynamodb": {"NewImage": outbox_record_codec.encode(item)}}]}
+
+        assert wsgi.outbox_handler(event, None) == {"published": 1, "retried": 0, "failed": 0}
+        # a record that has been published is gone and not published again
+        assert wsgi.outbox_handler(event, None) == {"published": 0, "retried": 0, "failed": 0}
+
+    assert len(received) == 1
+
+
+def test_failed_records_are_kept(tmp_path, bearer_token):
+    storage = SqliteOutboxStorage(str(tmp_path.joinpath("outbox.sqlite3")))
+    failed = record("failed", "https://learn/lineitems/1")
+    storage.append(failed)
+    failed.status = FAILED
+    storage.update(failed)
+
+    assert storage.claim_due(10, lease=60) == []
+
+
+def test_failed_records_are_pruned_after_their_ttl(tmp_path, monkeypatch):
+    monkeypatch.setenv("OUTBOX_TTL", "0")
+    storage = SqliteOutboxStorage(str(tmp_path.joinpath("outbox.sqlite3")))
+    for id, status in (("failed", FAILED), ("pending", PENDING)):
+        item = record(id, "https://learn/lineitems/1")
+        storage.append(item)
+        item.status = status
+        item.next_attempt_at = int(time.time()) + 3600
+        storage.update(item)
+
+    assert storage.prune(int(time.time())) == 1
+    assert storage.prune(int(time.time())) == 0
+
+
+def test_due_records_are_claimed_through_an_index(tmp_path):
+    path = tmp_path.joinpath("outbox.sqlite3")
+    SqliteOutboxStorage(str(path))
+
+    plan = sqlite3.connect(str(path)).execute(
+        "EXPLAIN QUERY PLAN SELECT record FROM outbox WHERE status = ? AND next_attempt_at <= ? "
+        "AND claimed_until < ? ORDER BY next_attempt_at LIMIT ?",
+        (PENDING, 0, 0, 1),
+    )
+
+    assert "USING INDEX outbox_due" in " ".join(row[-1] for row in plan)
+
+
+def test_an_outbox_of_another_user_or_mode_is_refused(tmp_path):
+    path = tmp_path.joinpath("outbox.sqlite3")
+    path.write_bytes(b"")
+    path.chmod(0o644)
+
+    with pytest.raises(Exception, match="Refusing"):
+        SqliteOutboxStorage(str(path))
+
+
+def test_only_pending_records_are_in_the_due_index(aws):
+    storage = OutboxStorage()
+    pending, failed = record("pending", "https://learn/lineitems/1"), record("failed", "https://learn/lineitems/1")
+    storage.append(pending)
+    storage.append(failed)
+    failed.status = FAILED
+    storage.update(failed)
+
+    index = aws.scan(TableName=os.getenv("TABLE_NAME"), IndexName=DUE_INDEX)["Items"]
+    assert [item["PK"]["S"] for item in index] == [OutboxStorage.key("pending")]
+    assert [r.id for r in storage.claim_due(10, lease=60)] == ["pending"]
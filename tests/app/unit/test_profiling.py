@@ -0,0 +1,83 @@
+import os
+import time
+
+import pytest
+from flask import Flask
+
+from app import create_app
+from app.utility.profiling import PROFILE_HEADER
+from app.utility.profiling import PROFILE_ID_HEADER
+from app.utility.profiling import ProfilingMiddleware
+from app.utility.profiling import sign
+from app.utility.profiling import verify
+from benchmarks.environment import local_aws
+
+SECRET = "profile-secret"
+
+
+@pytest.fixture(scope="function")
+def profiled(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILING", "true")
+    monkeypatch.setenv("PROFILE_SECRET", SECRET)
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("KMS_SYMMETRIC_KEY_ID", os.getenv("KMS_SYMMETRIC_KEY_ID", "placeholder"))
+    with local_aws():
+        yield create_app().test_client(), tmp_path
+
+
+def header(expires_in: int = 60) -> dict:
+    return {PROFILE_HEADER: sign(SECRET, int(time.time()) + expires_in)}
+
+
+def test_verify():
+    assert verify(SECRET, sign(SECRET, int(time.time()) + 60))
+    assert not verify(SECRET, sign(SECRET, int(time.time()) - 1))
+    assert not verify(SECRET, sign("other", int(time.time()) + 60))
+    assert not verify(None, sign(SECRET, int(time.time()) + 60))
+    assert not verify(SECRET, "garbage")
+
+
+def test_signed_request_is_profiled(profiled):
+    client, directory = profiled
+
+    response = client.get("/jwks.json", headers=header())
+
+    assert response.status_code == 200 and "keys" in response.json
+    id = response.headers[PROFILE_ID_HEADER]
+    report = directory.joinpath(f"{id}.txt").read_text()
+    assert '"path": "/jwks.json"' in report
+    assert "== pstats" in report and "config_controller.py" in report
+    assert "== allocations\npeak" in report
+    assert directory.joinpath(f"{id}.pstats").exists()
+
+    profiles = client.get("/debug/profiles", headers=header()).json
+    assert [profile["id"] for profile in profiles] == [id]
+    assert client.get(f"/debug/profiles/{id}", headers=header()).text == report
+
+
+def test_unsigned_requests_are_not_profiled(profiled):
+    client, directory = profiled
+
+    assert PROFILE_ID_HEADER not in client.get("/jwks.json").headers
+    assert PROFILE_ID_HEADER not in client.get("/jwks.json", headers=header(expires_in=-1)).headers
+    assert client.get("/debug/profiles").status_code == 404
+    assert list(directory.iterdir()) == []
+
+
+def test_sampled_requests(profiled, monkeypatch):
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PROFILE_MODE", "sample")
+    monkeypatch.setenv("PROFILE_SAMPLE_INTERVAL", "0.001")
+    client = create_app().test_client()
+
+    response = client.get("/jwks.json")
+
+    report = profiled[1].joinpath(f"{response.headers[PROFILE_ID_HEADER]}.txt").read_text()
+    assert "== samples" in report
+
+
+def test_disabled_by_default():
+    application = create_app()
+
+    assert not isinstance(application.wsgi_app, ProfilingMiddleware)
+    assert application.wsgi_app.__func__ is Flask.wsgi_app
@@ -0,0 +1,106 @@
+import os
+
+import boto3
+import pytest
+from botocore.client import BaseClient
+from flask import Flask
+from moto import mock_dynamodb
+
+from app.models.platform_config import LTIPlatform
+from app.models.platform_config import LTIPlatformConfig
+from app.models.platform_config import LTIPlatformStorage
+from app.models.repository import LTIRepository
+from app.models.repository import lti_repository
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+
+PLATFORM = ("1234", "https://blackboard.com", "4567")
+
+
+@pytest.fixture(scope="function")
+def dynamodb():
+    with mock_dynamodb():
+        dynamodb = boto3.client("dynamodb")
+        dynamodb.create_table(
+            TableName=os.getenv("TABLE_NAME"),
+            BillingMode="PAY_PER_REQUEST",
+            AttributeDefinitions=[
+                {"AttributeName": "PK", "AttributeType": "S"},
+            ],
+            KeySchema=[
+                {"AttributeName": "PK", "KeyType": "HASH"},
+            ],
+        )
+        yield dynamodb
+
+
+@pytest.fixture(scope="function")
+def platform(dynamodb):
+    config = LTIPlatformConfig(
+        PK="",
+        auth_token_url="www.example.org/token",
+        auth_login_url="www.example.org/login",
+        client_id=PLATFORM[0],
+        iss=PLATFORM[1],
+        lti_deployment_id=PLATFORM[2],
+        key_set_url="www.example.org/key/jwks.json",
+    )
+    return LTIPlatform(LTIPlatformStorage(), config=config).save()
+
+
+@pytest.fixture(scope="function")
+def aws_calls(monkeypatch):
+    calls = []
+    make_api_call = BaseClient._make_api_call
+
+    def record(client, operation_name, api_params):
+        calls.append(operation_name)
+        return make_api_call(client, operation_name, api_params)
+
+    monkeypatch.setattr(BaseClient, "_make_api_call", record)
+    return calls
+
+
+def test_prefetch_reads_state_and_platform_in_one_batch(platform, aws_calls):
+    state = LTIState(LTIStateStorage()).save()
+    aws_calls.clear()
+
+    repository = LTIRepository().prefetch(state_ids=[state.record.id], platforms=[PLATFORM])
+    loaded_state = repository.state(state.record.id)
+    loaded_platform = repository.platform(*PLATFORM)
+
+    assert aws_calls == ["BatchGetItem"]
+    assert loaded_state.record == state.record
+    assert loaded_platform.config == platform.config
+
+
+def test_repository_memoizes_objects(platform, aws_calls):
+    state = LTIState(LTIStateStorage()).save()
+    aws_calls.clear()
+
+    repository = LTIRepository()
+    assert repository.state(state.record.id) is repository.state(state.record.id)
+    assert repository.platform(*PLATFORM) is repository.platform(*PLATFORM)
+    assert aws_calls == ["GetItem", "GetItem"]
+
+    repository.prefetch(state_ids=[state.record.id], platforms=[PLATFORM])
+    assert aws_calls == ["GetItem", "GetItem", "BatchGetItem"]
+    repository.prefetch(state_ids=[state.record.id], platforms=[PLATFORM])
+    assert aws_calls == ["GetItem", "GetItem", "BatchGetItem"]
+
+
+def test_prefetch_of_missing_keys(dynamodb):
+    repository = LTIRepository().prefetch(state_ids=["missing"], platforms=[PLATFORM])
+
+    assert repository.state("missing").record.id_token == ""
+    with pytest.raises(Exception):
+        repository.platform(*PLATFORM)
+
+
+def test_lti_repository_is_request_scoped():
+    app = Flask(__name__)
+    with app.test_request_context():
+        repository = lti_repository()
+        assert lti_repository() is repository
+    with app.test_request_context():
+        assert lti_repository() is not repository
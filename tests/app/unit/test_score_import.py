@@ -0,0 +1,186 @@
+import io
+import json
+import os
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from app.utility.ags_client import AgsClient
+from app.utility.score_import import CSV
+from app.utility.score_import import JSONL
+from app.utility.score_import import ScoreImporter
+from app.utility.score_import import import_format
+from app.utility.token_client import TokenClient
+from benchmarks.environment import HttpStub
+from benchmarks.environment import PlatformKeys
+from benchmarks.environment import ags_routes
+from benchmarks.environment import local_aws
+
+ROLES = "https://purl.imsglobal.org/spec/lti/claim/roles"
+INSTRUCTOR = "http://purl.imsglobal.org/vocab/lis/v2/membership#Instructor"
+
+
+@pytest.fixture(scope="function")
+def bearer_token():
+    with patch.object(TokenClient, "request_bearer_token", return_value="token"):
+        yield
+
+
+def csv_file(rows) -> io.BytesIO:
+    return io.BytesIO(("sub,score,comment\n" + "".join(f"{row}\n" for row in rows)).encode("utf-8"))
+
+
+def test_import_format():
+    assert import_format("grades.csv") == CSV
+    assert import_format("grades.JSONL") == JSONL
+    assert import_format("grades.ndjson") == JSONL
+    assert import_format(None) == CSV
+
+
+def test_import_validates_against_the_line_item(bearer_token):
+    with HttpStub(ags_routes(score_maximum=10)) as stub:
+        importer = ScoreImporter(AgsClient(platform=None, tool=None), lineitem_url=f"{stub.url}/lineitems/1")
+        rows = ["user-1,10,Well done", "user-2,11,", ",5,", "user-4,ten,", "user-5,-1,", "user-6,0,"]
+        report = importer.run(csv_file(rows), CSV)
+
+    assert (report.rows, report.published, report.rejected, report.failed) == (6, 2, 4, 0)
+    assert sorted(error["line"] for error in report.errors) == [3, 4, 5, 6]
+    assert report.line_items == {f"{stub.url}/lineitems/1": 2}
+    # the line item is read once
+    assert stub.requests["GET /lineitems/1"] == 1
+    assert stub.requests["POST /lineitems/1/scores"] == 2
+
+
+def test_import_jsonl_groups_rows_by_line_item(bearer_token):
+    posted = []
+    routes = dict(ags_routes())
+    for path in ("/lineitems/1", "/lineitems/2"):
+        routes[f"{path}/scores"] = lambda request: posted.append(request.path) or (200, {}, b"")
+    routes["/lineitems/2"] = routes["/lineitems/1"]
+    with HttpStub(routes) as stub:
+        other = f"{stub.url}/lineitems/2"
+        rows = [
+            dict(sub="user-1", score=1),
+            dict(sub="user-2", score=2, lineitem=other),
+            dict(sub="user-3", score=3, comment="Late"),
+            dict(sub="user-4", score=4, lineitem=other),
+            dict(sub="user-5", score=5, lineitem=f"{stub.url}/lineitems/3"),
+        ]
+        lines = "\n".join(json.dumps(row) for row in rows) + "\n\nnot json\n"
+        importer = ScoreImporter(
+            AgsClient(platform=None, tool=None, max_workers=1),
+            lineitem_url=f"{stub.url}/lineitems/1",
+            lineitems_url=f"{stub.url}/lineitems",
+        )
+        report = importer.run(io.BytesIO(lines.encode("utf-8")), JSONL)
+
+    assert report.line_items == {f"{stub.url}/lineitems/1": 2, other: 2}
+    assert posted == ["/lineitems/1/scores"] * 2 + ["/lineitems/2/scores"] * 2
+    # the scoreMaximum of each line item is read once, lineitems/3 is not served and its rows are rejected
+    assert [stub.requests[f"GET /lineitems/{i}"] for i in (1, 2, 3)] == [1, 1, 1]
+    assert report.rejected == 2
+    assert {error["line"] for error in report.errors} == {5, 7}
+
+
+@pytest.mark.parametrize(
+    "lineitem",
+    [
+        "https://attacker.example.org/lineitems/1",
+        "{origin}/other/lineitems/1",
+        "{origin}/lineitems",
+        "{origin}/lineitems/../users",
+        "http://user@{host}/lineitems/1",
+    ],
+)
+def test_import_rejects_line_items_outside_the_launch_context(bearer_token, lineitem):
+    with HttpStub(ags_routes()) as stub:
+        lineitem = lineitem.format(origin=stub.url, host=stub.url.partition("://")[2])
+        importer = ScoreImporter(
+            AgsClient(platform=None, tool=None),
+            lineitem_url=f"{stub.url}/lineitems/1",
+            lineitems_url=f"{stub.url}/lineitems",
+        )
+        report = importer.run(io.BytesIO(json.dumps(dict(sub="user-1", score=1, lineitem=lineitem)).encode()), JSONL)
+
+    assert (report.rejected, report.published) == (1, 0)
+    assert "not a line item of the launch's context" in report.errors[0]["error"]
+    assert sum(stub.requests.values()) == 0
+
+
+def test_import_limits_the_line_items_of_a_file(bearer_token):
+    with HttpStub(ags_routes()) as stub:
+        rows = [dict(sub="user-1", score=1, lineitem=f"{stub.url}/lineitems/{i}") for i in (1, 2, 3)]
+        importer = ScoreImporter(
+            AgsClient(platform=None, tool=None),
+            lineitems_url=f"{stub.url}/lineitems",
+            score_maximums={f"{stub.url}/lineitems/{i}": 10 for i in (1, 2, 3)},
+            max_line_items=2,
+        )
+        report = importer.run(io.BytesIO("\n".join(json.dumps(row) for row in rows).encode()), JSONL)
+
+    assert report.errors[0] == dict(line=3, userId="user-1", error="More than 2 line items")
+
+
+def test_import_reports_failures_and_caps_errors(bearer_token, monkeypatch):
+    monkeypatch.setenv("HTTP_MAX_RETRIES", "0")
+    with HttpStub({"/lineitems/1/scores": lambda request: (400, {}, "Unknown user")}) as stub:
+        importer = ScoreImporter(
+            AgsClient(platform=None, tool=None),
+            lineitem_url=f"{stub.url}/lineitems/1",
+            score_maximums={f"{stub.url}/lineitems/1": 10},
+            max_errors=3,
+        )
+        report = importer.run(csv_file(f"user-{i},1," for i in range(10)), CSV)
+
+    assert (report.published, report.failed) == (0, 10)
+    assert len(report.errors) == 3
+    assert report.errors[0]["status"] == 400
+
+
+def test_import_memory_is_flat():
+    def memory_of(rows: int) -> int:
+        stream = csv_file(f"user-{i},{i % 10},Imported" for i in range(rows))
+        with HttpStub(ags_routes()) as stub:
+            importer = ScoreImporter(
+                AgsClient(platform=None, tool=None, max_workers=4),
+                lineitem_url=f"{stub.url}/lineitems/1",
+                score_maximums={f"{stub.url}/lineitems/1": 10},
+            )
+            tracemalloc.start()
+            report = importer.run(stream, CSV)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        assert report.published == rows
+        return peak
+
+    # a plain function, a Mock would remember every call
+    with patch.object(TokenClient, "request_bearer_token", new=lambda **kwargs: "token"):
+        # ten times the rows, not ten times the memory
+        assert memory_of(2000) < 2 * memory_of(200)
+
+
+def test_import_scores_route(bearer_token, monkeypatch):
+    monkeypatch.setenv("KMS_SYMMETRIC_KEY_ID", os.getenv("KMS_SYMMETRIC_KEY_ID", "placeholder"))
+    with local_aws(), HttpStub(ags_routes()) as stub:
+        endpoint = {"https://purl.imsglobal.org/spec/lti-ags/claim/endpoint": {"lineitem": f"{stub.url}/lineitems/1"}}
+        keys = PlatformKeys()
+        client = create_app().test_client()
+
+        def upload(roles):
+            state = LTIState(LTIStateStorage())
+            state.record.id_token = keys.id_token("nonce", **endpoint, **{ROLES: roles})
+            state.save()
+            client.set_cookie("localhost", "state", state.record.id)
+            data = dict(state=state.record.id, scores=(csv_file(["user-1,7,"]), "grades.csv"))
+            return client.post("/import_scores", data=data, content_type="multipart/form-data")
+
+        assert upload(["http://purl.imsglobal.org/vocab/lis/v2/membership#Learner"]).status_code == 403
+        response = upload([INSTRUCTOR])
+
+    assert response.status_code == 200
+    assert response.json["published"] == 1
+    assert stub.requests["POST /lineitems/1/scores"] == 1
@@ -0,0 +1,85 @@
+import logging
+import os
+import time
+
+import pytest
+
+from app import create_app
+from app.utility.aws import Aws
+from app.utility.http_client import HttpClient
+from app.utility.server_timing import DependencyTimings
+from app.utility.server_timing import timed
+from benchmarks.environment import HttpStub
+from benchmarks.environment import local_aws
+
+
+@pytest.fixture(scope="function")
+def aws(monkeypatch):
+    monkeypatch.setenv("KMS_SYMMETRIC_KEY_ID", os.getenv("KMS_SYMMETRIC_KEY_ID", "placeholder"))
+    with local_aws() as dynamodb:
+        yield dynamodb
+
+
+def metrics(header: str) -> dict:
+    return {metric.split(";")[0]: metric.split(";")[1:] for metric in header.split(", ")}
+
+
+def test_server_timing_header(aws, monkeypatch, caplog):
+    monkeypatch.setenv("SERVER_TIMING", "true")
+    application = create_app()
+
+    with HttpStub({"/ok": lambda request: (200, {}, b"")}, delay=0.02) as stub:
+
+        @application.route("/dependencies")
+        def dependencies():
+            HttpClient().get(f"{stub.url}/ok")
+            HttpClient().get(f"{stub.url}/ok")
+            Aws().dynamodb.describe_table(TableName=os.getenv("TABLE_NAME"))
+            return "ok"
+
+        with caplog.at_level(logging.DEBUG, logger="ServerTiming"):
+            response = application.test_client().get("/dependencies")
+
+    timing = metrics(response.headers["Server-Timing"])
+    assert timing["http"][1] == 'desc="2 calls"'
+    assert float(timing["http"][0].split("=")[1]) >= 40
+    assert timing["dynamodb"][1] == 'desc="1 calls"'
+    assert "total" in timing
+    assert "GET /dependencies 200" in caplog.text
+    assert "http=2/" in caplog.text
+
+
+def test_server_timing_of_the_jwks(aws, monkeypatch):
+    monkeypatch.setenv("SERVER_TIMING", "true")
+
+    response = create_app().test_client().get("/jwks.json")
+
+    assert response.status_code == 200
+    assert metrics(response.headers["Server-Timing"])["dynamodb"][1] == 'desc="1 calls"'
+
+
+def test_server_timing_is_off_by_default(aws):
+    application = create_app()
+
+    response = application.test_client().get("/jwks.json")
+
+    assert "Server-Timing" not in response.headers
+
+
+def test_timing_outside_of_a_timed_request_is_cheap():
+    runs = 100000
+    start = time.perf_counter()
+    for _ in range(runs):
+        with timed("http"):
+            pass
+    assert (time.perf_counter() - start) / runs < 5e-6
+
+
+def test_header_lists_dependencies_phases_and_total():
+    timings = DependencyTimings()
+    timings.record("kms", 10)
+    timings.record("kms", 5)
+
+    header = timings.header({"verify": 80.04}, 120)
+
+    assert header == 'kms;dur=15.0;desc="2 calls", verify;dur=80.0, total;dur=120.0'
@@ -0,0 +1,224 @@
+import multiprocessing
+import time
+
+import pytest
+from jwt import PyJWKClient
+
+from app.models.jwt import LTIJwtPayload
+from app.models.platform_config import LTIPlatform
+from app.models.platform_config import LTIPlatformConfig
+from app.models.platform_config import LTIPlatformStorage
+from app.models.repository import LTIRepository
+from app.models.tool_config import LTITool
+from app.models.tool_config import LTIToolStorage
+from app.utility import shared_cache
+from app.utility.aws import Singleton
+from app.utility.shared_cache import SharedCache
+from benchmarks.environment import CLIENT_ID
+from benchmarks.environment import DEPLOYMENT_ID
+from benchmarks.environment import ISS
+from benchmarks.environment import PlatformKeys
+from benchmarks.memory_aws import memory_aws
+
+KEY_SET_URL = "https://platform.example.org/jwks.json"
+
+
+@pytest.fixture(scope="function")
+def path(tmp_path, monkeypatch):
+    path = tmp_path.joinpath("shared-cache")
+    monkeypatch.setenv("SHARED_CACHE_PATH", str(path))
+    monkeypatch.setenv("SHARED_CACHE_SLOTS", "16")
+    monkeypatch.setenv("SHARED_CACHE_SLOT_SIZE", "512")
+    return path
+
+
+def other_process() -> SharedCache:
+    """
+    A SharedCache mapping the same file, as another worker's would.
+    """
+    Singleton._instances.pop(SharedCache, None)
+    return SharedCache()
+
+
+def load_once(loads, results):
+    def load():
+        loads.put(1)
+        time.sleep(0.2)
+        return {"loaded": True}
+
+    results.put(SharedCache().get_or_load("KEY", 60, load))
+
+
+def test_disabled_loads_every_time(monkeypatch):
+    monkeypatch.delenv("SHARED_CACHE_PATH", raising=False)
+    cache = SharedCache()
+    loads = []
+
+    assert not cache.set("KEY", 1, 60)
+    assert cache.get("KEY") is None
+    assert [cache.get_or_load("KEY", 60, lambda: loads.append(1) or len(loads)) for _ in range(2)] == [1, 2]
+
+
+def test_values_are_shared_until_they_expire_or_are_deleted(path):
+    assert SharedCache().set("KEY", {"keys": [1, 2]}, 60)
+    assert SharedCache().set("SHORT", "value", 0.1)
+
+    cache = other_process()
+    assert cache.get("KEY") == {"keys": [1, 2]}
+    assert cache.get("SHORT") == "value"
+    time.sleep(0.15)
+    assert cache.get("SHORT") is None
+    cache.delete("KEY")
+    assert other_process().get("KEY") is None
+
+
+def test_values_over_the_slot_size_are_not_kept(path):
+    assert not SharedCache().set("KEY", "x" * 512, 60)
+    assert SharedCache().get("KEY") is None
+
+
+def test_full_probe_sequence_evicts_the_value_expiring_first(path, monkeypatch):
+    monkeypatch.setenv("SHARED_CACHE_SLOTS", "4")
+    monkeypatch.setattr(shared_cache, "PROBES", 4)
+    cache = SharedCache()
+    for i in range(4):
+        assert cache.set(f"KEY{i}", i, 60 + i)
+
+    assert cache.set("KEY4", 4, 60)
+
+    assert [cache.get(f"KEY{i}") for i in range(5)] == [None, 1, 2, 3, 4]
+
+
+def test_slot_being_written_is_a_miss(path, monkeypatch):
+    monkeypatch.setattr(shared_cache, "READ_ATTEMPTS", 3)
+    cache = SharedCache()
+    cache.set("KEY", "value", 60)
+    offsets = [shared_cache.HEADER_SIZE + slot * cache.slot_size for slot in range(cache.slots)]
+    offset = next(o for o in offsets if shared_cache.VERSION.unpack_from(cache._map, o)[0])
+
+    shared_cache.VERSION.pack_into(cache._map, offset, 3)
+    assert cache.get("KEY") is None
+    shared_cache.VERSION.pack_into(cache._map, offset, 4)
+    assert cache.get("KEY") == "value"
+
+
+def test_file_of_another_layout_is_reset(path, monkeypatch):
+    SharedCache().set("KEY", "value", 60)
+    monkeypatch.setenv("SHARED_CACHE_SLOTS", "32")
+
+    cache = other_process()
+
+    assert cache.get("KEY") is None
+    assert path.stat().st_size == shared_cache.HEADER_SIZE + 32 * 512
+
+
+def test_a_missing_value_is_loaded_by_one_process(path):
+    SharedCache()
+    context = multiprocessing.get_context("fork")
+    loads, results = context.Queue(), context.Queue()
+    processes = [context.Process(target=load_once, args=(loads, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(10)
+
+    assert [results.get(timeout=1) for _ in processes] == [{"loaded": True}] * 4
+    assert loads.qsize() == 1
+
+
+def test_tool_configuration_is_loaded_once_per_host(path, monkeypatch):
+    monkeypatch.setenv("SHARED_CACHE_SLOT_SIZE", "4096")
+    with memory_aws() as aws:
+        first = LTITool(LTIToolStorage())
+        Singleton._instances.clear()
+        aws.calls.clear()
+
+        second = LTITool(LTIToolStorage())
+
+        # only the Learn application secret, which is not shared
+        assert aws.calls == {"ssm:GetParameter": 1}
+        assert second.config == first.config and second.jwks == first.jwks
+        assert first.config.learn_app_secret == "SECRET"
+        assert b"SECRET" not in path.read_bytes()
+
+
+def test_platform_secret_is_not_shared(path, monkeypatch):
+    monkeypatch.setenv("SHARED_CACHE_SLOT_SIZE", "4096")
+    config = LTIPlatformConfig(
+        PK="",
+        auth_token_url="",
+        auth_login_url="",
+        client_id=CLIENT_ID,
+        lti_deployment_id=DEPLOYMENT_ID,
+        iss=ISS,
+        key_set_url=KEY_SET_URL,
+        learn_application_key="KEY",
+        learn_application_secret="PLATFORM SECRET",
+    )
+    with memory_aws():
+        platform = LTIPlatform(LTIPlatformStorage())
+        platform.config = config
+        platform.save()
+        first = LTIPlatform(LTIPlatformStorage()).load(CLIENT_ID, ISS, DEPLOYMENT_ID)
+        Singleton._instances.clear()
+
+        second = LTIRepository().prefetch(platforms=[(CLIENT_ID, ISS, DEPLOYMENT_ID)])
+        second = second.platform(CLIENT_ID, ISS, DEPLOYMENT_ID)
+
+        assert first.config.learn_application_secret == "PLATFORM SECRET"
+        assert second.config == first.config
+        assert b"PLATFORM SECRET" not in path.read_bytes()
+
+
+def test_platform_jwks_is_fetched_once_per_host_and_again_for_an_unknown_kid(path, monkeypatch):
+    monkeypatch.setenv("SHARED_CACHE_SLOT_SIZE", "4096")
+    keys = PlatformKeys()
+    fetches = []
+    monkeypatch.setattr(PyJWKClient, "fetch_data", lambda self: fetches.append(self.uri) or keys.jwks)
+    config = LTIPlatformConfig(
+        PK="",
+        auth_token_url="",
+        auth_login_url="",
+        client_id=CLIENT_ID,
+        lti_deployment_id=DEPLOYMENT_ID,
+        iss=ISS,
+        key_set_url=KEY_SET_URL,
+    )
+    with memory_aws():
+        platform = LTIPlatform(LTIPlatformStorage(), config=config)
+        LTIJwtPayload(keys.id_token("nonce")).verify(platform)
+        other_process()
+        LTIJwtPayload(keys.id_token("nonce")).verify(platform)
+        assert fetches == [KEY_SET_URL]
+
+        rotated = {"keys": [dict(keys.jwks["keys"][0], kid="rotated")]}
+        SharedCache().set(f"JWKS#{KEY_SET_URL}", rotated, 60)
+        LTIJwtPayload(keys.id_token("nonce")).verify(platform)
+        assert fetches == [KEY_SET_URL] * 2
+        assert SharedCache().get(f"JWKS#{KEY_SET_URL}") == keys.jwks
+
+
+def test_a_file_of_another_mode_is_refused(path):
+    path.write_bytes(b"")
+    path.chmod(0o644)
+
+    cache = SharedCache()
+
+    assert not cache.enabled
+    assert not cache.set("KEY", "value", 60)
+
+
+def test_a_symlink_is_not_followed(path, tmp_path):
+    target = tmp_path.joinpath("target")
+    target.write_bytes(b"")
+    target.chmod(0o600)
+    path.symlink_to(target)
+
+    assert not SharedCache().enabled
+    assert target.read_bytes() == b""
+
+
+def test_the_file_is_created_with_mode_0600(path):
+    SharedCache()
+
+    assert path.stat().st_mode & 0o777 == 0o600
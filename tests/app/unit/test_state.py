@@ -0,0 +1,121 @@
+import os
+import time
+import uuid
+
+import boto3
+import pytest
+from moto import mock_dynamodb
+
+from app.models.state import LTIState
+from app.models.state import LTIStateStorage
+from app.utility.codecs import CompactStateCodec
+
+
+@pytest.fixture(scope="function")
+def dynamodb():
+    with mock_dynamodb():
+        dynamodb = boto3.client("dynamodb")
+        dynamodb.create_table(
+            TableName=os.getenv("TABLE_NAME"),
+            BillingMode="PAY_PER_REQUEST",
+            AttributeDefinitions=[
+                {"AttributeName": "PK", "AttributeType": "S"},
+            ],
+            KeySchema=[
+                {"AttributeName": "PK", "KeyType": "HASH"},
+            ],
+        )
+        yield dynamodb
+
+
+@pytest.fixture(scope="function")
+def compact_encoding(monkeypatch):
+    monkeypatch.setenv("STATE_ENCODING", "compact")
+
+
+def test_compact_state_item_keeps_key_attributes_top_level(dynamodb, compact_encoding):
+    state = LTIState(LTIStateStorage())
+    state.record.id_token = "header.payload.signature"
+    state.record.data = {"course": "_3_1"}
+    state.save()
+
+    item = dynamodb.get_item(TableName=os.getenv("TABLE_NAME"), Key={"PK": {"S": state.record.PK}})["Item"]
+    assert set(item.keys()) == set(CompactStateCodec.KEY_ATTRIBUTES) | {CompactStateCodec.BLOB_ATTRIBUTE}
+    assert item["nonce"]["S"] == state.record.nonce
+    assert int(item["ttl"]["N"]) == state.record.ttl
+
+
+def test_compact_state_round_trip(dynamodb, compact_encoding):
+    state = LTIState(LTIStateStorage())
+    state.record.id_token = "header.payload.signature"
+    state.record.data = {"course": "_3_1", "points": 3}
+    state.save()
+
+    loaded = LTIState(LTIStateStorage()).load(state.record.id)
+    assert loaded.record == state.record
+    assert loaded.validate(state.record.nonce)
+
+
+def test_compact_encoding_reads_map_items(dynamodb, monkeypatch):
+    state = LTIState(LTIStateStorage())
+    state.record.id_token = "header.payload.signature"
+    state.save()
+
+    monkeypatch.setenv("STATE_ENCODING", "compact")
+    loaded = LTIState(LTIStateStorage()).load(state.record.id)
+    assert loaded.record == state.record
+
+
+def expire(dynamodb, pk):
+    dynamodb.update_item(
+        TableName=os.getenv("TABLE_NAME"),
+        Key={"PK": {"S": pk}},
+        UpdateExpression="SET #ttl = :ttl",
+        ExpressionAttributeNames={"#ttl": "ttl"},
+        ExpressionAttributeValues={":ttl": {"N": str(int(time.time()) - 60)}},
+    )
+
+
+def test_expired_state_is_treated_as_absent(dynamodb):
+    state = LTIState(LTIStateStorage())
+    state.record.id_token = "header.payload.signature"
+    state.save()
+    expire(dynamodb, state.record.PK)
+
+    loaded = LTIState(LTIStateStorage()).load(state.record.id)
+    assert loaded.record.id_token == ""
+    assert loaded.record.PK == ""
+
+
+def test_expired_state_fails_validation(dynamodb):
+    state = LTIState(LTIStateStorage()).save()
+    expire(dynamodb, state.record.PK)
+
+    assert state.validate(state.record.nonce) is False
+
+
+def test_nonce_is_valid_once(dynamodb):
+    state = LTIState(LTIStateStorage()).save()
+
+    assert not LTIState(LTIStateStorage()).load(state.record.id).validate("another nonce")
+    assert LTIState(LTIStateStorage()).load(state.record.id).validate(state.record.nonce)
+    assert not LTIState(LTIStateStorage()).load(state.record.id).validate(state.record.nonce)
+
+
+def test_delete_expired(dynamodb):
+    expired = [LTIState(LTIStateStorage()) for _ in range(30)]
+    for state in expired:
+        state.record.id = str(uuid.uuid4())
+        state.save()
+        expire(dynamodb, state.record.PK)
+    live = LTIState(LTIStateStorage())
+    live.record.id = str(uuid.uuid4())
+    live.save()
+    dynamodb.put_item(
+        TableName=os.getenv("TABLE_NAME"),
+        Item={"PK": {"S": "JWK#expired"}, "ttl": {"N": str(int(time.time()) - 60)}},
+    )
+
+    assert LTIState.delete_expired(LTIStateStorage()) == 30
+    remaining = {item["PK"]["S"] for item in dynamodb.scan(TableName=os.getenv("TABLE_NAME"))["Items"]}
+    assert remaining == {live.record.PK, "JWK#expired"}
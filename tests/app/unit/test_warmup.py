@@ -0,0 +1,39 @@
+from app import create_app
+from app.models.tool_config import LTITool
+from app.models.tool_config import LTIToolStorage
+from app.utility import warmup
+from app.utility.aws import Aws
+from app.utility.aws import Singleton
+from app.utility.fanout import FanOut
+from app.utility.http_client import HttpClient
+from app.utility.metrics import Metrics
+from benchmarks.memory_aws import memory_aws
+
+
+def test_warm_fills_the_read_only_state():
+    with memory_aws() as aws:
+        application = create_app()
+
+        warmup.warm(application)
+
+        assert aws.calls["ssm:GetParameter"] == 3 and aws.calls["dynamodb:Scan"] == 1
+        aws.calls.clear()
+        LTITool(LTIToolStorage())
+        assert sum(aws.calls.values()) == 0
+    loaded = {template.name for template in application.jinja_env.cache.values()}
+    assert {"knowledge_check.html", "base.html"} <= loaded
+
+
+def test_after_fork_drops_the_master_connections_and_keeps_the_caches():
+    with memory_aws():
+        LTITool(LTIToolStorage())
+        aws = Aws()
+        session, dynamodb = aws._session, aws.dynamodb
+        fanout, http, metrics = FanOut(), HttpClient(), Metrics()
+
+        warmup.after_fork()
+
+        assert Aws() is aws and aws._session is session
+        assert aws.dynamodb is not dynamodb
+        assert FanOut() is not fanout and HttpClient() is not http and Metrics() is not metrics
+        assert any(cls.__name__ == "ToolConfigCache" for cls in Singleton._instances)
@@ -213,6 +213,15 @@ def test_launch(aws, id_token, platform_jwks, state):
     assert response["statusCode"] == 302
 
 
+def test_authcode_requires_the_state_cookie(aws, state):
+    client = wsgi.application.test_client()
+    client.set_cookie("localhost", "state", "another state")
+
+    response = client.get("/authcode", query_string=dict(code="code", state=state.record.id))
+
+    assert b"state does not match the login" in response.data
+
+
 def test_platform_register(dynamodb):
     request_event = read_file("platform.json")
     wsgi.application.register_error_handler(Exception, handle_exception)